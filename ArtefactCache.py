@@ -0,0 +1,227 @@
+"""
+Content-addressed cache for the artefacts that are prepared before a simulation:
+input spike trains and connection lists (the tuning properties are recomputed, they are cheap since utils.set_tuning_prop is vectorized).
+The anisotropic connection lists are stored unscaled (normalized probabilities and latencies, see
+CreateConnections.compute_unscaled_anisotropic_connlist), the weights and delays are scaled after loading.
+
+The key of an artefact is the md5 hash of exactly the parameters the artefact depends on
+(see get_dependencies), so runs that differ only in other parameters (e.g. w_tgt_in_per_cell_ee, delay_scale)
+find the artefacts of previous runs in the cache folder, which is shared between all runs.
+If the cache grows beyond params['artefact_cache_max_size'] the least recently used entries are removed.
+
+Usage:
+    cache = ArtefactCache.ArtefactCache(params)
+    data = cache.load('input', extra={'local_idx' : local_idx})
+    if data == None:
+        data = {'spikes' : ..., 'lengths' : ...}
+        cache.store(data, 'input', extra={'local_idx' : local_idx})
+"""
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+
+# parameters the tuning properties depend on
+tuning_prop_keys = ['tuning_prop_seed', 'N_RF_X', 'N_RF_Y', 'N_V', 'N_theta', 'N_RF_X_INH', 'N_RF_Y_INH', 'N_V_INH', 'N_theta_inh', \
+        'n_exc', 'n_inh', 'v_max_tp', 'v_min_tp', 'log_scale', 'sigma_RF_pos', 'sigma_RF_speed', 'sigma_RF_direction', \
+        'torus_width', 'torus_height']
+# parameters the input spike trains depend on (in addition to the tuning properties)
+input_keys = ['motion_params', 'blur_X', 'blur_V', 'f_max_stim', 't_sim', 't_stimulus', 't_start', 't_before_blank', 't_blank', \
+        'dt_rate', 'input_spikes_seed']
+# changes whenever the way the input is generated changes, so that old input is not loaded from the cache
+input_generator = 'random_streams' # per-gid streams, see RandomStreams.py
+# parameters the unscaled anisotropic connection lists depend on (in addition to the tuning properties)
+conn_keys = ['direction_based_conn', 'w_sigma_x', 'w_sigma_v', 'connectivity_radius', 'maximal_latency']
+# parameters applied to the unscaled connection lists (w_tgt_in_per_cell_%s is added per conn_type)
+conn_scaling_keys = ['delay_scale', 'delay_range']
+
+
+def get_dependencies(params, artefact, conn_type=None):
+    """
+    Returns the list of (param_name, value) the artefact depends on.
+    artefact : 'tuning_prop', 'input' or 'conn' (requires conn_type in ['ee', 'ei', 'ie', 'ii'])
+    """
+    keys = list(tuning_prop_keys)
+    if artefact == 'input':
+        keys += input_keys
+    elif artefact == 'conn':
+        keys += conn_keys + ['p_%s' % conn_type, 'connectivity_%s' % conn_type]
+    elif artefact != 'tuning_prop':
+        raise ValueError, 'Unknown artefact: %s' % artefact
+    deps = [(key, params.get(key, None)) for key in keys]
+    if artefact == 'input':
+        deps.append(('input_generator', input_generator))
+    return deps
+
+
+def get_conn_scaling(params, conn_type):
+    """
+    Returns the list of (param_name, value) that turn the unscaled connection list of conn_type into weights and delays.
+    Artefacts holding scaled connections (e.g. the files of the precomputed connectivity) need these in addition to
+    get_dependencies(params, 'conn', conn_type).
+    """
+    keys = ['w_tgt_in_per_cell_%s' % conn_type] + conn_scaling_keys
+    return [(key, params.get(key, None)) for key in keys]
+
+
+def to_json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+class ArtefactCache(object):
+
+    def __init__(self, params, cache_folder=None, max_size=None):
+        """
+        cache_folder : default params['artefact_cache_folder']
+        max_size : [bytes] default params['artefact_cache_max_size']
+        """
+        self.params = params
+        if cache_folder == None:
+            cache_folder = params['artefact_cache_folder']
+        if max_size == None:
+            max_size = params['artefact_cache_max_size']
+        self.cache_folder = cache_folder
+        self.max_size = max_size
+        if not os.path.exists(self.cache_folder):
+            try:
+                os.makedirs(self.cache_folder)
+            except OSError: # created by another process in the meantime
+                pass
+
+
+    def get_key(self, artefact, conn_type=None, extra={}):
+        """
+        extra : additional dependencies that are not parameters, e.g. {'pc_id' : 0, 'n_proc' : 4} for artefacts
+                that are computed for the local cells only
+        """
+        deps = get_dependencies(self.params, artefact, conn_type)
+        deps += sorted(extra.items())
+        key_str = json.dumps([artefact, conn_type, deps], default=to_json)
+        return '%s_%s' % (artefact, hashlib.md5(key_str).hexdigest())
+
+
+    def load(self, artefact, conn_type=None, extra={}):
+        """
+        Returns a dictionary {name : array} as stored before, or None if the artefact is not in the cache
+        """
+        fn = self.cache_folder + self.get_key(artefact, conn_type, extra) + '.npz'
+        if not os.path.exists(fn):
+            return None
+        try:
+            npz = np.load(fn)
+            data = dict([(name, npz[name]) for name in npz.files])
+            npz.close()
+        except (IOError, ValueError): # incomplete or corrupt file
+            return None
+        os.utime(fn, None) # for the least recently used eviction
+        print 'Loaded %s from cache: %s' % (artefact, fn)
+        return data
+
+
+    def store(self, data, artefact, conn_type=None, extra={}):
+        """
+        data : dictionary {name : array}
+        """
+        fn = self.cache_folder + self.get_key(artefact, conn_type, extra) + '.npz'
+        tmp_fn = fn + '.%d.tmp' % os.getpid()
+        f = file(tmp_fn, 'wb')
+        np.savez(f, **data)
+        f.close()
+        os.rename(tmp_fn, fn) # atomic, other processes never see a partly written file
+        self.evict()
+
+
+    def restore_files(self, fns, artefact, conn_type=None, extra={}):
+        """
+        Copies the files stored with store_files back to fns.
+        Returns False if they are not in the cache.
+        """
+        folder = self.cache_folder + self.get_key(artefact, conn_type, extra) + '/'
+        if not os.path.exists(folder):
+            return False
+        for fn in fns:
+            if not os.path.exists(folder + os.path.basename(fn)):
+                return False
+        for fn in fns:
+            shutil.copy(folder + os.path.basename(fn), fn)
+        os.utime(folder, None)
+        print 'Restored %d %s files from cache: %s' % (len(fns), artefact, folder)
+        return True
+
+
+    def store_files(self, fns, artefact, conn_type=None, extra={}):
+        """
+        Copies the files fns (with distinct base names) into the cache.
+        """
+        folder = self.cache_folder + self.get_key(artefact, conn_type, extra) + '/'
+        if os.path.exists(folder):
+            return
+        tmp_folder = folder[:-1] + '.%d.tmp/' % os.getpid()
+        os.makedirs(tmp_folder)
+        for fn in fns:
+            shutil.copy(fn, tmp_folder)
+        try:
+            os.rename(tmp_folder, folder)
+        except OSError: # stored by another process in the meantime
+            shutil.rmtree(tmp_folder)
+        self.evict()
+
+
+    def get_size(self, path):
+        if os.path.isdir(path):
+            size = 0
+            for fn in os.listdir(path):
+                size += os.path.getsize(path + '/' + fn)
+            return size
+        return os.path.getsize(path)
+
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache is smaller than max_size
+        """
+        entries = []
+        total_size = 0
+        for name in os.listdir(self.cache_folder):
+            if name.endswith('.tmp'):
+                continue
+            path = self.cache_folder + name
+            try:
+                size = self.get_size(path)
+                entries.append((os.path.getmtime(path), size, path))
+            except OSError: # removed by another process
+                continue
+            total_size += size
+
+        entries.sort()
+        while total_size > self.max_size and len(entries) > 0:
+            mtime, size, path = entries.pop(0)
+            print 'Removing from cache:', path
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError:
+                pass
+            total_size -= size
+
+
+def list_to_arrays(list_of_arrays):
+    """
+    Spike trains of different lengths are stored as one concatenated array and the lengths.
+    """
+    lengths = np.array([len(x) for x in list_of_arrays], dtype=np.int64)
+    if lengths.sum() == 0:
+        return np.zeros(0), lengths
+    return np.concatenate([np.array(x, dtype=np.float64) for x in list_of_arrays]), lengths
+
+
+def arrays_to_list(values, lengths):
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    return [values[offsets[i]:offsets[i+1]] for i in xrange(lengths.size)]
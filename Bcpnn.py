@@ -1,7 +1,7 @@
 import numpy as np
 import utils
 import time
-from NeuroTools import signals as nts
+from LazyImports import nts # NeuroTools is only imported when spike lists are loaded
 
 
 def bcpnn_offline_noColumns(params, conn_list, sim_cnt=0, save_all=False, comm=None):
@@ -26,15 +26,25 @@ def bcpnn_offline_noColumns(params, conn_list, sim_cnt=0, save_all=False, comm=N
         pc_id, n_proc = comm.rank, comm.size
     else:
         pc_id, n_proc = 0, 1
-    # extract the local list of elements 'my_conns' from the global conn_list
-    n_total = len(conn_list)
-    (min_id, max_id) = utils.distribute_n(n_total, n_proc, pc_id)
-    my_conns = [(conn_list[i, 0], conn_list[i, 1], conn_list[i, 2], conn_list[i, 3]) for i in xrange(min_id, max_id)]
-
     fn = params['exc_spiketimes_fn_merged'] + str(sim_cnt) + '.ras'
     spklist = nts.load_spikelist(fn)#, range(params['n_exc_per_mc']), t_start=0, t_stop=params['t_sim'])
     spiketrains = spklist.spiketrains
 
+    # extract the local list of elements 'my_conns' from the global conn_list
+    n_total = len(conn_list)
+    if utils.get_load_balancing(params) == 'cost' and n_proc > 1:
+        # every connection costs one step per time step (traces) plus the conversion of the pre- and post-synaptic spikes
+        nspikes = np.zeros(params['n_exc'])
+        for gid in xrange(params['n_exc']):
+            if spiketrains.has_key(gid + 1.):
+                nspikes[gid] = spiketrains[gid + 1.].spike_times.size
+        costs = params['t_sim'] + nspikes[conn_list[:, 0].astype(int)] + nspikes[conn_list[:, 1].astype(int)]
+        my_idx = utils.distribute_by_cost(costs, n_proc, pc_id)
+    else:
+        (min_id, max_id) = utils.distribute_n(n_total, n_proc, pc_id)
+        my_idx = xrange(min_id, max_id)
+    my_conns = [(conn_list[i, 0], conn_list[i, 1], conn_list[i, 2], conn_list[i, 3]) for i in my_idx]
+
     new_conn_list = np.zeros((len(my_conns), 4)) # (src, tgt, weight, delay)
     bias_dict = {}
     for i in xrange(params['n_exc']):
@@ -287,6 +297,107 @@ def get_spiking_weight_and_bias(pre_trace, post_trace, get_traces=False, bin_siz
 
 
 
+class OnlineBcpnn(object):
+    """
+    Incremental version of get_spiking_weight_and_bias for all connections of a connection list:
+    the traces are kept in memory and advanced segment by segment with the spikes of the segment,
+    so that the weights can be updated during the simulation (see NetworkModel.run_segmented).
+    The equations and the order of the updates are the same as in get_spiking_weight_and_bias.
+    """
+
+    def __init__(self, params, conn_list, n_pre, n_post, dt=1., initial_value=0.01):
+        """
+        conn_list : (src, tgt, w, delay), the initial weights w are the weights for w_ij = 0
+        n_pre, n_post : number of pre- and post-synaptic cells (src and tgt are indices into these)
+        """
+        self.params = params
+        self.tau_dict = params['bcpnn_tau_dict']
+        self.dt = dt
+        self.eps = dt / self.tau_dict['tau_pi']
+        self.spike_height = 1000. / params['bcpnn_f_max']
+        conn_list = np.array(conn_list).reshape((-1, 4))
+        self.src = conn_list[:, 0].astype(int)
+        self.tgt = conn_list[:, 1].astype(int)
+        self.w_init = conn_list[:, 2].copy()
+        self.delays = conn_list[:, 3].copy()
+        self.n_pre, self.n_post = n_pre, n_post
+        self.zi = np.ones(n_pre) * initial_value
+        self.ei = np.ones(n_pre) * initial_value
+        self.pi = np.ones(n_pre) * initial_value
+        self.zj = np.ones(n_post) * initial_value
+        self.ej = np.ones(n_post) * initial_value
+        self.pj = np.ones(n_post) * initial_value
+        self.eij = np.ones(self.src.size) * initial_value**2
+        self.pij = np.ones(self.src.size) * initial_value**2
+
+
+    def get_activity(self, spikes, n_cells, t_start, n_steps):
+        """
+        spikes : (idx, t) of the segment
+        Returns the trace (n_steps, n_cells) with 1 in the time bins with a spike (like utils.convert_spiketrain_to_trace)
+        """
+        s = np.zeros((n_steps, n_cells))
+        spikes = np.array(spikes).reshape((-1, 2))
+        bins = ((spikes[:, 1] - t_start) / self.dt).astype(int)
+        valid = (bins >= 0) & (bins < n_steps)
+        s[bins[valid], spikes[valid, 0].astype(int)] = 1
+        return s
+
+
+    def update(self, pre_spikes, post_spikes, t_start, t_stop):
+        """
+        Advances all traces from t_start to t_stop.
+        pre_spikes, post_spikes : (idx, t) of the pre- and post-synaptic cells fired between t_start and t_stop
+        """
+        n_steps = int(round((t_stop - t_start) / self.dt))
+        si = self.get_activity(pre_spikes, self.n_pre, t_start, n_steps)
+        sj = self.get_activity(post_spikes, self.n_post, t_start, n_steps) * self.spike_height
+        tau, dt, eps = self.tau_dict, self.dt, self.eps
+        for i in xrange(n_steps):
+            self.zi += dt * (si[i, :] - self.zi + eps) / tau['tau_zi']
+            self.zj += dt * (sj[i, :] - self.zj + eps) / tau['tau_zj']
+            self.ei += dt * (self.zi - self.ei) / tau['tau_ei']
+            self.ej += dt * (self.zj - self.ej) / tau['tau_ej']
+            self.eij += dt * (self.zi[self.src] * self.zj[self.tgt] - self.eij) / tau['tau_eij']
+            self.pi += dt * (self.ei - self.pi) / tau['tau_pi']
+            self.pj += dt * (self.ej - self.pj) / tau['tau_pj']
+            self.pij += dt * (self.eij - self.pij) / tau['tau_pij']
+
+
+    def get_wij(self):
+        return np.log(self.pij / (self.pi[self.src] * self.pj[self.tgt]))
+
+
+    def get_bias(self):
+        return np.log(self.pj)
+
+
+    def get_weights(self):
+        """
+        Returns the synaptic weights w_init + dw_scale * w_ij, at least 0 (excitatory conductances)
+        """
+        return np.maximum(self.w_init + self.params['dw_scale'] * self.get_wij(), 0.)
+
+
+    def get_connection_order(self, src, tgt):
+        """
+        src, tgt : pre- and post-synaptic indices of the same connections in another order (e.g. of the local connections of a Projection)
+        Returns the indices into the connections of this object in that order,
+        i.e. get_weights()[order] can be passed to Projection.setWeights as list
+        """
+        keys = self.src.astype(np.int64) * self.n_post + self.tgt
+        sorted_idx = np.argsort(keys, kind='mergesort')
+        other_keys = np.asarray(src, dtype=np.int64) * self.n_post + np.asarray(tgt, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(keys[sorted_idx], other_keys), keys.size - 1)
+        order = sorted_idx[pos]
+        assert (keys[order] == other_keys).all(), 'OnlineBcpnn: the connections differ from the connection list'
+        return order
+
+
+    def get_conn_list(self):
+        return np.array((self.src, self.tgt, self.get_weights(), self.delays)).transpose()
+
+
 def bcpnn_offline(params, connection_matrix, sim_cnt=0, pc_id=0, n_proc=1, save_all=False):
     """
     Arguments:
@@ -0,0 +1,219 @@
+"""
+Binary spike files: every spike is one record (t float32, gid int32), i.e. 8 bytes instead of a text line.
+Each MPI process writes the spikes of its local cells to its own file (write_spikes) and
+merge_spike_files merges these files into one store sorted by time or by gid
+without loading all spikes into memory (external sort: sorted runs + k-way merge).
+
+Binary membrane potentials: (t float32, v float32) records grouped by gid plus an index per gid (write_volt, load_volt_trace).
+
+Usage:
+    spikes = BinaryStore.load_spikes(params['exc_spiketimes_fn_merged'] + '.bin')
+    d = BinaryStore.to_ras(spikes) # same as np.loadtxt(... .ras): d[:, 0] = times, d[:, 1] = gids
+    time_axis, volt = BinaryStore.load_volt_trace(params['exc_volt_fn_base'], gid)
+"""
+import os
+import numpy as np
+
+spike_dtype = np.dtype([('t', np.float32), ('gid', np.int32)])
+
+
+def write_spikes(fn, times, gids, sort_by='t'):
+    """
+    Writes the spikes sorted by 't' or 'gid' (the sorting makes every file one sorted run for the merger)
+    """
+    spikes = np.zeros(len(times), dtype=spike_dtype)
+    spikes['t'] = times
+    spikes['gid'] = gids
+    spikes = np.sort(spikes, order=get_order(sort_by), kind='mergesort')
+    spikes.tofile(fn)
+
+
+def get_order(sort_by):
+    if sort_by == 't':
+        return ['t', 'gid']
+    elif sort_by == 'gid':
+        return ['gid', 't']
+    raise ValueError, 'sort_by must be \'t\' or \'gid\', not %s' % sort_by
+
+
+def load_spikes(fn, mmap=False):
+    """
+    Returns the structured array with the fields 't' and 'gid'
+    mmap : if True the file is memory mapped instead of loaded
+    """
+    if os.path.getsize(fn) == 0:
+        return np.zeros(0, dtype=spike_dtype)
+    if mmap:
+        return np.memmap(fn, dtype=spike_dtype, mode='r')
+    return np.fromfile(fn, dtype=spike_dtype)
+
+
+def to_ras(spikes):
+    """
+    Converts the structured array into the format of the .ras files: d[:, 0] = times, d[:, 1] = gids
+    """
+    d = np.zeros((spikes.size, 2))
+    d[:, 0] = spikes['t']
+    d[:, 1] = spikes['gid']
+    return d
+
+
+def make_sorted_runs(input_fns, tmp_fn_base, sort_by='t', chunk_size=2**22):
+    """
+    Splits the input files into runs of at most chunk_size spikes which are sorted in memory.
+    Returns the list of run files.
+    """
+    run_fns = []
+    for fn in input_fns:
+        spikes = load_spikes(fn, mmap=True)
+        for i in xrange(0, spikes.size, chunk_size):
+            chunk = np.array(spikes[i:i + chunk_size])
+            chunk = np.sort(chunk, order=get_order(sort_by), kind='mergesort')
+            run_fn = tmp_fn_base + 'run%d.bin' % len(run_fns)
+            chunk.tofile(run_fn)
+            run_fns.append(run_fn)
+    return run_fns
+
+
+def get_key(spikes, sort_by):
+    if sort_by == 't':
+        return spikes['t']
+    return spikes['gid']
+
+
+def merge_sorted_runs(run_fns, output_fn, sort_by='t', block_size=2**16):
+    """
+    k-way merge of sorted run files: from every run a block of block_size spikes is kept in memory.
+    All spikes with a key smaller than the smallest last key of the blocks in memory can be written,
+    because no spike that is still on disk can come before them (spikes with equal key are written together,
+    so that e.g. the spikes of one gid stay sorted by time).
+    """
+    runs = [load_spikes(fn, mmap=True) for fn in run_fns]
+    positions = [0 for run in runs]
+    blocks = [np.zeros(0, dtype=spike_dtype) for run in runs]
+    output_file = file(output_fn, 'wb')
+    n_written = 0
+    while True:
+        # refill blocks
+        for i, run in enumerate(runs):
+            if blocks[i].size == 0 and positions[i] < run.size:
+                blocks[i] = np.array(run[positions[i]:positions[i] + block_size])
+                positions[i] += blocks[i].size
+        active = [i for i in xrange(len(runs)) if blocks[i].size > 0]
+        if len(active) == 0:
+            break
+        # the runs that are not exhausted limit what can be written
+        limits = [get_key(blocks[i][-1:], sort_by)[0] for i in active if positions[i] < runs[i].size]
+        if len(limits) > 0:
+            bound = min(limits)
+        else:
+            bound = np.inf
+        n_take = [np.searchsorted(get_key(blocks[i], sort_by), bound, side='left') for i in active]
+        if sum(n_take) == 0:
+            # all spikes in memory have the key bound: read more of the runs that end with it
+            for i in active:
+                if positions[i] < runs[i].size and get_key(blocks[i][-1:], sort_by)[0] == bound:
+                    more = np.array(runs[i][positions[i]:positions[i] + block_size])
+                    positions[i] += more.size
+                    blocks[i] = np.concatenate((blocks[i], more))
+            continue
+        parts = []
+        for i_, i in enumerate(active):
+            parts.append(blocks[i][:n_take[i_]])
+            blocks[i] = blocks[i][n_take[i_]:]
+        merged = np.sort(np.concatenate(parts), order=get_order(sort_by), kind='mergesort')
+        merged.tofile(output_file)
+        n_written += merged.size
+    output_file.close()
+    return n_written
+
+
+def merge_spike_files(input_fns, output_fn, sort_by='t', chunk_size=2**22, block_size=2**16):
+    """
+    Merges the binary spike files (e.g. one per process) into output_fn sorted by 't' or 'gid'.
+    At most chunk_size spikes are held in memory while sorting and len(runs) * block_size while merging.
+    """
+    tmp_fn_base = output_fn + '.%d.tmp_' % os.getpid()
+    run_fns = make_sorted_runs(input_fns, tmp_fn_base, sort_by, chunk_size)
+    n_spikes = merge_sorted_runs(run_fns, output_fn, sort_by, block_size)
+    for fn in run_fns:
+        os.remove(fn)
+    print 'Merged %d spikes from %d files into %s (sorted by %s)' % (n_spikes, len(input_fns), output_fn, sort_by)
+    return n_spikes
+
+
+def get_gid_offsets(spikes, n_cells):
+    """
+    For a gid-sorted store: the spikes of cell gid are spikes[offsets[gid]:offsets[gid+1]]
+    """
+    return np.searchsorted(spikes['gid'], np.arange(n_cells + 1), side='left')
+
+
+# membrane potentials: one file with the (t, v) records of all recorded cells grouped by gid
+# and an index with one row (gid, offset, n) per cell, so that one trace is read in O(trace length)
+volt_dtype = np.dtype([('t', np.float32), ('v', np.float32)])
+
+
+def write_volt(fn_base, d):
+    """
+    d : voltage data as returned by get_v(compatible_output=False), columns (gid, t, v)
+    Writes fn_base + '.vbin' (records sorted by gid and time) and the index fn_base + '_index.npy'
+    """
+    d = np.asarray(d)
+    if d.size == 0:
+        d = np.zeros((0, 3))
+    order = np.lexsort((d[:, 1], d[:, 0]))
+    d = d[order, :]
+    records = np.zeros(d.shape[0], dtype=volt_dtype)
+    records['t'] = d[:, 1]
+    records['v'] = d[:, 2]
+    records.tofile(fn_base + '.vbin')
+    gids, offsets, n = np.unique(d[:, 0].astype(np.int64), return_index=True, return_counts=True)
+    np.save(fn_base + '_index.npy', np.array((gids, offsets, n)).transpose())
+
+
+def merge_volt_files(input_fn_bases, output_fn_base, chunk_size=2**24):
+    """
+    Concatenates the voltage files of the processes (every cell is recorded on one process only)
+    and shifts their indices accordingly. The data are copied in chunks of chunk_size bytes.
+    """
+    output_file = file(output_fn_base + '.vbin', 'wb')
+    indices = []
+    n_records = 0
+    for fn_base in input_fn_bases:
+        index = np.load(fn_base + '_index.npy').reshape((-1, 3))
+        index[:, 1] += n_records
+        indices.append(index)
+        input_file = file(fn_base + '.vbin', 'rb')
+        while True:
+            data = input_file.read(chunk_size)
+            if len(data) == 0:
+                break
+            output_file.write(data)
+        input_file.close()
+        n_records += os.path.getsize(fn_base + '.vbin') / volt_dtype.itemsize
+    output_file.close()
+    index = np.concatenate(indices)
+    index = index[np.argsort(index[:, 0], kind='mergesort'), :]
+    np.save(output_fn_base + '_index.npy', index)
+    print 'Merged voltages of %d cells from %d files into %s.vbin' % (index.shape[0], len(input_fn_bases), output_fn_base)
+
+
+def get_volt_gids(fn_base):
+    return np.load(fn_base + '_index.npy').reshape((-1, 3))[:, 0]
+
+
+def load_volt_trace(fn_base, gid, index=None):
+    """
+    Returns time_axis, volt of the cell gid (like utils.extract_trace)
+    index : the loaded index array (fn_base + '_index.npy') to avoid loading it again for every trace
+    """
+    if index is None:
+        index = np.load(fn_base + '_index.npy').reshape((-1, 3))
+    row = np.searchsorted(index[:, 0], gid)
+    if row == index.shape[0] or index[row, 0] != gid:
+        print 'Warning: no voltage recorded for gid %d in %s.vbin' % (gid, fn_base)
+        return np.zeros(0), np.zeros(0)
+    offset, n = index[row, 1], index[row, 2]
+    records = np.memmap(fn_base + '.vbin', dtype=volt_dtype, mode='r', offset=offset * volt_dtype.itemsize, shape=(n,))
+    return np.array(records['t'], dtype=np.float64), np.array(records['v'], dtype=np.float64)
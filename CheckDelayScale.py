@@ -162,9 +162,8 @@ class CompareSimulations(object):
         stimulus alone (that's why you need to simulate without connectivity before),
         and the response with connectivity.
         """
-        volt_fn = self.params['exc_volt_fn_base'] + '.v'
-        print 'Loading membrane potentials from:', volt_fn
-        volt_data = np.loadtxt(volt_fn)
+        print 'Loading membrane potentials from:', self.params['exc_volt_fn_base']
+        volt_traces = utils.load_volt_traces(self.params['exc_volt_fn_base'], self.gids_to_plot)
         spike_fn = self.params['exc_spiketimes_fn_merged'] + '%d.ras' % 0
         nspikes, spiketimes = utils.get_nspikes(spike_fn, self.params['n_exc'], get_spiketrains=True)
 
@@ -179,7 +178,7 @@ class CompareSimulations(object):
         self.fig_cnt += 1
         y_min, y_max = -70, -45
         for i_, gid in enumerate(self.gids_to_plot):
-            time_axis, volt = utils.extract_trace(volt_data, gid)
+            time_axis, volt = volt_traces[gid]
             ax.plot(time_axis, volt, lw=1, label='nspikes[%d]=%d' % (gid, nspikes[gid]), color=self.color_dict[gid])
 #            self.plot_spikes(ax, spiketimes[gid], gid, y_min, y_max, lw=2)
             self.plot_spike_histogram(ax2, gid, i_, spiketimes[gid])
@@ -162,7 +162,7 @@ def compute_weights_convergence_constrained(tuning_prop, params, comm=None):
     print "Proc %d computes initial weights for gids (%d, %d) to file %s" % (pc_id, gid_min, gid_max, output_fn)
     conn_file = open(output_fn, 'w')
     my_cells = range(gid_min, gid_max)
-    n_src_cells = round(params['p_ee'] * params['n_exc']) # number of sources per target neuron
+    n_src_cells = int(round(params['p_ee'] * params['n_exc'])) # number of sources per target neuron
     output = np.zeros((len(my_cells), n_src_cells+1), dtype='int')
     weights = np.zeros((len(my_cells), n_src_cells+1), dtype='int')
 
@@ -173,10 +173,10 @@ def compute_weights_convergence_constrained(tuning_prop, params, comm=None):
         latency = np.zeros(params['n_exc'])
         for src in xrange(params['n_exc']):
             if (src != tgt):
-                p[src], latency[src] = get_p_conn(tuning_prop[src, :], tuning_prop[tgt, :], sigma_x, sigma_v, self.params['connectivity_radius'])
+                p[src], latency[src] = get_p_conn(tuning_prop[src, :], tuning_prop[tgt, :], sigma_x, sigma_v, params['connectivity_radius'])
         sorted_indices = np.argsort(p)
-        sources = sorted_indices[-params['n_src_cells_per_neuron']:] 
-        w = params['w_tgt_in'] / p[sources].sum() * p[sources]
+        sources = sorted_indices[-int(params['n_src_cells_per_neuron']):]
+        w = params['w_tgt_in_per_cell_ee'] / p[sources].sum() * p[sources]
 #        w = utils.linear_transformation(w, params['w_min'], params['w_max'])
         for i in xrange(len(sources)):
 #            w[i] = max(params['w_min'], min(w[i], params['w_max']))
@@ -306,6 +306,117 @@ def get_exc_inh_connections(pred_pos, inh_pos, tp_exc, n=10):
 
 
 
+def compute_anisotropic_connlist(params, conn_type, tp_src, tp_tgt, tgt_cells):
+    """
+    Computes the anisotropic connections targeting tgt_cells:
+    every target gets the int(round(p_xx * n_src)) sources with the highest connection probability.
+    Returns an array with rows (src, tgt, w, delay), n_src_cells_per_neuron rows per target in the order of tgt_cells
+
+    conn_type : 'ee', 'ei', 'ie' or 'ii'
+    tp_src, tp_tgt : tuning properties of the source and target population
+    """
+    unscaled_connlist = compute_unscaled_anisotropic_connlist(params, conn_type, tp_src, tp_tgt, tgt_cells)
+    return scale_anisotropic_connlist(params, conn_type, unscaled_connlist)
+
+
+def compute_unscaled_anisotropic_connlist(params, conn_type, tp_src, tp_tgt, tgt_cells):
+    """
+    Like compute_anisotropic_connlist, but returns rows (src, tgt, p, latency) with the connection probabilities
+    normalized to a sum of one per target and the unscaled latencies.
+    Depends only on the tuning properties and the connectivity parameters, not on w_tgt_in_per_cell_xx, delay_scale and delay_range
+    (see scale_anisotropic_connlist).
+    """
+    n_src = tp_src[:, 0].size
+    n_src_cells_per_neuron = int(round(params['p_%s' % conn_type] * n_src))
+    unscaled_connlist = np.zeros((n_src_cells_per_neuron * len(tgt_cells), 4))
+    for i_, tgt in enumerate(tgt_cells):
+        if params['direction_based_conn']:
+            p, latency = get_p_conn_vec_xpred(tp_src, tp_tgt[tgt, :], params['w_sigma_x'], params['w_sigma_v'], params['connectivity_radius'])
+        else: # it's motion_based connectivity
+            p, latency = get_p_conn_vec(tp_src, tp_tgt[tgt, :], params['w_sigma_x'], params['w_sigma_v'], params['connectivity_radius'], params['maximal_latency'])
+        if conn_type[0] == conn_type[1]:
+            p[tgt], latency[tgt] = 0., 0.
+        # random delays? --> np.permutate(latency) or latency[sources] * params['delay_scale'] * np.rand
+
+        sorted_indices = np.argsort(p)
+        if conn_type[0] == 'e':
+            sources = sorted_indices[-n_src_cells_per_neuron:]
+        else: # source = inhibitory
+            if conn_type[0] == conn_type[1]:
+                sources = sorted_indices[1:n_src_cells_per_neuron+1]  # shift indices to avoid self-connection, because p_ii = .0
+            else:
+                sources = sorted_indices[:n_src_cells_per_neuron]
+
+#        eta = 1e-9
+        eta = 0
+        p_norm = p[sources] / (p[sources].sum() + eta)
+        conn_list = np.array((sources, tgt * np.ones(n_src_cells_per_neuron), p_norm, latency[sources]))
+        unscaled_connlist[i_ * n_src_cells_per_neuron : (i_ + 1) * n_src_cells_per_neuron, :] = conn_list.transpose()
+    return unscaled_connlist
+
+
+def scale_anisotropic_connlist(params, conn_type, unscaled_connlist):
+    """
+    Turns the rows (src, tgt, p, latency) returned by compute_unscaled_anisotropic_connlist into (src, tgt, w, delay):
+    the weights sum up to w_tgt_in_per_cell_xx per target, the delays are the latencies times delay_scale mapped into delay_range
+    """
+    (delay_min, delay_max) = params['delay_range']
+    local_connlist = np.array(unscaled_connlist, dtype=np.float64)
+    local_connlist[:, 2] *= params['w_tgt_in_per_cell_%s' % conn_type]
+    local_connlist[:, 3] = np.minimum(np.maximum(local_connlist[:, 3] * params['delay_scale'], delay_min), delay_max)  # map the delay into the valid range
+    return local_connlist
+
+
+def compute_anisotropic_connlist_block(args):
+    """
+    Worker function for the offline connectivity stage (see precompute_connectivity.py).
+    args = (params, conn_type, tp_src, tp_tgt, block_id, (tgt_min, tgt_max))
+    Writes the connections targeting the cells tgt_min ... tgt_max - 1 to the binary (.npy) file
+    params['conn_list_%s_fn_base' % conn_type] + 'precomputed_block%d.npy' % block_id
+    Returns (conn_type, block_id, tgt_min, tgt_max, number of connections per target)
+    """
+    params, conn_type, tp_src, tp_tgt, block_id, (tgt_min, tgt_max) = args
+    tgt_cells = range(tgt_min, tgt_max)
+    conn_list = compute_anisotropic_connlist(params, conn_type, tp_src, tp_tgt, tgt_cells)
+    output_fn = params['conn_list_%s_fn_base' % conn_type] + 'precomputed_block%d.npy' % block_id
+    np.save(output_fn, conn_list)
+    n_conn_per_tgt = np.bincount(conn_list[:, 1].astype(np.int) - tgt_min, minlength=tgt_max - tgt_min)
+    return (conn_type, block_id, tgt_min, tgt_max, n_conn_per_tgt)
+
+
+def write_precomputed_index(params, conn_type, n_tgt, block_results):
+    """
+    block_results : list of return values of compute_anisotropic_connlist_block for conn_type
+    Writes the index array with one row (block_id, row offset in the block file, number of rows) per target.
+    """
+    index = np.zeros((n_tgt, 3), dtype=np.int64)
+    for (conn_type_, block_id, tgt_min, tgt_max, n_conn_per_tgt) in block_results:
+        index[tgt_min:tgt_max, 0] = block_id
+        index[tgt_min:tgt_max, 1] = np.concatenate(([0], np.cumsum(n_conn_per_tgt)[:-1]))
+        index[tgt_min:tgt_max, 2] = n_conn_per_tgt
+    output_fn = params['conn_list_%s_fn_base' % conn_type] + 'precomputed_index.npy'
+    print 'Writing index of precomputed %s connections to: %s' % (conn_type, output_fn)
+    np.save(output_fn, index)
+
+
+def load_precomputed_connlist(params, conn_type, tgt_cells):
+    """
+    Reads only the rows of the precomputed connection list that target tgt_cells.
+    The block files are memory mapped, so the full connection list is never loaded.
+    """
+    index = np.load(params['conn_list_%s_fn_base' % conn_type] + 'precomputed_index.npy')
+    blocks = {}
+    rows = []
+    for tgt in tgt_cells:
+        block_id, offset, n = index[tgt, :]
+        if not blocks.has_key(block_id):
+            blocks[block_id] = np.load(params['conn_list_%s_fn_base' % conn_type] + 'precomputed_block%d.npy' % block_id, mmap_mode='r')
+        rows.append(np.array(blocks[block_id][offset:offset + n, :]))
+    if len(rows) == 0:
+        return np.zeros((0, 4))
+    return np.concatenate(rows)
+
+
 def compute_random_weight_list(input_fn, output_fn, params, seed=98765):
     """
     Open the existing pre-computed (non-random) conn_list and shuffle sources and targets
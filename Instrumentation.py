@@ -0,0 +1,175 @@
+"""
+Per-process instrumentation: nested timed sections together with the peak memory (RSS) and the number of
+python objects at the end of each section. The records of all MPI processes are reduced on process 0
+into min / max / mean (and the process with the max, i.e. the straggler) and written as JSON.
+
+Usage:
+    instr = Instrumentation.Instrumentation(comm)
+    with instr.section('connect'):
+        with instr.section('connect_ee'):
+            ...
+    instr.write(params['instrumentation_fn'])   # collective, all processes need to call it
+
+or for methods of a class having the attribute 'instrumentation':
+    @Instrumentation.timed('setup')
+    def setup(self, ...):
+"""
+import gc
+import sys
+import time
+import json
+import resource
+import contextlib
+import numpy as np
+
+
+def get_peak_rss():
+    """
+    Returns the peak resident set size of this process [MB]
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin': # bytes on mac, kilobytes on linux
+        return peak / 1024. ** 2
+    return peak / 1024.
+
+
+def count_objects():
+    return len(gc.get_objects())
+
+
+def timed(name):
+    """
+    Decorator for methods of objects with the attribute instrumentation: the method call becomes the section name
+    """
+    def decorator(method):
+        def wrapper(self, *args, **kwargs):
+            self.instrumentation.start(name)
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.instrumentation.stop(name)
+        wrapper.__name__ = method.__name__
+        wrapper.__doc__ = method.__doc__
+        return wrapper
+    return decorator
+
+
+class Instrumentation(object):
+
+    def __init__(self, comm=None, count_objects=True):
+        """
+        count_objects : if True the python objects are counted at the end of every section (gc.get_objects)
+        """
+        self.comm = comm
+        if self.comm != None:
+            self.pc_id, self.n_proc = self.comm.rank, self.comm.size
+        else:
+            self.pc_id, self.n_proc = 0, 1
+        self.with_object_counts = count_objects
+        self.stack = [] # (name, t_start) of the open sections
+        self.sections = {} # 'outer/inner' : {'time' : .., 'n_calls' : .., 'peak_rss' : .., 'n_objects' : ..}
+        self.order = [] # section paths in the order they were first entered
+        self.t_created = time.time()
+
+
+    def get_path(self):
+        return '/'.join([name for (name, t_start) in self.stack])
+
+
+    def start(self, name):
+        self.stack.append((name, time.time()))
+        path = self.get_path()
+        if not self.sections.has_key(path):
+            self.sections[path] = {'time' : 0., 'n_calls' : 0, 'peak_rss' : 0., 'n_objects' : 0}
+            self.order.append(path)
+
+
+    def stop(self, name=None):
+        """
+        name : if given, it must be the innermost open section
+        """
+        path = self.get_path()
+        (name_, t_start) = self.stack.pop()
+        assert (name == None or name == name_), 'Instrumentation: stopping section %s, but %s is open' % (name, name_)
+        record = self.sections[path]
+        record['time'] += time.time() - t_start
+        record['n_calls'] += 1
+        record['peak_rss'] = get_peak_rss()
+        if self.with_object_counts:
+            record['n_objects'] = count_objects()
+
+
+    @contextlib.contextmanager
+    def section(self, name):
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+
+    def get_local_records(self):
+        """
+        Returns the records of this process including the total time and peak RSS
+        """
+        records = dict([(path, dict(record)) for (path, record) in self.sections.iteritems()])
+        records['total'] = {'time' : time.time() - self.t_created, 'n_calls' : 1, 'peak_rss' : get_peak_rss(), \
+                'n_objects' : count_objects()}
+        return records
+
+
+    def reduce(self):
+        """
+        Collective: gathers the records of all processes on process 0.
+        Returns on process 0 {path : {metric : {'min', 'max', 'mean', 'argmax', 'per_process'}}}, None on the other processes.
+        A section that was not entered on a process counts with 0 for this process.
+        """
+        local_records = self.get_local_records()
+        if self.comm != None:
+            all_records = self.comm.gather(local_records, root=0)
+        else:
+            all_records = [local_records]
+        if self.pc_id != 0:
+            return None
+
+        paths = list(self.order)
+        for records in all_records:
+            for path in records.keys():
+                if path not in paths and path != 'total':
+                    paths.append(path)
+        paths.append('total')
+        self.all_paths = paths
+
+        summary = {}
+        for path in paths:
+            summary[path] = {}
+            for metric in ['time', 'n_calls', 'peak_rss', 'n_objects']:
+                values = np.array([records.get(path, {}).get(metric, 0) for records in all_records], dtype=np.float64)
+                summary[path][metric] = {'min' : values.min(), 'max' : values.max(), 'mean' : values.mean(), \
+                        'argmax' : int(values.argmax()), 'per_process' : values.tolist()}
+        return summary
+
+
+    def write(self, output_fn, extra={}):
+        """
+        Collective: reduces the records and writes them on process 0 as JSON to output_fn.
+        extra : additional information to be stored, e.g. cell numbers
+        """
+        summary = self.reduce()
+        if self.pc_id != 0:
+            return
+        output = {'n_proc' : self.n_proc, 'sections' : summary, 'order' : self.all_paths, \
+                'units' : {'time' : 'sec', 'peak_rss' : 'MB'}}
+        output.update(extra)
+        print 'Writing instrumentation to:', output_fn
+        f = file(output_fn, 'w')
+        json.dump(output, f, indent=1)
+        f.close()
+        self.print_summary(summary)
+
+
+    def print_summary(self, summary):
+        print '%-40s %10s %10s %10s %6s %10s' % ('section', 'min [s]', 'mean [s]', 'max [s]', 'pid', 'RSS [MB]')
+        for path in self.all_paths:
+            t, rss = summary[path]['time'], summary[path]['peak_rss']
+            print '%-40s %10.2f %10.2f %10.2f %6d %10.1f' % (path, t['min'], t['mean'], t['max'], t['argmax'], rss['max'])
@@ -0,0 +1,122 @@
+"""
+Lightweight entry point for analysis and plotting scripts: heavy modules (pylab, NeuroTools, mpi4py, pyNN)
+are only imported when they are used for the first time, a non-interactive matplotlib backend is chosen
+when there is no display, and the parameters of a run are loaded from its JSON file without creating a
+parameter_storage (which prints and recomputes all derived parameters).
+
+Usage:
+    from LazyImports import pylab, load_params, get_comm
+    params = load_params(sys.argv[1])      # folder of a run or its simulation_parameters.json
+    comm, pc_id, n_proc = get_comm()       # (None, 0, 1) without mpi4py
+    pylab.figure()                         # pylab is imported here, with the Agg backend if headless
+"""
+import os
+import sys
+import json
+
+
+def use_headless_backend(force=False):
+    """
+    Selects the Agg backend if there is no display (e.g. on the cluster), must be called before pylab is imported
+    force : select Agg also if there is a display (figures are only written to files)
+    """
+    headless = (os.environ.get('DISPLAY', '') == '' and sys.platform not in ['darwin', 'win32'])
+    if (force or headless) and 'matplotlib.pyplot' not in sys.modules:
+        import matplotlib
+        matplotlib.use('Agg')
+
+
+class LazyModule(object):
+    """
+    Stands for a module that is imported when one of its attributes is accessed for the first time
+    before_import : function called before the import (e.g. use_headless_backend)
+    """
+    def __init__(self, name, before_import=None):
+        self.__dict__['_name'] = name
+        self.__dict__['_before_import'] = before_import
+        self.__dict__['_module'] = None
+
+    def load(self):
+        if self._module == None:
+            if self._before_import != None:
+                self._before_import()
+            __import__(self._name)
+            self.__dict__['_module'] = sys.modules[self._name]
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.load(), attr, value)
+
+    def __repr__(self):
+        if self._module == None:
+            return '<lazy module %s (not imported)>' % self._name
+        return '<lazy module %s>' % self._name
+
+
+pylab = LazyModule('pylab', before_import=use_headless_backend)
+plt = LazyModule('matplotlib.pyplot', before_import=use_headless_backend)
+ntp = LazyModule('NeuroTools.parameters')
+nts = LazyModule('NeuroTools.signals')
+
+
+comm_cache = []
+
+def get_comm():
+    """
+    Imports mpi4py on the first call, returns comm, pc_id, n_proc (None, 0, 1 if MPI is not available)
+    """
+    if len(comm_cache) == 0:
+        try:
+            from mpi4py import MPI
+            comm = MPI.COMM_WORLD
+            comm_cache.append((comm, comm.rank, comm.size))
+        except:
+            comm_cache.append((None, 0, 1))
+    return comm_cache[0]
+
+
+def get_params_fn(path):
+    """
+    path : folder of a run or parameter file
+    """
+    if os.path.isdir(path):
+        return os.path.join(path, 'Parameters', 'simulation_parameters.json')
+    return path
+
+
+def load_params(path=None, default_folder='Results_AIII/'):
+    """
+    Loads the parameters written by parameter_storage.write_parameters_to_file (or SweepRunner) as dictionary,
+    no default or derived parameter is recomputed.
+    path : folder of a run or its parameter file, default: the folder given on the command line or default_folder
+    If the folder has been moved since the run, the file names are updated to the new folder.
+    """
+    if path == None:
+        if len(sys.argv) > 1 and os.path.exists(get_params_fn(sys.argv[1])):
+            path = sys.argv[1]
+        else:
+            path = default_folder
+    fn = get_params_fn(path)
+    f = file(fn, 'r')
+    params = json.load(f)
+    f.close()
+    folder = os.path.dirname(os.path.dirname(os.path.abspath(fn))) + '/'
+    if os.path.abspath(params['folder_name']) + '/' != folder:
+        params = rebase_folder(params, params['folder_name'], folder)
+    return params
+
+
+def rebase_folder(params, old_folder, new_folder):
+    """
+    Replaces old_folder by new_folder at the beginning of all file and folder names
+    """
+    def rebase(value):
+        if isinstance(value, basestring) and value.startswith(old_folder):
+            return new_folder + value[len(old_folder):]
+        elif isinstance(value, list):
+            return [rebase(v) for v in value]
+        return value
+    return dict([(key, rebase(value)) for (key, value) in params.iteritems()])
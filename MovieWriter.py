@@ -0,0 +1,138 @@
+"""
+Writes movies without temporary image files: the frames are rendered from one array by a pool of worker
+processes (Agg backend) and the raw RGB pixels are streamed in order to the stdin of an ffmpeg process,
+so there is no PNG encoding / decoding and no frame_%d.png on the disk.
+The workers are forked after the frame array has been set and share it with the parent (copy-on-write).
+
+Usage:
+    import MovieWriter
+    def render_frame(fig, frames, i):
+        ax = fig.add_subplot(111)
+        ax.pcolor(frames[i])
+    MovieWriter.write_movie(frames, render_frame, 'movie.mp4', fps=8, n_procs=4)
+or, to write the frames yourself:
+    writer = MovieWriter.FFmpegWriter('movie.mp4', width, height, fps=8)
+    writer.write_frame(rgb) # (height, width, 3) uint8 array or string
+    writer.close()
+"""
+import time
+import subprocess
+import multiprocessing
+import numpy as np
+import LazyImports
+
+
+class FFmpegWriter(object):
+    """
+    ffmpeg process reading rgb24 frames of width x height pixels from stdin
+    """
+
+    def __init__(self, output_fn, width, height, fps=4., codec='libx264', bitrate=None, ffmpeg='ffmpeg'):
+        self.output_fn = output_fn
+        self.width = width
+        self.height = height
+        self.n_frames = 0
+        command = [ffmpeg, '-y', '-loglevel', 'error', \
+                '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', '%dx%d' % (width, height), '-r', str(fps), '-i', '-', \
+                '-an', '-vcodec', codec, '-pix_fmt', 'yuv420p', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+        if bitrate != None:
+            command += ['-b:v', str(bitrate)]
+        command.append(output_fn)
+        print ' '.join(command)
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+
+    def write_frame(self, rgb):
+        if isinstance(rgb, np.ndarray):
+            assert rgb.shape == (self.height, self.width, 3), 'FFmpegWriter: frame %d has shape %s, expected %s' % \
+                    (self.n_frames, str(rgb.shape), str((self.height, self.width, 3)))
+            rgb = rgb.astype(np.uint8).tostring()
+        assert len(rgb) == self.width * self.height * 3, 'FFmpegWriter: frame %d has %d bytes, expected %d' % \
+                (self.n_frames, len(rgb), self.width * self.height * 3)
+        self.process.stdin.write(rgb)
+        self.n_frames += 1
+
+
+    def close(self):
+        self.process.stdin.close()
+        ret = self.process.wait()
+        if ret != 0:
+            raise IOError, 'FFmpegWriter: ffmpeg failed with return code %d while writing %s' % (ret, self.output_fn)
+        print 'Output movie: %s (%d frames)' % (self.output_fn, self.n_frames)
+
+
+# set before the workers are forked, they inherit the frame array and the render function
+frame_source = {}
+worker_figure = []
+
+def render_rgb(i):
+    """
+    Renders frame i in a worker, returns (width, height, rgb string)
+    """
+    pylab = LazyImports.pylab
+    if len(worker_figure) == 0: # one figure per worker, cleared for each frame
+        worker_figure.append(pylab.figure(figsize=frame_source['figsize'], dpi=frame_source['dpi']))
+    fig = worker_figure[0]
+    fig.clf()
+    frame_source['render_frame'](fig, frame_source['frames'], i)
+    fig.canvas.draw()
+    (width, height) = fig.canvas.get_width_height()
+    return (width, height, fig.canvas.tostring_rgb())
+
+
+def write_movie(frames, render_frame, output_fn, fps=4., n_procs=None, figsize=(8, 6), dpi=100, n_frames=None, **kwargs):
+    """
+    frames : array (or any object the render function can index), shared with the workers
+    render_frame : function(fig, frames, i) drawing frame i into the empty figure fig
+    n_frames : default len(frames)
+    kwargs : passed to FFmpegWriter (codec, bitrate, ffmpeg)
+    The frames are rendered by n_procs workers (default: number of cores) and written in order.
+    """
+    LazyImports.use_headless_backend(force=True)
+    if n_frames == None:
+        n_frames = len(frames)
+    frame_source.update({'frames' : frames, 'render_frame' : render_frame, 'figsize' : figsize, 'dpi' : dpi})
+    if n_procs == None:
+        n_procs = multiprocessing.cpu_count()
+    n_procs = max(1, min(n_procs, n_frames))
+
+    t0 = time.time()
+    if n_procs > 1:
+        pool = multiprocessing.Pool(n_procs)
+        rendered = pool.imap(render_rgb, xrange(n_frames), chunksize=1) # results come in frame order
+    else:
+        pool = None
+        rendered = (render_rgb(i) for i in xrange(n_frames))
+
+    writer = None
+    try:
+        for (width, height, rgb) in rendered:
+            if writer == None: # the size of the movie is the size of the first frame
+                writer = FFmpegWriter(output_fn, width, height, fps, **kwargs)
+            writer.write_frame(rgb)
+    finally:
+        if pool != None:
+            pool.terminate()
+            pool.join()
+        if writer != None:
+            writer.close()
+    print 'MovieWriter: %d frames with %d processes in %.2f sec' % (n_frames, n_procs, time.time() - t0)
+    return output_fn
+
+
+def render_pcolor(fig, frames, i, vmin=0., vmax=None, title='Spatial activity readout', bg_color='k'):
+    """
+    Renders frames[i] as a 2D activity map, the colour scale is the same for all frames.
+    vmax : default frames.max(), which goes over all frames: compute it once when rendering a movie
+    """
+    pylab = LazyImports.pylab
+    if vmax == None:
+        vmax = frames.max()
+    ax = fig.add_subplot(111)
+    ax.patch.set_facecolor(bg_color)
+    ax.set_xlabel('$x$')
+    ax.set_ylabel('$y$')
+    ax.set_title(title)
+    norm = pylab.matplotlib.colors.Normalize(vmin=vmin, vmax=vmax)
+    cax = ax.pcolor(frames[i], norm=norm, cmap=pylab.cm.bone)
+    fig.colorbar(cax)
@@ -4,6 +4,10 @@ Simple network with a Poisson spike source projecting to populations of of IF_co
 on the cluster:
     frioul_batch -M "[['w_tgt_in_per_cell_ee', 'w_tgt_in_per_cell_ee', 'w_tgt_in_per_cell_ee'],[0.4, 0.8, 1.2]]" 'python NetworkSimModuleNoColumns.py'
 
+with a parameter file written before (e.g. by SweepRunner):
+    mpirun -np 2 python NetworkSimModule.py Folder/Parameters/simulation_parameters.json
+
+several runs in one interpreter (reusing tuning properties, input and connections): see SimulationSession
 
 """
 import time
@@ -12,29 +16,37 @@ t0 = time.time()
 import numpy as np
 import numpy.random as nprnd
 import sys
-import NeuroTools.parameters as ntp
+import json
 import os
 import CreateConnections as CC
 import utils
+import ArtefactCache
+import BinaryStore
+import Bcpnn
+import RandomStreams
+import Instrumentation
+import LazyImports
+from LazyImports import ntp # NeuroTools is only imported when the results are written
 import simulation_parameters
-ps = simulation_parameters.parameter_storage()
-params = ps.params
-exec("from pyNN.%s import *" % params['simulator'])
-import pyNN
-import pyNN.space as space
-print 'pyNN.version: ', pyNN.__version__
-try:
-#    I_fail_because_I_do_not_want_to_use_MPI
-    from mpi4py import MPI
-    USE_MPI = True
-    comm = MPI.COMM_WORLD
-    pc_id, n_proc = comm.rank, comm.size
-    print "USE_MPI:", USE_MPI, 'pc_id, n_proc:', pc_id, n_proc
-except:
-    USE_MPI = False
-    pc_id, n_proc, comm = 0, 1, None
-    print "MPI not used"
 times['time_to_import'] = time.time() - t0
+imported_simulator = None # pyNN (or the NumPy backend) is imported by NetworkModel, see import_simulator
+
+
+def import_simulator(simulator):
+    """
+    Imports the simulator into the module namespace (from pyNN.<simulator> import *),
+    done when the first NetworkModel is created so that importing this module stays cheap.
+    """
+    global imported_simulator
+    if imported_simulator == simulator:
+        return
+    assert (imported_simulator == None), 'Simulator %s already imported, can not switch to %s' % (imported_simulator, simulator)
+    if simulator == 'numpy': # single process NumPy backend, see NumpySimulator.py
+        exec "from NumpySimulator import *\nimport NumpySimulator as pyNN\nspace = pyNN" in globals()
+    else:
+        exec ("from pyNN.%s import *\nimport pyNN\nimport pyNN.space as space" % simulator) in globals()
+    imported_simulator = simulator
+    print 'pyNN.version: ', pyNN.__version__
 
 
 def get_local_indices(pop, offset=0):
@@ -50,11 +62,32 @@ def get_local_indices(pop, offset=0):
     return list_of_locals
 
 
+def get_local_mask_indices(pop):
+    """
+    Returns the list of indices of the cells of pop that are local to the MPI node,
+    independent of the IDs of pop (unlike get_local_indices, which needs the offset of the first ID)
+    """
+    return [i_ for i_, cell_id in enumerate(pop.all()) if pop.is_local(cell_id)]
+
+
+def get_connection_indices(prj):
+    """
+    Returns the pre- and post-synaptic indices of the local connections of prj
+    in the order of prj.getWeights(format='list') and prj.setWeights(list)
+    """
+    if hasattr(prj, 'connection_manager'): # pyNN.nest
+        import nest
+        src_tgt = np.array(nest.GetStatus(prj.connection_manager.connections, ('source', 'target'))).reshape((-1, 2))
+        return prj.pre.id_to_index(src_tgt[:, 0]), prj.post.id_to_index(src_tgt[:, 1])
+    return prj.sources, prj.targets # NumpySimulator
+
+
 class NetworkModel(object):
 
     def __init__(self, params, comm):
 
         self.params = params
+        import_simulator(self.params['simulator'])
         self.debug_connectivity = True
         self.comm = comm
         if self.comm != None:
@@ -64,30 +97,44 @@ class NetworkModel(object):
             self.pc_id, self.n_proc = 0, 1
             print "MPI not used"
 
-        np.random.seed(params['np_random_seed'] + self.pc_id)
+        assert (self.params['simulator'] != 'numpy' or self.n_proc == 1), 'The numpy simulator runs in a single process only'
+        np.random.seed(self.params['np_random_seed'] + self.pc_id)
+        self.instrumentation = Instrumentation.Instrumentation(self.comm) # per-process timing and memory, written by print_results
 
         if self.params['with_short_term_depression']:
             self.short_term_depression = SynapseDynamics(fast=TsodyksMarkramMechanism(U=0.95, tau_rec=10.0, tau_facil=0.0))
 
     def import_pynn(self):
         """
-        This function needs only be called when this class is used in another script as imported module
+        Kept for older scripts, the simulator is imported when the NetworkModel is created
         """
-        import pyNN
-
-        exec("from pyNN.%s import *" % self.params['simulator'])
-        print 'import pyNN\npyNN.version: ', pyNN.__version__
+        import_simulator(self.params['simulator'])
 
 
 
-    def setup(self, load_tuning_prop=False, times={}):
+    @Instrumentation.timed('setup')
+    def setup(self, load_tuning_prop=False, times={}, sim_cnt=0, tuning_prop=None):
+        """
+        tuning_prop : (tuning_prop_exc, tuning_prop_inh) from a previous run with the same tuning parameters,
+            if given the tuning properties are neither computed nor loaded from file
+        """
 
         self.projections = {}
         self.projections['ee'] = []
         self.projections['ei'] = []
         self.projections['ie'] = []
         self.projections['ii'] = []
-        if not load_tuning_prop:
+        self.local_connlists = {}
+        self.unscaled_connlists = {} # (src, tgt, p, latency) of the anisotropic connections, see CC.compute_unscaled_anisotropic_connlist
+        self.online_bcpnn = None # set before run_sim to continue the learning of a previous run (see SimulationSession)
+        if self.params['use_artefact_cache']:
+            self.cache = ArtefactCache.ArtefactCache(self.params)
+        else:
+            self.cache = None
+        if tuning_prop != None:
+            self.tuning_prop_exc, self.tuning_prop_inh = tuning_prop
+        elif not load_tuning_prop:
+            # computing the tuning properties is cheaper than loading them (vectorized, see utils.set_tuning_prop)
             self.tuning_prop_exc = utils.set_tuning_prop(self.params, mode='hexgrid', cell_type='exc')        # set the tuning properties of exc cells: space (x, y) and velocity (u, v)
             self.tuning_prop_inh = utils.set_tuning_prop(self.params, mode='hexgrid', cell_type='inh')        # set the tuning properties of exc cells: space (x, y) and velocity (u, v)
         else:
@@ -107,7 +154,10 @@ class NetworkModel(object):
 
         if self.comm != None:
             self.comm.Barrier()
-        from pyNN.utility import Timer
+        if self.params['simulator'] == 'numpy':
+            from NumpySimulator import Timer
+        else:
+            from pyNN.utility import Timer
         self.timer = Timer()
         self.timer.start()
         self.times = times
@@ -176,6 +226,7 @@ class NetworkModel(object):
         self.times['t_create'] = self.timer.diff()
 
 
+    @Instrumentation.timed('create')
     def create(self, input_created=False):
         """
             # # # # # # # # # # # #
@@ -206,43 +257,55 @@ class NetworkModel(object):
         cell_pos_inh[1, :] = self.tuning_prop_inh[:, 1]
         self.inh_pop.positions = cell_pos_inh
 
-
-        if not input_created:
-            self.spike_times_container = [ [] for i in xrange(len(self.local_idx_exc))]
-
         self.exc_pop.initialize('v', self.v_init_dist)
 
         self.local_idx_inh = get_local_indices(self.inh_pop, offset=self.params['n_exc'])
         print 'Debug, pc_id %d has local %d inh indices:' % (self.pc_id, len(self.local_idx_inh)), self.local_idx_inh
         self.inh_pop.initialize('v', self.v_init_dist)
 
+        # the input spike trains are computed for the cells of the stimulus population that are local to this process:
+        # its IDs start after the exc and inh cells, so its distribution over the processes differs from exc_pop
+        if self.params['input_connection_mode'] == 'population':
+            self.stimulus = Population(self.params['n_exc'], SpikeSourceArray, label='stimulus')
+            self.local_idx_input = get_local_mask_indices(self.stimulus)
+        else:
+            self.local_idx_input = self.local_idx_exc
+        if not input_created:
+            self.spike_times_container = [ [] for i in xrange(len(self.local_idx_input))]
+
         self.times['t_create'] = self.timer.diff()
 
 
-    def connect(self):
+    @Instrumentation.timed('connect')
+    def connect(self, local_connlists={}, unscaled_connlists={}):
+        """
+        local_connlists : {conn_type : local_connlist} of a previous run with the same connectivity parameters and the same weight and delay scaling
+        unscaled_connlists : {conn_type : unscaled_connlist} of a previous run with the same connectivity parameters,
+            scaled with the current weights and delays
+        """
         if self.params['n_exc'] > 5000:
             save_output = False
         else:
             save_output = True
 
         self.connect_input_to_exc()
-        self.connect_populations('ee')
-        self.connect_populations('ei')
-        self.connect_populations('ie')
-        self.connect_populations('ii')
+        for conn_type in ['ee', 'ei', 'ie', 'ii']:
+            with self.instrumentation.section('connect_%s' % conn_type):
+                self.connect_populations(conn_type, local_connlists.get(conn_type, None), unscaled_connlists.get(conn_type, None))
         self.connect_noise()
         self.times['t_calc_conns'] = self.timer.diff()
         if self.comm != None:
             self.comm.Barrier()
 
 
+    @Instrumentation.timed('create_input')
     def create_input(self, load_files=False, save_output=False):
 
 
         if load_files:
             if self.pc_id == 0:
                 print "Loading input spiketrains..."
-            for i_, tgt in enumerate(self.local_idx_exc):
+            for i_, tgt in enumerate(self.local_idx_input):
                 try:
                     fn = self.params['input_st_fn_base'] + str(tgt) + '.npy'
                     spike_times = np.load(fn)
@@ -251,16 +314,29 @@ class NetworkModel(object):
                     spike_times = []
                 self.spike_times_container[i_] = spike_times
         else:
+            # the input of a cell does not depend on the process (RandomStreams), but only the local cells are stored
+            cache_extra = {'local_idx' : list(self.local_idx_input)}
+            cached = None
+            if self.cache != None:
+                cached = self.cache.load('input', extra=cache_extra)
+            if cached != None:
+                self.spike_times_container = ArtefactCache.arrays_to_list(cached['spikes'], cached['lengths'])
+                if save_output: # the rate files are only written when the input is computed
+                    for i_, unit in enumerate(self.local_idx_input):
+                        np.save(self.params['input_st_fn_base'] + str(unit) + '.npy', self.spike_times_container[i_])
+                self.times['create_input'] = self.timer.diff()
+                return self.spike_times_container
+
             if self.pc_id == 0:
                 print "Computing input spiketrains..."
-            nprnd.seed(self.params['input_spikes_seed'])
+            seed = self.params['input_spikes_seed']
             dt = self.params['dt_rate'] # [ms] time step for the non-homogenous Poisson process
             time = np.arange(0, self.params['t_sim'], dt)
             blank_idx = np.arange(1./dt * self.params['t_before_blank'], 1. / dt * (self.params['t_before_blank'] + self.params['t_blank']))
             before_stim_idx = np.arange(0, self.params['t_start'] * 1./dt)
-            blank_idx = np.concatenate((blank_idx, before_stim_idx))
+            blank_idx = np.concatenate((blank_idx, before_stim_idx)).astype(int)
 
-            my_units = self.local_idx_exc
+            my_units = self.local_idx_input
             n_cells = len(my_units)
             L_input = np.zeros((n_cells, time.shape[0]))
 
@@ -272,35 +348,37 @@ class NetworkModel(object):
                 if (i_time % 500 == 0):
                     print "t:", time_
 #                    print 'L_input[:, %d].max()', L_input[:, i_time].max()
-            # blanking
+            # blanking: every cell gets the input of another cell, the permutation of all cells is drawn from the stream
+            # of this time step so that it is the same on all processes
             for i_time in blank_idx:
 #                L_input[:, i_time] = 0.
-                L_input[:, i_time] = np.random.permutation(L_input[:, i_time])
+                perm = RandomStreams.get_rng(seed, i_time, 'blank').permutation(self.params['n_exc'])
+                L_input[:, i_time] = utils.get_input(self.tuning_prop_exc[perm[my_units], :], self.params, time[i_time]/self.params['t_stimulus'])
+                L_input[:, i_time] *= self.params['f_max_stim']
 
-            # create the spike trains
+            # create the spike trains, each cell has its own random stream
             print 'Creating input spiketrains for unit'
             for i_, unit in enumerate(my_units):
                 print unit,
                 rate_of_t = np.array(L_input[i_, :])
                 # each cell will get its own spike train stored in the following file + cell gid
-                n_steps = rate_of_t.size
-                spike_times = []
-                for i in xrange(n_steps):
-                    r = nprnd.rand()
-                    if (r <= ((rate_of_t[i]/1000.) * dt)): # rate is given in Hz -> 1/1000.
-                        spike_times.append(i * dt)
+                spike_times = list(RandomStreams.poisson_spike_times(RandomStreams.get_rng(seed, unit, 'input'), rate_of_t, dt))
                 self.spike_times_container[i_] = spike_times
                 if save_output:
                     output_fn = self.params['input_rate_fn_base'] + str(unit) + '.npy'
                     np.save(output_fn, rate_of_t)
                     output_fn = self.params['input_st_fn_base'] + str(unit) + '.npy'
                     np.save(output_fn, np.array(spike_times))
+            if self.cache != None:
+                spikes, lengths = ArtefactCache.list_to_arrays(self.spike_times_container)
+                self.cache.store({'spikes' : spikes, 'lengths' : lengths}, 'input', extra=cache_extra)
 
         self.times['create_input'] = self.timer.diff()
         return self.spike_times_container
 
 
 
+    @Instrumentation.timed('connect_input')
     def connect_input_to_exc(self):
         """
             # # # # # # # # # # # # # # # # # # # # # #
@@ -309,7 +387,11 @@ class NetworkModel(object):
         """
         if self.pc_id == 0:
             print "Connecting input spiketrains..."
-        
+        if self.params['input_connection_mode'] == 'population':
+            self.connect_input_population()
+            self.times['connect_input'] = self.timer.diff()
+            return
+
 #        self.stimulus = Population(len(self.local_idx_exc), SpikeSourceArray)
 #            self.exc_pop = Population(n_exc, IF_cond_exp, self.params['cell_params_exc'], label='exc_cells')
 #                prj = Projection(src_pop, tgt_pop, connector, target=syn_type)
@@ -319,7 +401,7 @@ class NetworkModel(object):
 #        self.stimuli = []
 #        self.pop_views = [] 
 #        conn = OneToOneConnector(weights=self.params['w_input_exc'])
-        for i_, unit in enumerate(self.local_idx_exc):
+        for i_, unit in enumerate(self.local_idx_input):
             spike_times = self.spike_times_container[i_]
 #            ssa = create(SpikeSourceArray, {'spike_times': spike_times})
             ssa = Population(1, SpikeSourceArray, {'spike_times': spike_times})
@@ -343,6 +425,25 @@ class NetworkModel(object):
         self.times['connect_input'] = self.timer.diff()
 
 
+    def connect_input_population(self):
+        """
+        One SpikeSourceArray population (created in create) with the same size as exc_pop,
+        the spike times are set only for its local cells (self.local_idx_input) and the input is connected with a single OneToOne projection.
+        """
+        all_spike_times = np.empty(self.params['n_exc'], dtype=object)
+        for i in xrange(self.params['n_exc']):
+            all_spike_times[i] = np.array([])
+        for i_, unit in enumerate(self.local_idx_input):
+            all_spike_times[unit] = np.array(self.spike_times_container[i_])
+        self.stimulus.tset('spike_times', all_spike_times)
+
+        connector = OneToOneConnector(weights=self.params['w_input_exc'])
+        if self.params['with_short_term_depression']:
+            self.projections['stim'] = Projection(self.stimulus, self.exc_pop, connector, target='excitatory', synapse_dynamics=self.short_term_depression)
+        else:
+            self.projections['stim'] = Projection(self.stimulus, self.exc_pop, connector, target='excitatory')
+
+
     def resolve_src_tgt(self, conn_type):
         """
         Deliver the correct source and target parameters based on conn_type
@@ -383,62 +484,76 @@ class NetworkModel(object):
         return (n_src, n_tgt, src_pop, tgt_pop, tp_src, tp_tgt, tgt_cells, syn_type)
 
 
-    def connect_anisotropic(self, conn_type):
+    def connect_anisotropic(self, conn_type, local_connlist=None, unscaled_connlist=None):
         """
         conn_type = ['ee', 'ei', 'ie', 'ii']
+        local_connlist : connection list (src, tgt, w, delay) for the local targets from a previous run
+            with the same connectivity parameters and the same weight and delay scaling, if given it is used as it is
+        unscaled_connlist : connection list (src, tgt, p, latency) for the local targets from a previous run
+            with the same connectivity parameters, if given it is only scaled with the current weights and delays.
+        Otherwise the unscaled list is loaded from the cache (which does not depend on the scaling) or computed.
         """
         if self.pc_id == 0:
             print 'Connect anisotropic %s - %s' % (conn_type[0].capitalize(), conn_type[1].capitalize())
 
         (n_src, n_tgt, src_pop, tgt_pop, tp_src, tp_tgt, tgt_cells, syn_type) = self.resolve_src_tgt(conn_type)
 
-        if self.debug_connectivity:
-            conn_list_fn = self.params['conn_list_%s_fn_base' % conn_type] + '%d.dat' % (self.pc_id)
+        cache_extra = {'tgt_cells' : list(tgt_cells), 'n_proc' : self.n_proc, 'pc_id' : self.pc_id}
+        if local_connlist is None:
+            if unscaled_connlist is None and self.cache != None:
+                cached = self.cache.load('conn', conn_type, extra=cache_extra)
+                if cached != None:
+                    unscaled_connlist = cached['unscaled_conn_list']
+            if unscaled_connlist is None:
+                unscaled_connlist = self.get_unscaled_anisotropic_connlist(conn_type)
+                if self.cache != None:
+                    self.cache.store({'unscaled_conn_list' : unscaled_connlist}, 'conn', conn_type, extra=cache_extra)
+            local_connlist = CC.scale_anisotropic_connlist(self.params, conn_type, unscaled_connlist)
+        if unscaled_connlist is not None:
+            self.unscaled_connlists[conn_type] = unscaled_connlist
+        self.local_connlists[conn_type] = local_connlist
+        self.connect_from_list(conn_type, local_connlist)
+
+
+    def connect_precomputed(self, conn_type):
+        """
+        Loads the rows of the connection list written by precompute_connectivity.py that target the local cells
+        """
+        if self.pc_id == 0:
+            print 'Connect precomputed %s - %s' % (conn_type[0].capitalize(), conn_type[1].capitalize())
+        (n_src, n_tgt, src_pop, tgt_pop, tp_src, tp_tgt, tgt_cells, syn_type) = self.resolve_src_tgt(conn_type)
+        local_connlist = CC.load_precomputed_connlist(self.params, conn_type, tgt_cells)
+        self.local_connlists[conn_type] = local_connlist
+        self.connect_from_list(conn_type, local_connlist)
 
-        n_src_cells_per_neuron = int(round(self.params['p_%s' % conn_type] * n_src))
-        (delay_min, delay_max) = self.params['delay_range']
-        local_connlist = np.zeros((n_src_cells_per_neuron * len(tgt_cells), 4))
-        for i_, tgt in enumerate(tgt_cells):
-            if self.params['direction_based_conn']:
-                p, latency = CC.get_p_conn_vec_xpred(tp_src, tp_tgt[tgt, :], self.params['w_sigma_x'], self.params['w_sigma_v'], self.params['connectivity_radius'])
-            else: # it's motion_based connectivity
-                p, latency = CC.get_p_conn_vec(tp_src, tp_tgt[tgt, :], self.params['w_sigma_x'], self.params['w_sigma_v'], self.params['connectivity_radius'], self.params['maximal_latency'])
-            if conn_type[0] == conn_type[1]:
-                p[tgt], latency[tgt] = 0., 0.
-            # random delays? --> np.permutate(latency) or latency[sources] * self.params['delay_scale'] * np.rand
-
-            sorted_indices = np.argsort(p)
-            if conn_type[0] == 'e':
-                sources = sorted_indices[-n_src_cells_per_neuron:]
-            else: # source = inhibitory
-                if conn_type[0] == conn_type[1]:
-                    sources = sorted_indices[1:n_src_cells_per_neuron+1]  # shift indices to avoid self-connection, because p_ii = .0
-                else:
-                    sources = sorted_indices[:n_src_cells_per_neuron]
-
-#            eta = 1e-9
-            eta = 0
-            w = (self.params['w_tgt_in_per_cell_%s' % conn_type] / (p[sources].sum() + eta)) * p[sources]
-#            print 'debug p', i_, tgt, p[sources]
-#            print 'debug sources', i_, tgt, sources
-#            print 'debug w', i_, tgt, w
-
-            delays = np.minimum(np.maximum(latency[sources] * self.params['delay_scale'], delay_min), delay_max)  # map the delay into the valid range
-            conn_list = np.array((sources, tgt * np.ones(n_src_cells_per_neuron), w, delays))
-            local_connlist[i_ * n_src_cells_per_neuron : (i_ + 1) * n_src_cells_per_neuron, :] = conn_list.transpose()
-            connector = FromListConnector(conn_list.transpose())
-            if self.params['with_short_term_depression']:
-                prj = Projection(src_pop, tgt_pop, connector, target=syn_type, synapse_dynamics=self.short_term_depression)
-            else:
-                prj = Projection(src_pop, tgt_pop, connector, target=syn_type)
-            self.projections[conn_type].append(prj)
+
+    def connect_from_list(self, conn_type, local_connlist):
+        """
+        Creates one projection for all local targets from local_connlist (src, tgt, w, delay)
+        """
+        (n_src, n_tgt, src_pop, tgt_pop, tp_src, tp_tgt, tgt_cells, syn_type) = self.resolve_src_tgt(conn_type)
+        connector = FromListConnector(local_connlist)
+        if self.params['with_short_term_depression']:
+            prj = Projection(src_pop, tgt_pop, connector, target=syn_type, synapse_dynamics=self.short_term_depression)
+        else:
+            prj = Projection(src_pop, tgt_pop, connector, target=syn_type)
+        self.projections[conn_type].append(prj)
 
         if self.debug_connectivity:
+            conn_list_fn = self.params['conn_list_%s_fn_base' % conn_type] + '%d.dat' % (self.pc_id)
             if self.pc_id == 0:
                 print 'DEBUG writing to file:', conn_list_fn
             np.savetxt(conn_list_fn, local_connlist, fmt='%d\t%d\t%.4e\t%.4e')
 
 
+    def get_unscaled_anisotropic_connlist(self, conn_type):
+        """
+        Computes the anisotropic connections (src, tgt, p, latency) targeting the local cells.
+        """
+        (n_src, n_tgt, src_pop, tgt_pop, tp_src, tp_tgt, tgt_cells, syn_type) = self.resolve_src_tgt(conn_type)
+        return CC.compute_unscaled_anisotropic_connlist(self.params, conn_type, tp_src, tp_tgt, tgt_cells)
+
+
     def connect_ee_random(self):
         """
             # # # # # # # # # # # # # # # # # # # # # # # # # # # #
@@ -459,7 +574,7 @@ class NetworkModel(object):
             latency = np.zeros(self.params['n_exc'], dtype='float32')
             for src in xrange(self.params['n_exc']):
                 if (src != tgt):
-                    p[src], latency[src] = CC.get_p_conn(self.tuning_prop_exc[src, :], self.tuning_prop_exc[tgt, :], sigma_x, sigma_v, params['connectivity_radius']) #                            print 'debug pc_id src tgt ', self.pc_id, src, tgt#, int(ID) < self.params['n_exc']
+                    p[src], latency[src] = CC.get_p_conn(self.tuning_prop_exc[src, :], self.tuning_prop_exc[tgt, :], sigma_x, sigma_v, self.params['connectivity_radius']) #                            print 'debug pc_id src tgt ', self.pc_id, src, tgt#, int(ID) < self.params['n_exc']
             sources = random.sample(xrange(self.params['n_exc']), int(self.params['n_src_cells_per_neuron']))
             idx = p[sources] > 0
             non_zero_idx = np.nonzero(idx)[0]
@@ -495,22 +610,22 @@ class NetworkModel(object):
         (n_src, n_tgt, src_pop, tgt_pop, tp_src, tp_tgt, tgt_cells, syn_type) = self.resolve_src_tgt(conn_type)
         if conn_type == 'ee':
             w_ = self.params['w_max']
-            w_tgt_in = params['w_tgt_in_per_cell_%s' % conn_type]
+            w_tgt_in = self.params['w_tgt_in_per_cell_%s' % conn_type]
             n_max_conn = n_src * n_tgt - n_tgt
 
         elif conn_type == 'ei':
             w_ = self.params['w_ei_mean']
-            w_tgt_in = params['w_tgt_in_per_cell_%s' % conn_type]
+            w_tgt_in = self.params['w_tgt_in_per_cell_%s' % conn_type]
             n_max_conn = n_src * n_tgt
 
         elif conn_type == 'ie':
             w_ = self.params['w_ie_mean']
-            w_tgt_in = params['w_tgt_in_per_cell_%s' % conn_type]
+            w_tgt_in = self.params['w_tgt_in_per_cell_%s' % conn_type]
             n_max_conn = n_src * n_tgt
 
         elif conn_type == 'ii':
             w_ = self.params['w_ii_mean']
-            w_tgt_in = params['w_tgt_in_per_cell_%s' % conn_type]
+            w_tgt_in = self.params['w_tgt_in_per_cell_%s' % conn_type]
             n_max_conn = n_src * n_tgt - n_tgt
 
         if self.debug_connectivity:
@@ -534,7 +649,7 @@ class NetworkModel(object):
                 boundaries=(self.params['delay_range'][0], self.params['delay_range'][1]))
 
         p_max = utils.get_pmax(self.params['p_%s' % conn_type], self.params['w_sigma_isotropic'], conn_type)
-        connector = DistanceDependentProbabilityConnector('%f * exp(-d/(2*%f**2))' % (p_max, params['w_sigma_isotropic']), allow_self_connections=False, \
+        connector = DistanceDependentProbabilityConnector('%f * exp(-d/(2*%f**2))' % (p_max, self.params['w_sigma_isotropic']), allow_self_connections=False, \
                 weights=w_dist, delays=delay_dist, space=self.torus)#, n_connections=n_conn_ee)
         if self.params['with_short_term_depression']:
             prj = Projection(src_pop, tgt_pop, connector, target=syn_type, synapse_dynamics=self.short_term_depression)
@@ -600,33 +715,31 @@ class NetworkModel(object):
             print 'Connect random connections %s - %s' % (conn_type[0].capitalize(), conn_type[1].capitalize())
         (n_src, n_tgt, src_pop, tgt_pop, tp_src, tp_tgt, tgt_cells, syn_type) = self.resolve_src_tgt(conn_type)
         w_mean = self.params['w_tgt_in_per_cell_%s' % conn_type] / (n_src * self.params['p_%s' % conn_type])
-        w_sigma = self.params['w_sigma_distribution'] * w_sigma
-
-        weight_distr = RandomDistribution('normal',
-                (w_mean, w_sigma),
-                rng=self.rng_conn,
-                constrain='redraw',
-                boundaries=(0, w_mean * 10.))
-
-        delay_dist = RandomDistribution('normal',
-                (self.params['standard_delay'], self.params['standard_delay_sigma']),
-                rng=self.rng_conn,
-                constrain='redraw',
-                boundaries=(self.params['delay_range'][0], self.params['delay_range'][1]))
-
-        connector= FastFixedProbabilityConnector(self.params['p_%s' % conn_type], weights=weight_distr, delays=delay_dist)
-        if self.params['with_short_term_depression']:
-            prj = Projection(src_pop, tgt_pop, connector, target=syn_type, synapse_dynamics=self.short_term_depression)
-        else:
-            prj = Projection(src_pop, tgt_pop, connector, target=syn_type)
+        w_sigma = self.params['w_sigma_distribution'] * w_mean
+        (delay_min, delay_max) = self.params['delay_range']
 
-        conn_list_fn = self.params['conn_list_%s_fn_base' % conn_type] + '%d.dat' % (self.pc_id)
-        print 'Saving random %s connections to %s' % (conn_type, conn_list_fn)
-        prj.saveConnections(conn_list_fn, gather=False)
+        # every target draws its sources, weights and delays from its own stream,
+        # so the connections do not depend on the number of processes
+        conn_lists = [np.zeros((0, 4))]
+        for tgt in tgt_cells:
+            rng = RandomStreams.get_rng(self.params['seed'], tgt, 'conn_%s' % conn_type)
+            connected = rng.rand(n_src) < self.params['p_%s' % conn_type]
+            if conn_type[0] == conn_type[1]:
+                connected[tgt] = False # no autapses
+            sources = np.nonzero(connected)[0]
+            conn_list = np.zeros((sources.size, 4))
+            conn_list[:, 0] = sources
+            conn_list[:, 1] = tgt
+            conn_list[:, 2] = RandomStreams.normal_redraw(rng, w_mean, w_sigma, sources.size, 0, w_mean * 10.)
+            conn_list[:, 3] = RandomStreams.normal_redraw(rng, self.params['standard_delay'], self.params['standard_delay_sigma'], sources.size, delay_min, delay_max)
+            conn_lists.append(conn_list)
+        local_connlist = np.concatenate(conn_lists)
+        self.local_connlists[conn_type] = local_connlist
+        self.connect_from_list(conn_type, local_connlist)
 
 
 
-    def connect_populations(self, conn_type):
+    def connect_populations(self, conn_type, local_connlist=None, unscaled_connlist=None):
         """
             # # # # # # # # # # # #
             #     C O N N E C T   #
@@ -634,7 +747,9 @@ class NetworkModel(object):
             Calls the right according to the flag set in simultation_parameters.py
         """
         if self.params['connectivity_%s' % conn_type] == 'anisotropic':
-            self.connect_anisotropic(conn_type)
+            self.connect_anisotropic(conn_type, local_connlist, unscaled_connlist)
+        elif self.params['connectivity_%s' % conn_type] == 'precomputed': # see precompute_connectivity.py
+            self.connect_precomputed(conn_type)
         elif self.params['connectivity_%s' % conn_type] == 'isotropic':
             self.connect_isotropic(conn_type)
         elif self.params['connectivity_%s' % conn_type] == 'random':
@@ -643,12 +758,28 @@ class NetworkModel(object):
             pass
 
 
+    @Instrumentation.timed('connect_noise')
     def connect_noise(self):
         """
             # # # # # # # # # # # # # # # #
             #     N O I S E   I N P U T   #
             # # # # # # # # # # # # # # # #
         """
+        if self.params['noise_connection_mode'] == 'population':
+            if self.pc_id == 0:
+                print "Connecting noise populations ... "
+            self.connect_noise_population(self.exc_pop, 'exc')
+            self.connect_noise_population(self.inh_pop, 'inh')
+            self.times['connect_noise'] = self.timer.diff()
+            return
+        elif self.params['noise_connection_mode'] == 'streams':
+            if self.pc_id == 0:
+                print "Connecting noise spike trains ... "
+            self.connect_noise_streams(self.exc_pop, 'exc', 0)
+            self.connect_noise_streams(self.inh_pop, 'inh', self.params['n_exc'])
+            self.times['connect_noise'] = self.timer.diff()
+            return
+
         if self.pc_id == 0:
             print "Connecting noise - exc ... "
         noise_pop_exc = []
@@ -679,7 +810,47 @@ class NetworkModel(object):
 
 
 
+    def connect_noise_population(self, tgt_pop, tgt_type):
+        """
+        For nest a single poisson_generator per rate is connected to all targets, the generator draws independent spike trains for each target.
+        Otherwise one SpikeSourcePoisson population per rate is connected one-to-one to tgt_pop.
+        """
+        for noise_type, syn_type in [('exc', 'excitatory'), ('inh', 'inhibitory')]:
+            rate = self.params['f_%s_noise' % noise_type]
+            w = self.params['w_%s_noise' % noise_type]
+            if (self.params['simulator'] == 'nest'):
+                noise_pop = Population(1, native_cell_type('poisson_generator'), {'rate' : rate}, label='noise_%s_%s' % (noise_type, tgt_type))
+                connector = AllToAllConnector(weights=w, delays=1.)
+            else:
+                noise_pop = Population(tgt_pop.size, SpikeSourcePoisson, {'rate' : rate}, label='noise_%s_%s' % (noise_type, tgt_type))
+                connector = OneToOneConnector(weights=w, delays=1.)
+            self.projections['noise_%s_%s' % (noise_type, tgt_type)] = Projection(noise_pop, tgt_pop, connector, target=syn_type)
+
 
+    def connect_noise_streams(self, tgt_pop, tgt_type, gid_offset):
+        """
+        The Poisson noise spike trains are drawn from the random streams of the target cells (gid = gid_offset + index)
+        and connected as SpikeSourceArray populations, so that the noise does not depend on the number of processes
+        (unlike the simulator's Poisson generators).
+        The trains are drawn for the local cells of the noise population, which are not the local cells of tgt_pop.
+        """
+        dt = self.params['dt_rate']
+        n_steps = int(self.params['t_sim'] / dt)
+        for noise_type, syn_type in [('exc', 'excitatory'), ('inh', 'inhibitory')]:
+            rate_of_t = self.params['f_%s_noise' % noise_type] * np.ones(n_steps)
+            noise_pop = Population(tgt_pop.size, SpikeSourceArray, label='noise_%s_%s' % (noise_type, tgt_type))
+            all_spike_times = np.empty(tgt_pop.size, dtype=object)
+            for i in xrange(tgt_pop.size):
+                all_spike_times[i] = np.array([])
+            for idx in get_local_mask_indices(noise_pop):
+                rng = RandomStreams.get_rng(self.params['seed'], gid_offset + idx, 'noise_%s' % noise_type)
+                all_spike_times[idx] = RandomStreams.poisson_spike_times(rng, rate_of_t, dt) + dt # spike times > 0
+            noise_pop.tset('spike_times', all_spike_times)
+            connector = OneToOneConnector(weights=self.params['w_%s_noise' % noise_type], delays=1.)
+            self.projections['noise_%s_%s' % (noise_type, tgt_type)] = Projection(noise_pop, tgt_pop, connector, target=syn_type)
+
+
+    @Instrumentation.timed('run')
     def run_sim(self, sim_cnt, record_v=True):
         # # # # # # # # # # # # # # # # # # # #
         #     P R I N T    W E I G H T S      #
@@ -702,14 +873,20 @@ class NetworkModel(object):
             record_exc = True
             n_rnd_cells_to_record = 2
         else:
-            n_cells_to_record = 5# self.params['n_exc'] * 0.02
-            gids_to_record = np.random.randint(0, self.params['n_exc'], n_cells_to_record)
+            n_cells_to_record = self.params['n_gids_to_record']
+            gids_to_record = RandomStreams.get_rng(self.params['np_random_seed'], 0, 'record').randint(0, self.params['n_exc'], n_cells_to_record)
 
+        self.volt_sampled = False
         if record_v:
             self.exc_pop_view = PopulationView(self.exc_pop, gids_to_record, label='good_exc_neurons')
             self.exc_pop_view.record_v()
-            self.inh_pop_view = PopulationView(self.inh_pop, np.random.randint(0, self.params['n_inh'], self.params['n_gids_to_record']), label='random_inh_neurons')
+            inh_to_record = RandomStreams.get_rng(self.params['np_random_seed'], 1, 'record').randint(0, self.params['n_inh'], self.params['n_gids_to_record'])
+            self.inh_pop_view = PopulationView(self.inh_pop, inh_to_record, label='random_inh_neurons')
             self.inh_pop_view.record_v()
+            if self.params['simulator'] == 'numpy': # decimated while recording, pyNN 0.7 can only decimate when writing
+                for pop_view in [self.exc_pop_view, self.inh_pop_view]:
+                    pop_view.set_v_sampling(self.params['volt_every_n_steps'], self.params['volt_t_window'])
+                self.volt_sampled = True
 
         self.inh_pop.record()
         self.exc_pop.record()
@@ -720,34 +897,158 @@ class NetworkModel(object):
         # # # # # # # # # # # # # #
         if self.pc_id == 0:
             print "Running simulation ... "
-        run(self.params['t_sim'])
+        if self.params['online_bcpnn']:
+            self.run_segmented(sim_cnt)
+        else:
+            run(self.params['t_sim'])
         self.times['t_sim'] = self.timer.diff()
 
-    def print_results(self, print_v=True):
+
+    def run_segmented(self, sim_cnt):
         """
-            # # # # # # # # # # # # # # # # #
-            #   P R I N T    R E S U L T S  #
-            # # # # # # # # # # # # # # # # #
+        Runs the simulation in segments of params['t_segment'] and after every segment updates the E - E weights
+        from the BCPNN traces of the spikes in this segment (online learning instead of Bcpnn.bcpnn_offline_noColumns
+        after the simulation). The learned connection list and biases are written for sim_cnt + 1.
+        If self.online_bcpnn has been set (learning of a previous run), its traces are advanced further.
+        Afterwards local_connlists['ee'] holds the learned weights.
         """
-        if print_v:
-            if self.pc_id == 0:
-                print 'print_v to file: %s.v' % (self.params['exc_volt_fn_base'])
-            self.exc_pop_view.print_v("%s.v" % (self.params['exc_volt_fn_base']), compatible_output=False)
+        assert (self.local_connlists.has_key('ee') and len(self.projections['ee']) == 1), \
+                'Online learning requires the E - E connections from a connection list (connectivity_ee anisotropic or precomputed)'
+        prj = self.projections['ee'][0]
+        if self.online_bcpnn == None:
+            self.online_bcpnn = Bcpnn.OnlineBcpnn(self.params, self.local_connlists['ee'], self.params['n_exc'], self.params['n_exc'])
+            continued = False
+        else:
+            continued = True
+        # the weights are set as list in the order of the local connections of the projection, mapped once
+        (prj_src, prj_tgt) = get_connection_indices(prj)
+        order = self.online_bcpnn.get_connection_order(prj_src, prj_tgt)
+        if continued:
+            prj.setWeights(self.online_bcpnn.get_weights()[order])
+        t, t_sim = 0., self.params['t_sim']
+        while t < t_sim:
+            t_stop = min(t + self.params['t_segment'], t_sim)
+            run(t_stop - t)
+            with self.instrumentation.section('learn'):
+                spikes = self.get_segment_spikes(self.exc_pop, t, t_stop)
+                self.online_bcpnn.update(spikes, spikes, t, t_stop)
+                prj.setWeights(self.online_bcpnn.get_weights()[order])
             if self.pc_id == 0:
-                print "Printing inhibitory membrane potentials"
-            self.inh_pop_view.print_v("%s.v" % (self.params['inh_volt_fn_base']), compatible_output=False)
+                print 't = %.1f ms: updated %d E - E weights from %d spikes' % (t_stop, len(self.local_connlists['ee']), spikes.shape[0])
+            t = t_stop
+        self.save_online_bcpnn(sim_cnt)
+        self.local_connlists['ee'] = self.online_bcpnn.get_conn_list()
 
-        if self.pc_id == 0:
-            print "Printing excitatory spikes"
-        self.exc_pop.printSpikes(self.params['exc_spiketimes_fn_merged'] + '.ras')
-        if self.pc_id == 0:
-            print "Printing inhibitory spikes"
-        self.inh_pop.printSpikes(self.params['inh_spiketimes_fn_merged'] + '.ras')
 
-        self.times['t_print'] = self.timer.diff()
+    def get_segment_spikes(self, pop, t_start, t_stop):
+        """
+        Returns the spikes (idx, t) of all cells of pop with t_start <= t < t_stop, gathered from all processes
+        """
+        spikes = np.array(pop.getSpikes(gather=False)).reshape((-1, 2))
+        spikes = spikes[(spikes[:, 1] >= t_start) & (spikes[:, 1] < t_stop), :]
+        if self.comm != None:
+            spikes = np.concatenate(self.comm.allgather(spikes))
+        return spikes
+
+
+    def save_online_bcpnn(self, sim_cnt):
+        """
+        Writes the learned E - E connections and the biases in the format of Bcpnn.bcpnn_offline_noColumns
+        """
+        conn_list = self.online_bcpnn.get_conn_list()
+        output_fn_conn_list = self.params['conn_list_ee_fn_base'] + str(sim_cnt+1) + '.dat'
+        output_fn_bias = self.params['bias_values_fn_base'] + str(sim_cnt+1) + '.dat'
+        if self.comm != None:
+            n_total = self.comm.allreduce(conn_list.shape[0])
+            utils.gather_conn_list(self.comm, conn_list, n_total, output_fn_conn_list)
+        else:
+            print 'Saving learned connections to:', output_fn_conn_list
+            np.savetxt(output_fn_conn_list, conn_list)
+        if self.pc_id == 0: # all processes have the biases of all cells, because the spikes are gathered
+            print 'Saving biases to:', output_fn_bias
+            np.savetxt(output_fn_bias, self.online_bcpnn.get_bias())
+
+    def print_spikes_binary(self):
+        """
+        Every process writes the spikes of its local cells to its own binary file (see BinaryStore),
+        process 0 merges them into exc_spiketimes_fn_merged + '.bin' (inh respectively) sorted by time.
+        """
+        for cell_type, pop in [('exc', self.exc_pop), ('inh', self.inh_pop)]:
+            spikes = pop.getSpikes(gather=False) # (gid, t)
+            fn = self.params['%s_spiketimes_fn_base' % cell_type] + 'rank%d.bin' % self.pc_id
+            if len(spikes) == 0:
+                spikes = np.zeros((0, 2))
+            BinaryStore.write_spikes(fn, spikes[:, 1], spikes[:, 0])
+        if self.comm != None:
+            self.comm.Barrier()
         if self.pc_id == 0:
-            print "calling pyNN.end() ...."
-        end()
+            for cell_type in ['exc', 'inh']:
+                fns = [self.params['%s_spiketimes_fn_base' % cell_type] + 'rank%d.bin' % pid for pid in xrange(self.n_proc)]
+                BinaryStore.merge_spike_files(fns, self.params['%s_spiketimes_fn_merged' % cell_type] + '.bin')
+
+
+    def print_volt(self, cell_type, pop_view):
+        """
+        Writes the membrane potentials of the recorded cells, decimated to every params['volt_every_n_steps']-th
+        time step within params['volt_t_window'].
+        volt_output_format == 'binary': every process writes its cells to volt_fn_base + 'rank%d' (.vbin + index),
+        process 0 concatenates them into volt_fn_base + '.vbin' (read with utils.load_volt_traces or BinaryStore.load_volt_trace)
+        """
+        fn_base = self.params['%s_volt_fn_base' % cell_type]
+        decimate = ((self.params['volt_every_n_steps'] > 1) or (self.params['volt_t_window'] != None)) and not self.volt_sampled
+        if self.params['volt_output_format'] == 'binary':
+            d = pop_view.get_v(gather=False, compatible_output=False)
+            if len(d) == 0:
+                d = np.zeros((0, 3))
+            if decimate:
+                d = utils.decimate_volt(d, self.params['volt_every_n_steps'], self.params['volt_t_window'])
+            BinaryStore.write_volt(fn_base + 'rank%d' % self.pc_id, d)
+            if self.comm != None:
+                self.comm.Barrier()
+            if self.pc_id == 0:
+                BinaryStore.merge_volt_files([fn_base + 'rank%d' % pid for pid in xrange(self.n_proc)], fn_base)
+            return
+        if self.pc_id == 0 and os.path.exists(fn_base + '.vbin'): # from an earlier run in this folder, would be read instead of the .v file
+            os.remove(fn_base + '.vbin')
+            os.remove(fn_base + '_index.npy')
+        if decimate:
+            d = pop_view.get_v(gather=True, compatible_output=False)
+            if self.pc_id == 0:
+                print 'Printing decimated membrane potentials to file: %s.v' % (fn_base)
+                np.savetxt(fn_base + '.v', utils.decimate_volt(np.array(d), self.params['volt_every_n_steps'], self.params['volt_t_window']))
+        else:
+            if self.pc_id == 0:
+                print 'print_v to file: %s.v' % (fn_base)
+            pop_view.print_v("%s.v" % (fn_base), compatible_output=False)
+
+
+    def print_results(self, print_v=True, call_end=True):
+        """
+            # # # # # # # # # # # # # # # # #
+            #   P R I N T    R E S U L T S  #
+            # # # # # # # # # # # # # # # # #
+        call_end : if False, pyNN.end() is not called so that the simulator can be used for further runs (see SimulationSession)
+        """
+        with self.instrumentation.section('print'): # closed also if printing fails
+            if print_v:
+                self.print_volt('exc', self.exc_pop_view)
+                self.print_volt('inh', self.inh_pop_view)
+
+            if self.params['spike_output_format'] == 'binary':
+                self.print_spikes_binary()
+            else:
+                if self.pc_id == 0:
+                    print "Printing excitatory spikes"
+                self.exc_pop.printSpikes(self.params['exc_spiketimes_fn_merged'] + '.ras')
+                if self.pc_id == 0:
+                    print "Printing inhibitory spikes"
+                self.inh_pop.printSpikes(self.params['inh_spiketimes_fn_merged'] + '.ras')
+
+            self.times['t_print'] = self.timer.diff()
+        if call_end:
+            if self.pc_id == 0:
+                print "calling pyNN.end() ...."
+            end()
         self.times['t_end'] = self.timer.diff()
 
         if self.pc_id == 0:
@@ -763,13 +1064,126 @@ class NetworkModel(object):
             output = {'times' : self.times, 'n_cells_proc' : self.n_cells}
             print "Proc %d Simulation time: %d sec or %.1f min for %d cells (%d exc %d inh)" % (self.pc_id, self.times['t_sim'], (self.times['t_sim'])/60., self.params['n_cells'], self.params['n_exc'], self.params['n_inh'])
             print "Proc %d Full pyNN run time: %d sec or %.1f min for %d cells (%d exc %d inh)" % (self.pc_id, self.times['t_all'], (self.times['t_all'])/60., self.params['n_cells'], self.params['n_exc'], self.params['n_inh'])
-            fn = utils.convert_to_url(params['folder_name'] + 'times_dict_np%d.py' % self.n_proc)
+            fn = utils.convert_to_url(self.params['folder_name'] + 'times_dict_np%d.py' % self.n_proc)
             output = ntp.ParameterSet(output)
             output.save(fn)
 
+        # all processes: per-process times and memory reduced to min / max / mean
+        self.instrumentation.write(self.params['instrumentation_fn_base'] + 'np%d.json' % self.n_proc, \
+                extra={'n_exc' : self.params['n_exc'], 'n_inh' : self.params['n_inh'], 'n_cells' : self.params['n_cells']})
+
+
+class SimulationSession(object):
+    """
+    Runs several simulations in one interpreter: pyNN and the simulator are imported only once,
+    the network is rebuilt for every run (setup() resets the kernel) and
+    tuning properties, input spike trains and connection lists are kept in memory as long as
+    the parameters they depend on do not change (e.g. when sweeping post-synaptic parameters).
+    Across interpreters the same artefacts are reused via the ArtefactCache.
+
+    Usage:
+        session = SimulationSession(ps, comm)
+        for w_ee in [.3, .35, .4]:
+            session.run({'w_tgt_in_per_cell_ee' : w_ee, 'folder_name' : 'Sweep_wee%.2f/' % w_ee})
+        session.end()
+    """
+    # the parameters tuning properties, input and connections depend on are listed in ArtefactCache
+
+    def __init__(self, parameter_storage, comm=None):
+        self.ParameterStorage = parameter_storage
+        self.comm = comm
+        if self.comm != None:
+            self.pc_id, self.n_proc = self.comm.rank, self.comm.size
+        else:
+            self.pc_id, self.n_proc = 0, 1
+        self.sim_cnt = 0
+        self.tuning_prop = None
+        self.spike_times_container = None
+        self.local_connlists = {}
+        self.unscaled_connlists = {}
+        self.online_bcpnn = None
+        self.dependencies = {}
+
+
+    def is_unchanged(self, name, values):
+        """
+        Returns True if values are the same as for the previous run and stores values for the next run.
+        """
+        unchanged = (self.dependencies.get(name, None) == values)
+        self.dependencies[name] = values
+        return unchanged
+
+
+    def run(self, new_params={}, record_v=True, load_files=False):
+        """
+        new_params : dictionary with the parameters that differ from the current ones, e.g. {'w_tgt_in_per_cell_ee' : .4, 'folder_name' : ... }
+            if empty, the parameters currently stored in the parameter_storage are used
+        """
+        t0 = time.time()
+        if len(new_params) > 0:
+            self.ParameterStorage.update_values(new_params)
+        params = self.ParameterStorage.params
+        if self.pc_id == 0:
+            self.ParameterStorage.create_folders()
+            self.ParameterStorage.write_parameters_to_file()
+        if self.comm != None:
+            self.comm.Barrier()
+
+        reuse_tuning_prop = self.is_unchanged('tuning_prop', ArtefactCache.get_dependencies(params, 'tuning_prop'))
+        # the spike trains are kept for the local cells of the stimulus population or of exc_pop, see NetworkModel.create
+        input_deps = ArtefactCache.get_dependencies(params, 'input') + [('input_connection_mode', params['input_connection_mode'])]
+        reuse_input = self.is_unchanged('input', input_deps) and reuse_tuning_prop
+        reuse_conns, reuse_scaling = {}, {}
+        for conn_type in ['ee', 'ei', 'ie', 'ii']:
+            reuse_conns[conn_type] = self.is_unchanged('conn_%s' % conn_type, ArtefactCache.get_dependencies(params, 'conn', conn_type)) and reuse_tuning_prop
+            reuse_scaling[conn_type] = self.is_unchanged('conn_scaling_%s' % conn_type, ArtefactCache.get_conn_scaling(params, conn_type))
+
+        NM = NetworkModel(params, self.comm)
+        if reuse_tuning_prop:
+            NM.setup(times={'time_to_import' : 0.}, sim_cnt=self.sim_cnt, tuning_prop=self.tuning_prop)
+        else:
+            NM.setup(times={'time_to_import' : 0.}, sim_cnt=self.sim_cnt)
+        self.tuning_prop = (NM.tuning_prop_exc, NM.tuning_prop_inh)
+
+        NM.create(input_created=reuse_input)
+        if reuse_input:
+            NM.spike_times_container = self.spike_times_container
+        else:
+            self.spike_times_container = NM.create_input(load_files=load_files, save_output=not load_files)
+
+        local_connlists, unscaled_connlists = {}, {}
+        for conn_type in ['ee', 'ei', 'ie', 'ii']:
+            if reuse_conns[conn_type] and reuse_scaling[conn_type] and self.local_connlists.has_key(conn_type):
+                local_connlists[conn_type] = self.local_connlists[conn_type]
+            elif reuse_conns[conn_type] and self.unscaled_connlists.has_key(conn_type): # e.g. sweeping w_tgt_in_per_cell or delay_scale
+                unscaled_connlists[conn_type] = self.unscaled_connlists[conn_type]
+        NM.connect(local_connlists, unscaled_connlists)
+        if params['online_bcpnn'] and local_connlists.has_key('ee'): # continuous plasticity: the learning goes on from the previous run
+            NM.online_bcpnn = self.online_bcpnn
+
+        NM.run_sim(self.sim_cnt, record_v=record_v)
+        self.local_connlists = NM.local_connlists # with online_bcpnn the E - E list has the learned weights
+        self.unscaled_connlists = NM.unscaled_connlists
+        self.online_bcpnn = NM.online_bcpnn
+        NM.print_results(print_v=record_v, call_end=False)
+        if self.pc_id == 0:
+            print 'Session run %d took %.1f sec (reused tuning_prop: %s, input: %s, connections: %s)' % (self.sim_cnt, time.time() - t0, \
+                    reuse_tuning_prop, reuse_input, ', '.join(local_connlists.keys() + unscaled_connlists.keys()))
+        self.sim_cnt += 1
+        return NM
+
+
+    def end(self):
+        end()
+
 
 if __name__ == '__main__':
 
+    ps = simulation_parameters.parameter_storage()
+    params = ps.params
+    comm, pc_id, n_proc = LazyImports.get_comm()
+    USE_MPI = (comm != None)
+    print "USE_MPI:", USE_MPI, 'pc_id, n_proc:', pc_id, n_proc
     input_created = False
 #     w_sigma_x = float(sys.argv[1])
 #     w_sigma_v = float(sys.argv[2])
@@ -782,17 +1196,26 @@ if __name__ == '__main__':
 #    delay_scale = float(sys.argv[3])
 #    ps.params['delay_scale'] = delay_scale
 
-    ps.set_filenames()
+    if len(sys.argv) > 1: # parameter file (or folder) written before, e.g. by SweepRunner
+        param_fn = sys.argv[1]
+        if os.path.isdir(param_fn):
+            param_fn += '/Parameters/simulation_parameters.json'
+        print 'Loading parameters from', param_fn
+        f = file(param_fn, 'r')
+        ps.update_values(json.load(f))
+        f.close()
+    else:
+        ps.set_filenames()
     if pc_id == 0:
         ps.create_folders()
         ps.write_parameters_to_file()
     if comm != None:
         comm.Barrier()
     sim_cnt = 0
-    max_neurons_to_record = 15800
+    max_neurons_to_record = 15800 # larger networks: no input files, membrane potentials only with the binary output
     if params['n_cells'] > max_neurons_to_record:
         load_files = False
-        record = False
+        record = (params['volt_output_format'] == 'binary')
         save_input_files = False
     else: # choose yourself
         load_files = False
@@ -811,17 +1234,16 @@ if __name__ == '__main__':
     NM.run_sim(sim_cnt, record_v=record)
     NM.print_results(print_v=record)
 
-    if pc_id == 0 and params['n_cells'] < max_neurons_to_record:
-        import plot_prediction as pp
-        pp.plot_prediction(params)
-        os.system('python plot_rasterplots.py %s' % ps.params['folder_name'])
-        os.system('python plot_connectivity_profile.py %s' % ps.params['folder_name'])
-    if pc_id == 1 or not(USE_MPI):
-        os.system('python plot_connectivity_profile.py %s' % ps.params['folder_name'])
-        for conn_type in ['ee', 'ei', 'ie', 'ii']:
-            os.system('python plot_weight_and_delay_histogram.py %s %s' % (conn_type, ps.params['folder_name']))
-    if pc_id == 1 or not(USE_MPI):
-        os.system('python analyse_connectivity.py %s' % ps.params['folder_name'])
+    if pc_id == 0: # all figures are rendered by a pool of processes sharing the loaded data, see PlotDriver
+        figure_names = ['connectivity_profile'] + ['%s_%s' % (figure, conn_type) for conn_type in ['ee', 'ei', 'ie', 'ii'] \
+                for figure in ['weight_and_delay_histogram', 'connectivity_analysis']]
+        if params['n_cells'] < max_neurons_to_record:
+            figure_names = ['prediction', 'rasterplots'] + figure_names
+        if USE_MPI: # do not fork MPI processes, one separate interpreter renders all figures
+            os.system('python PlotDriver.py %s %s' % (ps.params['folder_name'], ' '.join(figure_names)))
+        else:
+            import PlotDriver
+            PlotDriver.plot_figures(ps.params, figure_names)
 
     if comm != None:
         comm.Barrier()
@@ -0,0 +1,727 @@
+"""
+Pure NumPy simulator for networks of IF_cond_exp neurons, implementing the subset of the pyNN (0.7) API
+that NetworkModel uses, so that small and mid-size networks can be simulated without NEST:
+    setup, run, end, create, connect, Population, PopulationView, Projection,
+    FromListConnector, FromFileConnector, OneToOneConnector, AllToAllConnector, FastFixedProbabilityConnector,
+    DistanceDependentProbabilityConnector (with Space for the distances on the torus),
+    IF_cond_exp, SpikeSourceArray, SpikeSourcePoisson, NumpyRNG, RandomDistribution
+Select it with params['simulator'] = 'numpy'. It runs in a single process (all cells are local).
+
+Neuron model (as NEST's iaf_cond_exp):
+    cm dv/dt = cm / tau_m * (v_rest - v) + g_E * (e_rev_E - v) + g_I * (e_rev_I - v) + i_offset
+    g_E, g_I decay exponentially with tau_syn_E, tau_syn_I and jump by the weight [uS] of an incoming spike.
+v is integrated with the exponential Euler method (exact for constant conductances within one time step),
+after a spike v is clamped to v_reset for tau_refrac.
+Spikes are delivered through a ring buffer per population and receptor type with one slot per time step,
+so every connection can have its own delay (rounded to the time step, within [min_delay, max_delay]).
+"""
+import time
+import numpy as np
+
+__version__ = '0.7 subset (NumpySimulator)'
+
+
+class State(object):
+    """
+    Everything that setup() resets: time, populations, projections, random numbers
+    """
+    def __init__(self, timestep=0.1, min_delay=0.1, max_delay=10., seed=None):
+        self.dt = timestep
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.n_slots = int(round(max_delay / timestep)) + 2 # ring buffer length (neuron spikes arrive one step later, see Projection.propagate)
+        self.step_cnt = 0
+        self.next_id = 1 # IDs are 1 aligned as in NEST
+        self.populations = []
+        self.projections = []
+        self.rng = np.random.RandomState(seed)
+
+    def get_time(self):
+        return self.step_cnt * self.dt
+
+state = State()
+
+
+def setup(timestep=0.1, min_delay=0.1, max_delay=10., rng_seeds_seed=None, **extra_params):
+    global state
+    state = State(timestep, min_delay, max_delay, rng_seeds_seed)
+    return 0
+
+
+def end(compatible_output=True):
+    pass
+
+
+def rank():
+    return 0
+
+
+def num_processes():
+    return 1
+
+
+def get_current_time():
+    return state.get_time()
+
+
+def run(simtime):
+    """
+    Advances the simulation by simtime [ms], can be called several times
+    """
+    n_steps = int(round(simtime / state.dt))
+    neurons = [pop for pop in state.populations if not pop.celltype.is_source]
+    sources = [pop for pop in state.populations if pop.celltype.is_source]
+    for pop in state.populations:
+        pop.prepare()
+    for i_step in xrange(n_steps):
+        step = state.step_cnt
+        for pop in sources:
+            pop.emit(step)
+        for pop in neurons:
+            pop.update(step)
+        for prj in state.projections:
+            prj.propagate(step)
+        state.step_cnt += 1
+    return state.get_time()
+
+
+# # # # # # # # # # # #
+#   C E L L  T Y P E S
+# # # # # # # # # # # #
+class IF_cond_exp(object):
+    default_parameters = {'cm' : 1.0, 'tau_m' : 20.0, 'tau_refrac' : 0.1, 'tau_syn_E' : 5.0, 'tau_syn_I' : 5.0, \
+            'e_rev_E' : 0.0, 'e_rev_I' : -70.0, 'v_thresh' : -50.0, 'v_reset' : -65.0, 'v_rest' : -65.0, 'i_offset' : 0.0}
+    is_source = False
+    supported = True
+
+
+class SpikeSourceArray(object):
+    default_parameters = {'spike_times' : []}
+    is_source = True
+    supported = True
+
+
+class SpikeSourcePoisson(object):
+    default_parameters = {'rate' : 1.0, 'start' : 0.0, 'duration' : 1e10}
+    is_source = True
+    supported = True
+
+
+class IF_cond_alpha(IF_cond_exp):
+    supported = False
+
+
+class EIF_cond_exp_isfa_ista(IF_cond_exp):
+    supported = False
+
+
+def native_cell_type(name):
+    raise NotImplementedError, 'NumpySimulator has no native cell types (%s), use the pyNN standard cell types' % name
+
+
+class SynapseDynamics(object):
+    def __init__(self, fast=None, slow=None):
+        self.fast, self.slow = fast, slow
+
+
+class TsodyksMarkramMechanism(object):
+    def __init__(self, U=0.5, tau_rec=100.0, tau_facil=0.0, u0=0.0, x0=1.0, y0=0.0):
+        self.parameters = {'U' : U, 'tau_rec' : tau_rec, 'tau_facil' : tau_facil}
+
+
+# # # # # # # # # # # # # # #
+#   R A N D O M   N U M B E R S
+# # # # # # # # # # # # # # #
+class NumpyRNG(object):
+    def __init__(self, seed=None, parallel_safe=True):
+        self.seed = seed
+        self.rng = np.random.RandomState(seed)
+
+    def next(self, n=1, distribution='uniform', parameters=[]):
+        values = getattr(self.rng, distribution)(*parameters, size=n)
+        if n == 1:
+            return values[0]
+        return values
+
+
+class RandomDistribution(object):
+    def __init__(self, distribution='uniform', parameters=[], rng=None, constrain='clip', boundaries=None):
+        self.distribution = distribution
+        self.parameters = parameters
+        if rng == None:
+            rng = NumpyRNG(state.rng.randint(2**31))
+        self.rng = rng
+        self.constrain = constrain
+        self.boundaries = boundaries
+
+    def next(self, n=1):
+        values = np.atleast_1d(self.rng.next(n, self.distribution, self.parameters))
+        if self.boundaries != None:
+            (low, high) = self.boundaries
+            if self.constrain == 'clip':
+                values = np.clip(values, low, high)
+            elif self.constrain == 'redraw':
+                invalid = (values < low) | (values > high)
+                while invalid.any():
+                    values[invalid] = np.atleast_1d(self.rng.next(invalid.sum(), self.distribution, self.parameters))
+                    invalid = (values < low) | (values > high)
+        if n == 1:
+            return values[0]
+        return values
+
+
+def get_values(x, n):
+    """
+    Returns n values from a scalar, an array or a RandomDistribution
+    """
+    if isinstance(x, RandomDistribution):
+        return np.atleast_1d(x.next(n)).astype(np.float64)
+    x = np.asarray(x, dtype=np.float64)
+    if x.ndim == 0:
+        return x * np.ones(n)
+    return x
+
+
+class Timer(object):
+
+    def __init__(self):
+        self.start()
+
+    def start(self):
+        self._start_time = time.time()
+        self._last_check = self._start_time
+
+    def elapsedTime(self):
+        return time.time() - self._start_time
+
+    def diff(self):
+        t = time.time()
+        diff = t - self._last_check
+        self._last_check = t
+        return diff
+
+
+class Space(object):
+    """
+    axes : e.g. 'xy', the coordinates used for the distances (default all three)
+    periodic_boundaries : ((x_min, x_max), (y_min, y_max), ..) or None per axis
+    """
+    def __init__(self, axes=None, scale_factor=1.0, offset=0.0, periodic_boundaries=None):
+        if axes == None:
+            axes = 'xyz'
+        self.axes = ['xyz'.index(axis) for axis in axes]
+        self.scale_factor = scale_factor
+        self.offset = offset
+        self.periodic_boundaries = periodic_boundaries
+
+    def distances(self, A, B):
+        """
+        A : positions (3, n_A), B : positions (3, n_B)
+        Returns the distances (n_A, n_B)
+        """
+        d2 = np.zeros((A.shape[1], B.shape[1]))
+        for i_, axis in enumerate(self.axes):
+            diff = np.abs(A[axis, :][:, np.newaxis] - B[axis, :][np.newaxis, :])
+            if self.periodic_boundaries != None and self.periodic_boundaries[i_] != None:
+                length = self.periodic_boundaries[i_][1] - self.periodic_boundaries[i_][0]
+                diff = np.minimum(diff, length - diff)
+            d2 += diff**2
+        return np.sqrt(d2) * self.scale_factor + self.offset
+
+
+# # # # # # # # # # # #
+#   P O P U L A T I O N S
+# # # # # # # # # # # #
+class ID(int):
+    """
+    Global cell id (1 aligned) that knows its population and its index in the population
+    """
+    def __new__(cls, n, parent, index):
+        obj = int.__new__(cls, n)
+        obj.parent = parent
+        obj.index = index
+        return obj
+
+
+class Population(object):
+
+    def __init__(self, size, cellclass, cellparams=None, label=None):
+        if not cellclass.supported:
+            raise NotImplementedError, 'NumpySimulator does not support %s' % cellclass.__name__
+        self.size = int(size)
+        self.celltype = cellclass
+        self.label = label
+        self.first_id = state.next_id
+        state.next_id += self.size
+        self.parameters = dict(cellclass.default_parameters)
+        if cellparams != None:
+            self.parameters.update(cellparams)
+        self.positions = np.zeros((3, self.size))
+        self.record_spikes = False
+        self.spike_idx = [] # one array of spiking indices per time step with spikes
+        self.spike_t = []
+        self.recorded_v_idx = np.zeros(0, dtype=np.int64)
+        self.v_every_n_steps = 1
+        self.v_t_window = None
+        self.v_step_cnt = 0
+        self.v_t = []
+        self.v_values = []
+        if cellclass == SpikeSourceArray:
+            self.tset('spike_times', [self.parameters['spike_times'] for i in xrange(self.size)])
+        elif not cellclass.is_source:
+            self.v = get_values(self.parameters['v_rest'], self.size)
+            self.g_E = np.zeros(self.size)
+            self.g_I = np.zeros(self.size)
+            self.refrac_cnt = np.zeros(self.size, dtype=np.int64)
+            self.buffer_E = np.zeros((state.n_slots, self.size))
+            self.buffer_I = np.zeros((state.n_slots, self.size))
+        state.populations.append(self)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return ID(self.first_id + index, self, index)
+
+    def all(self):
+        for index in xrange(self.size):
+            yield self[index]
+
+    def is_local(self, id):
+        return True
+
+    def id_to_index(self, id):
+        return int(id) - self.first_id
+
+    def initialize(self, variable, value):
+        assert (variable == 'v'), 'NumpySimulator can only initialize v'
+        self.v = get_values(value, self.size)
+
+    def set(self, param, val=None):
+        if type(param) == type({}):
+            self.parameters.update(param)
+        else:
+            self.parameters[param] = val
+        if self.celltype == SpikeSourceArray and (type(param) == type({}) and param.has_key('spike_times') or param == 'spike_times'):
+            self.tset('spike_times', [self.parameters['spike_times'] for i in xrange(self.size)])
+
+    def tset(self, parametername, value_array):
+        """
+        Sets one value per cell, for spike_times one array per cell
+        """
+        if parametername == 'spike_times':
+            steps, idx = [], []
+            for i in xrange(self.size):
+                st = np.array(value_array[i], dtype=np.float64).flatten()
+                steps.append(np.round(st / state.dt).astype(np.int64))
+                idx.append(i * np.ones(st.size, dtype=np.int64))
+            steps, idx = np.concatenate(steps), np.concatenate(idx)
+            order = np.argsort(steps, kind='mergesort')
+            self.event_steps, self.event_idx = steps[order], idx[order]
+        else:
+            self.parameters[parametername] = np.array(value_array, dtype=np.float64)
+
+    def rset(self, parametername, rand_distr):
+        self.tset(parametername, rand_distr.next(self.size))
+
+    def record(self, record_from=None, rng=None, to_file=True):
+        self.record_spikes = True
+
+    def record_v(self, record_from=None, rng=None, to_file=True):
+        self.add_recorded_v(np.arange(self.size))
+
+    def add_recorded_v(self, indices):
+        self.recorded_v_idx = np.union1d(self.recorded_v_idx, np.array(indices, dtype=np.int64))
+
+    def set_v_sampling(self, every_n_steps=1, t_window=None):
+        """
+        Not in pyNN: the membrane potential is stored only every n-th time step within t_window = (t_start, t_stop),
+        so that many cells can be recorded in long runs (same time steps as utils.decimate_volt)
+        """
+        self.v_every_n_steps = int(every_n_steps)
+        self.v_t_window = t_window
+
+    # # # # # # # # # # # #
+    #   S I M U L A T I O N
+    # # # # # # # # # # # #
+    def prepare(self):
+        """
+        Computes the per-cell constants from the current parameters (called at the beginning of every run)
+        """
+        p = dict([(name, get_values(value, self.size)) for (name, value) in self.parameters.iteritems() if name != 'spike_times'])
+        if self.celltype == IF_cond_exp:
+            self.g_leak = p['cm'] / p['tau_m']
+            self.decay_E = np.exp(-state.dt / p['tau_syn_E'])
+            self.decay_I = np.exp(-state.dt / p['tau_syn_I'])
+            self.refrac_steps = np.round(p['tau_refrac'] / state.dt).astype(np.int64)
+            self.p = p
+        elif self.celltype == SpikeSourcePoisson:
+            self.p_spike = p['rate'] * state.dt / 1000.
+            self.p = p
+        if self.celltype == SpikeSourceArray:
+            # first event that has not been emitted yet
+            self.event_ptr = np.searchsorted(self.event_steps, state.step_cnt, side='left')
+
+    def emit(self, step):
+        """
+        Spike sources: finds the cells that spike in this time step
+        """
+        if self.celltype == SpikeSourceArray:
+            end = np.searchsorted(self.event_steps, step, side='right')
+            spiking = self.event_idx[self.event_ptr:end]
+            self.event_ptr = end
+        else:
+            t = step * state.dt
+            active = (t >= self.p['start']) & (t < self.p['start'] + self.p['duration'])
+            spiking = np.nonzero(active & (state.rng.rand(self.size) < self.p_spike))[0]
+        self.spiking = spiking
+        if self.record_spikes and spiking.size > 0:
+            self.spike_idx.append(spiking)
+            self.spike_t.append(step * state.dt * np.ones(spiking.size))
+
+    def update(self, step):
+        """
+        Neurons: delivers the spikes arriving in this time step and integrates over one time step
+        """
+        slot = step % state.n_slots
+        self.g_E += self.buffer_E[slot]
+        self.g_I += self.buffer_I[slot]
+        self.buffer_E[slot] = 0.
+        self.buffer_I[slot] = 0.
+        p = self.p
+        g_total = self.g_leak + self.g_E + self.g_I
+        v_inf = (self.g_leak * p['v_rest'] + self.g_E * p['e_rev_E'] + self.g_I * p['e_rev_I'] + p['i_offset']) / g_total
+        v = v_inf + (self.v - v_inf) * np.exp(-state.dt * g_total / p['cm'])
+        refractory = self.refrac_cnt > 0
+        v[refractory] = p['v_reset'][refractory]
+        self.refrac_cnt[refractory] -= 1
+        spiking = np.nonzero(v >= p['v_thresh'])[0]
+        v[spiking] = p['v_reset'][spiking]
+        self.refrac_cnt[spiking] = self.refrac_steps[spiking]
+        self.v = v
+        self.g_E *= self.decay_E
+        self.g_I *= self.decay_I
+        self.spiking = spiking
+        t = (step + 1) * state.dt # spikes and voltages are recorded at the end of the time step
+        if self.record_spikes and spiking.size > 0:
+            self.spike_idx.append(spiking)
+            self.spike_t.append(t * np.ones(spiking.size))
+        if self.recorded_v_idx.size > 0 and (self.v_t_window == None or self.v_t_window[0] <= t <= self.v_t_window[1]):
+            if self.v_step_cnt % self.v_every_n_steps == 0:
+                self.v_t.append(t)
+                self.v_values.append(v[self.recorded_v_idx])
+            self.v_step_cnt += 1
+
+    # # # # # # # # # # #
+    #   R E C O R D I N G
+    # # # # # # # # # # #
+    def getSpikes(self, gather=True, compatible_output=True):
+        """
+        Returns array with rows (index, t)
+        """
+        if len(self.spike_idx) == 0:
+            return np.zeros((0, 2))
+        spikes = np.zeros((sum([idx.size for idx in self.spike_idx]), 2))
+        spikes[:, 0] = np.concatenate(self.spike_idx)
+        spikes[:, 1] = np.concatenate(self.spike_t)
+        return spikes
+
+    def get_spike_counts(self, gather=True):
+        spikes = self.getSpikes()
+        counts = np.bincount(spikes[:, 0].astype(np.int64), minlength=self.size)
+        return dict([(self[i], counts[i]) for i in xrange(self.size)])
+
+    def meanSpikeCount(self, gather=True):
+        return self.getSpikes()[:, 0].size / float(self.size)
+
+    def printSpikes(self, filename, gather=True, compatible_output=True):
+        """
+        Writes rows (t, index) like pyNN
+        """
+        spikes = self.getSpikes()
+        f = file(filename, 'w')
+        f.write('# first_id = %d\n# n = %d\n# dt = %g\n# dimensions = [%d]\n# last_id = %d\n' % \
+                (self.first_id, self.size, state.dt, self.size, self.first_id + self.size - 1))
+        np.savetxt(f, spikes[:, [1, 0]], fmt='%g\t%d')
+        f.close()
+
+    def get_v(self, gather=True, compatible_output=True, indices=None):
+        """
+        Returns array with rows (index, t, v) of the recorded cells (or of indices)
+        """
+        if indices is None:
+            indices = self.recorded_v_idx
+        n_steps = len(self.v_t)
+        if n_steps == 0 or len(indices) == 0:
+            return np.zeros((0, 3))
+        columns = np.searchsorted(self.recorded_v_idx, indices)
+        values = np.array(self.v_values)[:, columns] # (time, cell)
+        d = np.zeros((n_steps * len(indices), 3))
+        d[:, 0] = np.tile(indices, n_steps)
+        d[:, 1] = np.repeat(self.v_t, len(indices))
+        d[:, 2] = values.flatten()
+        return d
+
+    def print_v(self, filename, gather=True, compatible_output=True, indices=None):
+        """
+        compatible_output=False: rows (index, t, v), else rows (v, index) like pyNN
+        """
+        d = self.get_v(indices=indices)
+        f = file(filename, 'w')
+        if compatible_output:
+            f.write('# n = %d\n# dt = %g\n' % (self.size, state.dt))
+            np.savetxt(f, d[:, [2, 0]], fmt='%g\t%d')
+        else:
+            np.savetxt(f, d)
+        f.close()
+
+
+class PopulationView(object):
+
+    def __init__(self, parent, selector, label=None):
+        self.parent = parent
+        self.mask = np.array(selector, dtype=np.int64)
+        self.size = self.mask.size
+        self.label = label
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        return self.parent[self.mask[index]]
+
+    def all(self):
+        for index in self.mask:
+            yield self.parent[index]
+
+    def is_local(self, id):
+        return True
+
+    def record(self, record_from=None, rng=None, to_file=True):
+        self.parent.record()
+
+    def record_v(self, record_from=None, rng=None, to_file=True):
+        self.parent.add_recorded_v(self.mask)
+
+    def set_v_sampling(self, every_n_steps=1, t_window=None):
+        self.parent.set_v_sampling(every_n_steps, t_window)
+
+    def getSpikes(self, gather=True, compatible_output=True):
+        spikes = self.parent.getSpikes()
+        return spikes[np.in1d(spikes[:, 0], self.mask), :]
+
+    def get_v(self, gather=True, compatible_output=True):
+        return self.parent.get_v(indices=np.unique(self.mask))
+
+    def print_v(self, filename, gather=True, compatible_output=True):
+        self.parent.print_v(filename, compatible_output=compatible_output, indices=np.unique(self.mask))
+
+
+# # # # # # # # # # # #
+#   C O N N E C T O R S
+# # # # # # # # # # # #
+class FromListConnector(object):
+    def __init__(self, conn_list, safe=True):
+        """
+        conn_list : rows (src_index, tgt_index, weight, delay)
+        """
+        self.conn_list = conn_list
+
+    def connect(self, projection):
+        d = np.array(self.conn_list, dtype=np.float64).reshape((-1, 4))
+        return d[:, 0].astype(np.int64), d[:, 1].astype(np.int64), d[:, 2], d[:, 3]
+
+
+class FromFileConnector(FromListConnector):
+    def __init__(self, file, distributed=False, safe=True):
+        FromListConnector.__init__(self, np.loadtxt(file))
+
+
+class OneToOneConnector(object):
+    def __init__(self, allow_self_connections=True, weights=0.0, delays=None, space=None, safe=True):
+        self.weights, self.delays = weights, delays
+
+    def connect(self, projection):
+        assert (projection.pre.size == projection.post.size), 'OneToOneConnector requires populations of the same size'
+        n = projection.pre.size
+        return np.arange(n), np.arange(n), get_values(self.weights, n), get_delays(self.delays, n)
+
+
+class AllToAllConnector(object):
+    def __init__(self, allow_self_connections=True, weights=0.0, delays=None, space=None, safe=True):
+        self.allow_self_connections = allow_self_connections
+        self.weights, self.delays = weights, delays
+
+    def connect(self, projection):
+        n_src, n_tgt = projection.pre.size, projection.post.size
+        src = np.repeat(np.arange(n_src), n_tgt)
+        tgt = np.tile(np.arange(n_tgt), n_src)
+        if not self.allow_self_connections and projection.pre == projection.post:
+            valid = src != tgt
+            src, tgt = src[valid], tgt[valid]
+        return src, tgt, get_values(self.weights, src.size), get_delays(self.delays, src.size)
+
+
+class FastFixedProbabilityConnector(object):
+    def __init__(self, p_connect, allow_self_connections=True, weights=0.0, delays=None, space=None, safe=True):
+        self.p_connect = p_connect
+        self.allow_self_connections = allow_self_connections
+        self.weights, self.delays = weights, delays
+
+    def connect(self, projection):
+        n_src, n_tgt = projection.pre.size, projection.post.size
+        connected = projection.rng.rand(n_src, n_tgt) < self.p_connect
+        if not self.allow_self_connections and projection.pre == projection.post:
+            np.fill_diagonal(connected, False)
+        src, tgt = np.nonzero(connected)
+        return src, tgt, get_values(self.weights, src.size), get_delays(self.delays, src.size)
+
+FixedProbabilityConnector = FastFixedProbabilityConnector
+
+
+class DistanceDependentProbabilityConnector(object):
+    def __init__(self, d_expression, allow_self_connections=True, weights=0.0, delays=None, space=Space(), safe=True, n_connections=None):
+        """
+        d_expression : connection probability as function of the distance d, e.g. '0.1 * exp(-d/(2*0.2**2))'
+        """
+        self.d_expression = d_expression
+        self.allow_self_connections = allow_self_connections
+        self.weights, self.delays = weights, delays
+        self.space = space
+
+    def connect(self, projection, chunk_size=512):
+        sources, targets = [], []
+        namespace = {'exp' : np.exp, 'sqrt' : np.sqrt, 'abs' : np.abs}
+        for i in xrange(0, projection.pre.size, chunk_size): # chunks of sources to limit the memory for the distance matrix
+            namespace['d'] = self.space.distances(projection.pre.positions[:, i:i + chunk_size], projection.post.positions)
+            p = eval(self.d_expression, namespace) * np.ones(namespace['d'].shape)
+            connected = projection.rng.rand(p.shape[0], p.shape[1]) < p
+            if not self.allow_self_connections and projection.pre == projection.post:
+                connected[np.arange(p.shape[0]), i + np.arange(p.shape[0])] = False
+            src, tgt = np.nonzero(connected)
+            sources.append(src + i)
+            targets.append(tgt)
+        src, tgt = np.concatenate(sources), np.concatenate(targets)
+        return src, tgt, get_values(self.weights, src.size), get_delays(self.delays, src.size)
+
+
+def get_delays(delays, n):
+    if delays is None:
+        return state.min_delay * np.ones(n)
+    return get_values(delays, n)
+
+
+# # # # # # # # # # # #
+#   P R O J E C T I O N S
+# # # # # # # # # # # #
+class Projection(object):
+
+    def __init__(self, presynaptic_population, postsynaptic_population, method, source=None, target='excitatory', \
+            synapse_dynamics=None, label=None, rng=None):
+        if synapse_dynamics != None:
+            raise NotImplementedError, 'NumpySimulator does not support synapse dynamics'
+        self.pre = presynaptic_population
+        self.post = postsynaptic_population
+        self.target = target
+        self.label = label
+        if rng == None:
+            self.rng = state.rng
+        else:
+            self.rng = np.random.RandomState(rng.seed)
+        self.sources, self.targets, weights, delays = method.connect(self)
+        self.setWeights(weights)
+        self.setDelays(delays)
+        # sort the synapses by source for the spike delivery: synapses of source i are by_src[ptr[i]:ptr[i+1]]
+        self.by_src = np.argsort(self.sources, kind='mergesort')
+        self.ptr = np.searchsorted(self.sources[self.by_src], np.arange(self.pre.size + 1), side='left')
+        state.projections.append(self)
+
+    def __len__(self):
+        return self.sources.size
+
+    def size(self, gather=True):
+        return self.sources.size
+
+    def getWeights(self, format='list', gather=True):
+        """
+        Weights in the order of the connections given by the connector
+        """
+        return self.weights.copy()
+
+    def setWeights(self, w):
+        """
+        w : scalar, one value per connection (order of getWeights) or array (n_pre, n_post) as in pyNN
+        """
+        if isinstance(w, np.ndarray) and w.ndim == 2:
+            w = w[self.sources, self.targets]
+        self.weights = get_values(w, self.sources.size)
+
+    def getDelays(self, format='list', gather=True):
+        return self.delay_steps * state.dt
+
+    def setDelays(self, d):
+        d = np.clip(get_values(d, self.sources.size), state.min_delay, state.max_delay)
+        self.delay_steps = np.maximum(np.round(d / state.dt).astype(np.int64), 1)
+
+    def saveConnections(self, file, gather=True, compatible_output=True):
+        """
+        Writes rows (src_index, tgt_index, weight, delay)
+        """
+        np.savetxt(file, np.array((self.sources, self.targets, self.weights, self.getDelays())).transpose(), fmt='%d\t%d\t%.4e\t%.4e')
+
+    def propagate(self, step):
+        """
+        Writes the weights of the synapses of the sources that spiked in this step into the ring buffer of the target population
+        """
+        spiking = self.pre.spiking
+        if spiking.size == 0 or self.sources.size == 0:
+            return
+        starts = self.ptr[spiking]
+        counts = self.ptr[spiking + 1] - starts
+        n_syn = counts.sum()
+        if n_syn == 0:
+            return
+        # indices of all synapses of the spiking sources without a python loop
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(counts)[:-1])), counts)
+        syn = self.by_src[offsets + np.arange(n_syn)]
+        # source spikes are emitted at the beginning of the step, neuron spikes at the end
+        shift = 0
+        if not self.pre.celltype.is_source:
+            shift = 1
+        slots = (step + shift + self.delay_steps[syn]) % state.n_slots
+        if self.target == 'inhibitory':
+            buffer = self.post.buffer_I
+        else:
+            buffer = self.post.buffer_E
+        np.add.at(buffer, (slots, self.targets[syn]), self.weights[syn])
+
+
+# # # # # # # # # # # # # # # # #
+#   L O W - L E V E L   A P I
+# # # # # # # # # # # # # # # # #
+def create(cellclass, cellparams=None, n=1):
+    pop = Population(n, cellclass, cellparams)
+    if n == 1:
+        return pop[0]
+    return list(pop.all())
+
+
+def connect(source, target, weight=0.0, delay=None, synapse_type=None, p=1, rng=None):
+    """
+    source, target : IDs or lists of IDs (from create or population[index])
+    """
+    if isinstance(source, ID):
+        source = [source]
+    if isinstance(target, ID):
+        target = [target]
+    if delay == None:
+        delay = state.min_delay
+    if synapse_type == None:
+        synapse_type = 'excitatory'
+    conns = {}
+    for src in source:
+        for tgt in target:
+            if p >= 1 or state.rng.rand() < p:
+                conns.setdefault((src.parent, tgt.parent), []).append((src.index, tgt.index, weight, delay))
+    for ((pre, post), conn_list) in conns.iteritems():
+        Projection(pre, post, FromListConnector(conn_list), target=synapse_type)
@@ -0,0 +1,200 @@
+"""
+Renders the figures of a run in one interpreter instead of starting one python process per plot script:
+the spikes, tuning properties, input spike trains and merged connection lists are loaded once (RunData)
+and the figures are drawn concurrently by a pool of worker processes with the Agg backend.
+The workers are forked after the data has been loaded and inherit it, so no file is read twice.
+
+Usage:
+    python PlotDriver.py [folder] [figure ...]
+or
+    import PlotDriver
+    PlotDriver.plot_figures(params, ['prediction', 'rasterplots', 'weight_and_delay_histogram_ee'], n_procs=4)
+
+Figures (default: all): prediction, rasterplots, connectivity_profile,
+    weight_and_delay_histogram_<conn_type>, connectivity_analysis_<conn_type>
+"""
+import os
+import sys
+import time
+import traceback
+import multiprocessing
+import numpy as np
+import LazyImports
+import utils
+
+
+class RunData(object):
+    """
+    The data of one run, every item is loaded on first access:
+    'spikes_exc', 'spikes_inh' : merged spike files
+    'tp_exc', 'tp_inh' : tuning properties
+    'conn_ee', 'conn_ei', 'conn_ie', 'conn_ii' : merged connection lists (merge_connlists.py is called if they do not exist)
+    'input' : {cell : input spike times}
+    """
+
+    def __init__(self, params):
+        self.params = params
+        self.data = {}
+        self.merged = False
+
+
+    def __getitem__(self, key):
+        if not self.data.has_key(key):
+            t0 = time.time()
+            self.data[key] = self.load(key)
+            print 'PlotDriver: loaded %s in %.2f sec' % (key, time.time() - t0)
+        return self.data[key]
+
+
+    def load(self, key):
+        if key.startswith('spikes_'):
+            cell_type = key.split('_')[1]
+            if self.params['spike_output_format'] == 'binary':
+                fn = self.params['%s_spiketimes_fn_merged' % cell_type] + '.bin'
+            else:
+                fn = self.params['%s_spiketimes_fn_merged' % cell_type] + '.ras'
+            return utils.load_spike_file(fn)
+        elif key == 'tp_exc':
+            return np.loadtxt(self.params['tuning_prop_means_fn'])
+        elif key == 'tp_inh':
+            return np.loadtxt(self.params['tuning_prop_inh_fn'])
+        elif key.startswith('conn_'):
+            conn_type = key.split('_')[1]
+            fn = self.params['merged_conn_list_%s' % conn_type]
+            if not os.path.exists(fn) and not self.merged:
+                os.system('python merge_connlists.py %s' % self.params['params_fn_json'])
+                self.merged = True
+            return np.loadtxt(fn)
+        elif key == 'input':
+            import plot_rasterplots
+            return plot_rasterplots.load_input_spikes(self.params)
+        raise KeyError, 'RunData: unknown item %s' % key
+
+
+def render_prediction(data, arg):
+    import plot_prediction
+    plot_prediction.plot_prediction(data.params, data['spikes_exc'], data['spikes_inh'], data['tp_exc'])
+
+
+def render_rasterplots(data, arg):
+    import plot_rasterplots
+    plot_rasterplots.plot_rasterplots(data.params, data['tp_exc'], data['spikes_exc'], data['input'])
+
+
+def render_connectivity_profile(data, arg):
+    import plot_connectivity_profile
+    plot_connectivity_profile.plot_connectivity_profile(data.params, data['tp_exc'], data['tp_inh'], {'ee' : data['conn_ee']})
+
+
+def render_weight_and_delay_histogram(data, conn_type):
+    import plot_weight_and_delay_histogram
+    plot_weight_and_delay_histogram.plot_weight_and_delay_histogram(data.params, conn_type, data['conn_%s' % conn_type])
+
+
+def render_connectivity_analysis(data, conn_type):
+    import analyse_connectivity
+    analyse_connectivity.plot_connectivity_analysis(data.params, conn_type, data['tp_exc'], data['tp_inh'], data['conn_%s' % conn_type])
+
+
+# figure : (render function, function returning the RunData items required for the argument)
+figures = {
+    'prediction' : (render_prediction, lambda arg: ['spikes_exc', 'spikes_inh', 'tp_exc']),
+    'rasterplots' : (render_rasterplots, lambda arg: ['spikes_exc', 'tp_exc', 'input']),
+    'connectivity_profile' : (render_connectivity_profile, lambda arg: ['tp_exc', 'tp_inh', 'conn_ee']),
+    'weight_and_delay_histogram' : (render_weight_and_delay_histogram, lambda conn_type: ['conn_%s' % conn_type]),
+    'connectivity_analysis' : (render_connectivity_analysis, lambda conn_type: ['tp_exc', 'tp_inh', 'conn_%s' % conn_type]),
+}
+conn_types = ['ee', 'ei', 'ie', 'ii']
+default_figures = ['prediction', 'rasterplots', 'connectivity_profile'] + \
+        ['weight_and_delay_histogram_%s' % conn_type for conn_type in conn_types] + \
+        ['connectivity_analysis_%s' % conn_type for conn_type in conn_types]
+
+
+def get_task(figure_name):
+    """
+    'weight_and_delay_histogram_ee' --> ('weight_and_delay_histogram', 'ee')
+    """
+    if figure_name[-3:-2] == '_' and figure_name[-2:] in conn_types:
+        return (figure_name[:-3], figure_name[-2:])
+    return (figure_name, None)
+
+
+run_data = None # set before the workers are forked, they inherit the loaded data
+
+def render(task):
+    """
+    Renders one figure in a worker, returns (task, time, traceback or None)
+    """
+    (figure, arg) = task
+    t0 = time.time()
+    try:
+        figures[figure][0](run_data, arg)
+        LazyImports.pylab.close('all')
+        return (task, time.time() - t0, None)
+    except:
+        return (task, time.time() - t0, traceback.format_exc())
+
+
+def plot_figures(params, figure_names=None, n_procs=None, data=None):
+    """
+    Loads the data required by the figures and renders them with n_procs worker processes (default: number of cores).
+    A figure that fails is reported, the others are rendered nonetheless.
+    data : RunData of this run if it exists already (e.g. to render more figures later)
+    Returns the list of figures that failed.
+    """
+    global run_data
+    LazyImports.use_headless_backend(force=True)
+    if figure_names == None:
+        figure_names = default_figures
+    tasks = [get_task(name) for name in figure_names]
+    for (figure, arg) in tasks:
+        assert figures.has_key(figure), 'PlotDriver: unknown figure %s, choose from %s' % (figure, str(figures.keys()))
+
+    t0 = time.time()
+    if data == None:
+        data = RunData(params)
+    for (figure, arg) in tasks:
+        for key in figures[figure][1](arg):
+            try:
+                data[key]
+            except: # the figure fails and reports it
+                print 'PlotDriver: could not load %s\n%s' % (key, traceback.format_exc())
+    t_load = time.time() - t0
+    run_data = data
+
+    if n_procs == None:
+        n_procs = multiprocessing.cpu_count()
+    n_procs = min(n_procs, len(tasks))
+    if n_procs > 1:
+        pool = multiprocessing.Pool(n_procs)
+        results = pool.map(render, tasks, chunksize=1)
+        pool.close()
+        pool.join()
+    else:
+        results = [render(task) for task in tasks]
+
+    failed = []
+    for ((figure, arg), t, error) in results:
+        name = figure if arg == None else '%s_%s' % (figure, arg)
+        if error != None:
+            print 'PlotDriver: %s failed:\n%s' % (name, error)
+            failed.append(name)
+        else:
+            print 'PlotDriver: %s rendered in %.2f sec' % (name, t)
+    print 'PlotDriver: %d figures with %d processes in %.2f sec (loading %.2f sec), %d failed' % (len(tasks), n_procs, \
+            time.time() - t0, t_load, len(failed))
+    return failed
+
+
+if __name__ == '__main__':
+
+    if len(sys.argv) > 1 and not figures.has_key(get_task(sys.argv[1])[0]):
+        params = LazyImports.load_params(sys.argv[1])
+        figure_names = sys.argv[2:]
+    else:
+        import simulation_parameters
+        params = simulation_parameters.parameter_storage().params
+        figure_names = sys.argv[1:]
+    if len(figure_names) == 0:
+        figure_names = None
+    plot_figures(params, figure_names)
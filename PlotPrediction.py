@@ -8,7 +8,11 @@ from matplotlib import cm
 import os
 
 class PlotPrediction(object):
-    def __init__(self, params=None, data_fn=None):
+    def __init__(self, params=None, data_fn=None, tuning_prop=None):
+        """
+        data_fn : merged spike file of the excitatory cells or the array loaded before (see PlotDriver)
+        tuning_prop : the tuning properties of the excitatory cells if loaded before
+        """
 
         if params == None:
             self.network_params = simulation_parameters.parameter_storage()  # network_params class containing the simulation parameters
@@ -27,6 +31,7 @@ class PlotPrediction(object):
             self.show_blank = True
 
         self.spiketimes_loaded = False
+        self.spike_data = {} # cell_type : spikes loaded before (d[:, 0] = times, d[:, 1] = gids), used instead of the merged files
         self.data_to_store = {}
         # define parameters
         self.time_binsize = int(round(self.params['t_sim'] / 20))
@@ -40,7 +45,9 @@ class PlotPrediction(object):
         self.n_x_bins, self.n_y_bins = 50, 50       # colormap grid dimensions for predicted position
         self.t_ticks = np.linspace(0, self.params['t_sim'], 6)
 
-        self.tuning_prop = np.loadtxt(self.params['tuning_prop_means_fn'])
+        if tuning_prop is None:
+            tuning_prop = np.loadtxt(self.params['tuning_prop_means_fn'])
+        self.tuning_prop = tuning_prop
         self.n_cells = self.tuning_prop[:, 0].size #self.params['n_exc']
 #        assert (self.tuning_prop[:, 0].size == self.params['n_exc']), 'Number of cells does not match in %s and simulation_parameters!\n Wrong tuning_prop file?' % self.params['tuning_prop_means_fn']
 
@@ -96,7 +103,7 @@ class PlotPrediction(object):
         fig_height = fig_width*golden_mean      # height in inches
         fig_size =  [fig_width,fig_height]
         params = {#'backend': 'png',
-                  'title.fontsize': 16,
+                  'axes.titlesize': 16,
                   'axes.labelsize': 16,
 #                  'text.fontsize': 10,
 #                  'legend.fontsize': 10,
@@ -119,7 +126,10 @@ class PlotPrediction(object):
 
         print(' Loading data .... ')
         try:
-            d = np.loadtxt(fn)
+            if isinstance(fn, basestring):
+                d = np.loadtxt(fn)
+            else:
+                d = fn
             for i in xrange(d[:, 0].size):
                 self.spiketrains[int(d[i, 1])].append(d[i, 0])
         except:
@@ -458,7 +468,7 @@ class PlotPrediction(object):
 
     def load_spiketimes(self, cell_type):
         if cell_type == 'inh':
-            fn = self.params['inh_spiketimes_fn_merged'] + '.ras'
+            fn = self.spike_data.get('inh', self.params['inh_spiketimes_fn_merged'] + '.ras')
             n_cells = self.params['n_inh']
             nspikes, self.inh_spiketimes = utils.get_nspikes(fn, n_cells, get_spiketrains=True)
             spiketimes = self.inh_spiketimes
@@ -466,7 +476,7 @@ class PlotPrediction(object):
             idx = np.nonzero(nspikes)[0]
             np.savetxt(self.params['inh_nspikes_nonzero_fn'], np.array((idx, nspikes[idx])).transpose())
         elif cell_type == 'exc':
-            fn = self.params['exc_spiketimes_fn_merged'] + '.ras'
+            fn = self.spike_data.get('exc', self.params['exc_spiketimes_fn_merged'] + '.ras')
             n_cells = self.params['n_exc']
             nspikes, self.exc_spiketimes = utils.get_nspikes(fn, n_cells, get_spiketrains=True)
             spiketimes = self.exc_spiketimes
@@ -486,7 +496,7 @@ class PlotPrediction(object):
 
         ax = self.fig.add_subplot(self.n_fig_y, self.n_fig_x, fig_cnt)
         for cell in xrange(int(len(spiketimes))):
-            ax.plot(spiketimes[cell], cell * np.ones(nspikes[cell]), 'o', color='k', markersize=1)
+            ax.plot(spiketimes[cell], cell * np.ones(int(nspikes[cell])), 'o', color='k', markersize=1)
             
         ylim = ax.get_ylim()
         if cell_type == 'exc':
@@ -3,6 +3,7 @@ import utils
 import simulation_parameters
 import numpy as np
 import CreateConnections as CC
+import ArtefactCache
 from ParallelObject import PObject
 
 class Preparer(PObject):
@@ -10,7 +11,7 @@ class Preparer(PObject):
         PObject.__init__(self, parameter_storage, comm)
 
     def prepare_tuning_prop(self):
-        tuning_prop = utils.set_tuning_prop(self.params, mode='hexgrid', v_max=self.params['v_max'])        # set the tuning properties of exc cells: space (x, y) and velocity (u, v)
+        tuning_prop = utils.set_tuning_prop(self.params, mode='hexgrid', cell_type='exc')        # set the tuning properties of exc cells: space (x, y) and velocity (u, v)
         if self.pc_id == 0:
             print "Creating tuning properties", self.pc_id, self.params['tuning_prop_means_fn']
             print "Saving tuning_prop to file:", self.pc_id, self.params['tuning_prop_means_fn']
@@ -37,9 +38,22 @@ class Preparer(PObject):
         else:
             raise TypeError, 'Only filename or numpy array accepted for tuning_prop, given %s' % (str(type(tuning_prop)))
 
-        my_units = utils.distribute_n(self.params['n_exc'], self.n_proc, self.pc_id)
+        # generating the input costs one step per time step plus the input spikes
+        my_units = utils.distribute_cells(self.params, self.params['n_exc'], self.n_proc, self.pc_id, \
+                tuning_prop=tp, c_cell=self.params['t_sim'] / self.params['dt_rate'])
+        fns = []
+        for unit in my_units:
+            fns.append(self.params['input_rate_fn_base'] + str(unit) + '.npy')
+            fns.append(self.params['input_st_fn_base'] + str(unit) + '.npy')
 
-        input_spike_trains = utils.create_spike_trains_for_motion(tp, self.params, contrast=.9, my_units=my_units) # write to paths defined in the params dictionary
+        restored = False
+        if self.params['use_artefact_cache']:
+            cache = ArtefactCache.ArtefactCache(self.params)
+            restored = cache.restore_files(fns, 'input', extra={'my_units' : my_units})
+        if not restored:
+            input_spike_trains = utils.create_spike_trains_for_motion(tp, self.params, contrast=.9, my_units=my_units) # write to paths defined in the params dictionary
+            if self.params['use_artefact_cache']:
+                cache.store_files(fns, 'input', extra={'my_units' : my_units})
 
         if self.comm != None:
             self.comm.barrier() # 
@@ -0,0 +1,46 @@
+"""
+Random streams keyed by (seed, key, purpose): every cell (key = gid, or time step for the blanking) and purpose
+has its own generator, so that any process can generate the data of any cell and the results (input spike trains,
+noise, random connections) do not depend on the number of processes or on which process a cell is simulated.
+
+Counter-based generators (Philox) are only available from numpy 1.17 on, instead the key is used as the
+seed array of a RandomState (Mersenne Twister seeded by init_by_array), which gives the same independence
+of the decomposition. A stream is created per cell, so generation can be split arbitrarily among processes.
+
+Usage:
+    rng = RandomStreams.get_rng(params['input_spikes_seed'], gid, 'input')
+    spike_times = RandomStreams.poisson_spike_times(rng, rate_of_t, params['dt_rate'])
+"""
+import numpy as np
+
+# the index of the purpose is part of the key, append new purposes at the end to keep the old streams
+purposes = ['input', 'blank', 'noise_exc', 'noise_inh', 'conn_ee', 'conn_ei', 'conn_ie', 'conn_ii', 'record']
+
+
+def get_rng(seed, key, purpose):
+    """
+    Returns the RandomState for (seed, key, purpose)
+    """
+    return np.random.RandomState([int(seed) % 2**32, int(key) % 2**32, purposes.index(purpose)])
+
+
+def poisson_spike_times(rng, rate_of_t, dt):
+    """
+    Non-homogeneous Poisson process: one spike at most per time step of dt [ms], rate_of_t in Hz
+    Returns the spike times [ms]
+    """
+    rate_of_t = np.asarray(rate_of_t)
+    r = rng.rand(rate_of_t.size)
+    return np.nonzero(r <= (rate_of_t / 1000.) * dt)[0] * dt # rate is given in Hz -> 1/1000.
+
+
+def normal_redraw(rng, mu, sigma, n, low, high):
+    """
+    n normal distributed values, values outside [low, high] are drawn again (like pyNN's constrain='redraw')
+    """
+    values = rng.normal(mu, sigma, n)
+    invalid = (values < low) | (values > high)
+    while invalid.any():
+        values[invalid] = rng.normal(mu, sigma, invalid.sum())
+        invalid = (values < low) | (values > high)
+    return values
@@ -1,5 +1,8 @@
 import numpy as np
 import os
+import json
+import hashlib
+import multiprocessing
 import simulation_parameters
 import NeuroTools.parameters as NTP
 import pylab
@@ -17,12 +20,88 @@ except:
     pc_id, n_proc = 0, 1
 
 
+def get_folder_signature(folder, file_names):
+    """
+    Returns a hash over size and modification time of the given files in folder.
+    If any of the files changes (or appears / disappears), the signature changes,
+    i.e. results depending on these files need to be recomputed.
+    """
+    m = hashlib.md5()
+    for fn in file_names:
+        path = folder + '/' + fn
+        if os.path.exists(path):
+            stat = os.stat(path)
+            m.update('%s %d %.6f;' % (fn, stat.st_size, stat.st_mtime))
+        else:
+            m.update('%s missing;' % fn)
+    return m.hexdigest()
+
+
+def compute_xvdiff_integral(args):
+    """
+    Computes the (RMSE) integral of the x- and v-prediction error for one folder.
+    args = (folder, fn_x, fn_v, t_range)
+    This is a module level function, so that it can be used by a multiprocessing.Pool
+    Returns (folder, {'xdiff_integral' : .., 'vdiff_integral' : .., 'time_bin_size' : ..})
+    """
+    folder, fn_x, fn_v, t_range = args
+    xdiff = np.loadtxt(fn_x)
+    vdiff = np.loadtxt(fn_v)
+    n_bins = xdiff[:, 0].size
+    assert n_bins == vdiff[:, 0].size, "ERROR in x/v diff integrals!\n%s and %s have different sizes!" % (fn_x, fn_v)
+    time_binsize = xdiff[1, 0] - xdiff[0, 0]
+    if t_range == None:
+        xdiff_integral = np.sqrt((xdiff[:, 1]**2).sum() / n_bins)
+        vdiff_integral = np.sqrt((vdiff[:, 1]**2).sum() / n_bins)
+    else:
+        idx_0 = (xdiff[:, 0] == t_range[0]).nonzero()[0][0]
+        idx_1 = (xdiff[:, 0] == t_range[1] - time_binsize).nonzero()[0][0]
+        xdiff_integral = np.sqrt((xdiff[idx_0:idx_1, 1]**2).sum() / (idx_1 - idx_0))
+        vdiff_integral = np.sqrt((vdiff[idx_0:idx_1, 1]**2).sum() / (idx_1 - idx_0))
+    print time_binsize, folder, xdiff_integral, vdiff_integral
+    return (folder, {'xdiff_integral' : float(xdiff_integral), 'vdiff_integral' : float(vdiff_integral), 'time_bin_size' : float(time_binsize)})
+
+
+def load_scalar_parameters(folder):
+    """
+    Loads the parameters of the simulation stored in folder (simulation_parameters.json if it exists,
+    otherwise the NeuroTools simulation_parameters.info file) and returns
+    (folder, {param_name : value}) for all scalar (number, bool or string) parameters.
+    Module level function, so that it can be used by a multiprocessing.Pool
+    """
+    json_fn = folder + '/Parameters/simulation_parameters.json'
+    if os.path.exists(json_fn):
+        f = file(json_fn, 'r')
+        param_dict = json.load(f)
+        f.close()
+    else:
+        param_fn = utils.convert_to_url(folder + '/Parameters/simulation_parameters.info')
+        param_dict = NTP.ParameterSet(param_fn)
+    scalar_params = {}
+    for key, value in param_dict.iteritems():
+        if isinstance(value, (bool, int, long, float, str, unicode)):
+            scalar_params[key] = value
+    return (folder, scalar_params)
+
+
 class ResultsCollector(object):
 
-    def __init__(self, params):
+    def __init__(self, params, index_fn='results_index.json', n_workers=None):
+        """
+        index_fn : catalogue file in which the analysis results of every folder are stored together with a
+                   signature of the files they depend on, so that only new or changed folders are processed:
+                   index[folder][analysis_key] = {'signature' : .., result_name : value, ...}
+                   If index_fn == None, nothing is cached and all folders are processed every time.
+        n_workers : size of the process pool used when running without MPI (None: number of cores)
+        """
         self.params = params
         self.param_space = {}
         self.dirs_to_process = []
+        self.index_fn = index_fn
+        self.n_workers = n_workers
+        self.index = {}
+        self.param_table = {}
+        self.load_index()
 
         self.n_fig_x = 1
         self.n_fig_y = 2
@@ -37,9 +116,10 @@ class ResultsCollector(object):
 
     def set_dirs_to_process(self, list_of_dir_names):
 
-        for i_, folder in enumerate(list_of_dir_names):
+        for folder in list_of_dir_names:
+            self.param_space[len(self.dirs_to_process)] = {}
             self.dirs_to_process.append(folder)
-            self.param_space[i_] = {}
+        self.param_table = {} # needs to be rebuilt for the new folders
 
 
     def collect_files(self):
@@ -52,7 +132,7 @@ class ResultsCollector(object):
                 'Parameters/simulation_parameters.info', \
                 'Parameters/tuning_prop_means.prm']
 
-        sim_id = 0
+        dirs_passed = []
         for dir_name in all_dirs:
             # check if all necessary files exist
             check_passed = True
@@ -62,8 +142,70 @@ class ResultsCollector(object):
                 if not os.path.exists(fn_):
                     check_passed = False
             if check_passed:
-                self.dirs_to_process.append((dir_name, sim_id, {}))
-                sim_id += 1
+                dirs_passed.append(dir_name)
+        self.set_dirs_to_process(dirs_passed)
+
+
+    def load_index(self):
+        if self.index_fn != None and os.path.exists(self.index_fn):
+            print 'Loading results index from:', self.index_fn
+            f = file(self.index_fn, 'r')
+            self.index = json.load(f)
+            f.close()
+
+
+    def save_index(self):
+        if self.index_fn == None or pc_id != 0:
+            return
+        print 'Saving results index to:', self.index_fn
+        f = file(self.index_fn, 'w')
+        json.dump(self.index, f)
+        f.close()
+
+
+    def update_index(self, analysis_key, depends_on, worker, worker_args):
+        """
+        Runs worker for all folders in self.dirs_to_process whose entry for analysis_key
+        in self.index is missing or whose files in depends_on have changed since.
+        The work is distributed among the MPI processes, or among a local process pool if MPI is not used.
+
+        analysis_key : name under which the results are stored in the index (should contain the analysis parameters)
+        depends_on : list of file names (relative to the folder) the results depend on
+        worker : module level function mapping worker_args[folder] --> (folder, results_dict)
+        worker_args : dictionary {folder : args for worker}
+        """
+        folders_to_update = []
+        signatures = {}
+        for folder in self.dirs_to_process:
+            signatures[folder] = get_folder_signature(folder, depends_on)
+            entry = self.index.get(folder, {}).get(analysis_key, {})
+            if entry.get('signature') != signatures[folder]:
+                folders_to_update.append(folder)
+        print '%s: %d of %d folders need to be processed' % (analysis_key, len(folders_to_update), len(self.dirs_to_process))
+        if len(folders_to_update) == 0:
+            return
+
+        if comm != None and n_proc > 1:
+            my_folders = utils.distribute_list(folders_to_update, n_proc, pc_id)
+            my_results = map(worker, [worker_args[folder] for folder in my_folders])
+            all_results = []
+            for results in comm.allgather(my_results):
+                all_results += results
+        elif len(folders_to_update) > 1:
+            pool = multiprocessing.Pool(self.n_workers)
+            all_results = pool.map(worker, [worker_args[folder] for folder in folders_to_update])
+            pool.close()
+            pool.join()
+        else:
+            all_results = map(worker, [worker_args[folder] for folder in folders_to_update])
+
+        for folder, results in all_results:
+            results['signature'] = signatures[folder]
+            if not self.index.has_key(folder):
+                self.index[folder] = {}
+            self.index[folder][analysis_key] = results
+        self.save_index()
+
 
     def get_xvdiff_integral(self, t_range=None):
         """
@@ -79,37 +221,21 @@ class ResultsCollector(object):
         fn_base_x = self.params['xdiff_vs_time_fn']
         fn_base_v = self.params['vdiff_vs_time_fn']
 
-        time_bin_size = np.zeros(len(self.dirs_to_process))
-        for i_, folder in enumerate(self.dirs_to_process):
-            # if self.dirs_to_process has been created by collect_files()
-#            fn_x = folder[0] + '/' + results_sub_folder + fn_base_x
-#            fn_v = folder[0] + '/' + results_sub_folder + fn_base_v
+        analysis_key = 'xvdiff_integral_%s' % str(t_range)
+        depends_on = [results_sub_folder + fn_base_x, results_sub_folder + fn_base_v]
+        worker_args = {}
+        for folder in self.dirs_to_process:
             fn_x = folder + '/' + results_sub_folder + fn_base_x
             fn_v = folder + '/' + results_sub_folder + fn_base_v
-            xdiff = np.loadtxt(fn_x)
-            vdiff = np.loadtxt(fn_v)
-            n_bins = xdiff[:, 0].size
-            assert n_bins == vdiff[:, 0].size, "ERROR in x/v diff integrals!\n%s and %s have different sizes!" % (fn_x, fn_v)
-            time_binsize = xdiff[1, 0] - xdiff[0, 0]
-            time_bin_size[i_] = time_binsize
-            if t_range == None:
-                self.xdiff_integral[i_] = xdiff[:, 1].sum()
-                self.vdiff_integral[i_] = vdiff[:, 1].sum()
-                self.xdiff_integral[i_] = np.sqrt((xdiff[:, 1]**2).sum() / n_bins)
-                self.vdiff_integral[i_] = np.sqrt((vdiff[:, 1]**2).sum() / n_bins)
-            else:
-                idx_0 = (xdiff[:, 0] == t_range[0]).nonzero()[0][0]
-                print xdiff[:, 0].max()
-                print 'debug', t_range[1] - time_binsize, fn_x
-                idx_1 = (xdiff[:, 0] == t_range[1] - time_binsize).nonzero()[0][0]
-
-                self.xdiff_integral[i_] = np.sqrt((xdiff[idx_0:idx_1, 1]**2).sum() / (idx_1 - idx_0))
-                self.vdiff_integral[i_] = np.sqrt((vdiff[idx_0:idx_1, 1]**2).sum() / (idx_1 - idx_0))
-#                self.vdiff_integral[i_] = vdiff[idx_0:idx_1, 1].sum()
-
-            print 'folder, self.xdiff_integral[i_], self.vdiff_integral[i_]'
-            print time_binsize, folder, self.xdiff_integral[i_], self.vdiff_integral[i_]
-#            print fn_x, 
+            worker_args[folder] = (folder, fn_x, fn_v, t_range)
+        self.update_index(analysis_key, depends_on, compute_xvdiff_integral, worker_args)
+
+        time_bin_size = np.zeros(len(self.dirs_to_process))
+        for i_, folder in enumerate(self.dirs_to_process):
+            results = self.index[folder][analysis_key]
+            self.xdiff_integral[i_] = results['xdiff_integral']
+            self.vdiff_integral[i_] = results['vdiff_integral']
+            time_bin_size[i_] = results['time_bin_size']
         print 'All folders were analysed with the same time bin size:\n', (time_bin_size == time_bin_size.mean()).all()
 #        print time_bin_size, time_bin_size.mean()
         output_data = np.array((np.zeros(self.xdiff_integral.size), self.xdiff_integral, self.vdiff_integral))
@@ -128,13 +254,12 @@ class ResultsCollector(object):
         """
         For all simulations (in self.dirs_to_process) get the according parameter value
         """
+        if not self.param_table.has_key(param_name):
+            self.build_parameter_space()
         for i_, folder in enumerate(self.dirs_to_process):
-            param_fn = folder + '/Parameters/simulation_parameters.info'
-            param_fn = utils.convert_to_url(param_fn)
-            param_dict = NTP.ParameterSet(param_fn)
-            value = param_dict[param_name]
-            self.param_space[i_][param_name] = value
-            
+            self.param_space[i_][param_name] = self.param_table[param_name][i_]
+        return self.param_table[param_name]
+
 
     def plot_param_vs_xvdiff_integral(self, param_name, xv='x', t_integral=None, fig_cnt=1):
 
@@ -153,13 +278,9 @@ class ResultsCollector(object):
             xvdiff_integral = self.vdiff_integral
             title = '$\int_{%s}^{%s} |\\vec{v}_{stim}(t) - \\vec{v}_{prediction}(t)| dt$ vs. %s' % (t0, t1, param_name)
 
-        x_data = np.zeros(len(self.dirs_to_process))
+        x_data = np.array(self.get_parameter(param_name), dtype=np.float)
         y_data = xvdiff_integral
 
-        for i_, folder in enumerate(self.dirs_to_process):
-            param_value = self.param_space[i_][param_name]
-            x_data[i_] = param_value
-
         print ' Data %s - prediction:\n' % (xv), x_data, '\n', y_data
         ax.plot(x_data, y_data, 'o')
         ax.set_xlim((x_data.min() * .9, x_data.max() * 1.1))
@@ -212,11 +333,74 @@ class ResultsCollector(object):
 
 
     def build_parameter_space(self):
+        """
+        Builds a columnar table of all scalar parameters of all simulations in self.dirs_to_process:
+            self.param_table[param_name][i_] = value of param_name in self.dirs_to_process[i_]
+        Every parameter file is loaded only once (the scalar parameters are cached in the results index),
+        numerical parameters are stored as float arrays (np.nan if a folder lacks the parameter),
+        all others as object arrays (None if missing).
+        """
+        param_files = ['Parameters/simulation_parameters.json', 'Parameters/simulation_parameters.info']
+        worker_args = {}
+        for folder in self.dirs_to_process:
+            worker_args[folder] = folder
+        self.update_index('parameters', param_files, load_scalar_parameters, worker_args)
+
+        n_sim = len(self.dirs_to_process)
+        all_param_names = set()
+        for folder in self.dirs_to_process:
+            all_param_names.update(self.index[folder]['parameters'].keys())
+        all_param_names.discard('signature')
+
+        self.param_table = {}
+        for param_name in all_param_names:
+            values = [self.index[folder]['parameters'].get(param_name) for folder in self.dirs_to_process]
+            is_numeric = True
+            for value in values:
+                if value != None and not isinstance(value, (bool, int, long, float)):
+                    is_numeric = False
+            if is_numeric:
+                column = np.array([np.nan if value == None else value for value in values], dtype=np.float)
+            else:
+                column = np.empty(n_sim, dtype=object)
+                column[:] = values
+            self.param_table[param_name] = column
+        return self.param_table
+
 
-        # take a sample simulation_parameters.info file to generate all possible keys
-        sample_fn = self.dirs_to_process[0][0] + '/Parameters/simulation_parameters.info'
-        sample_dict = NTP.ParameterSet(sample_fn)
-        all_param_names = sample_dict.keys()
+    def select(self, **conditions):
+        """
+        Returns the indices (into self.dirs_to_process) of all simulations for which all conditions hold.
+        A condition is either a value which the parameter must equal, or a function mapping
+        the parameter column to a boolean mask, e.g.
+            RC.select(connectivity_code='AIII', w_tgt_in_per_cell_ee=lambda w: w > .3)
+        """
+        if len(self.param_table) == 0:
+            self.build_parameter_space()
+        mask = np.ones(len(self.dirs_to_process), dtype=np.bool)
+        for param_name, condition in conditions.iteritems():
+            column = self.param_table[param_name]
+            if callable(condition):
+                mask &= np.array(condition(column), dtype=np.bool)
+            else:
+                mask &= (column == condition)
+        return mask.nonzero()[0]
+
+
+    def group_by(self, param_name, idx=None):
+        """
+        Returns a dictionary {value of param_name : indices of the simulations with this value}
+        idx : restrict the grouping to these simulations (e.g. returned by self.select)
+        """
+        if len(self.param_table) == 0:
+            self.build_parameter_space()
+        if idx is None:
+            idx = np.arange(len(self.dirs_to_process))
+        column = self.param_table[param_name][idx]
+        groups = {}
+        for value in np.unique(column):
+            groups[value] = idx[(column == value).nonzero()[0]]
+        return groups
 
 
 
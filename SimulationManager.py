@@ -5,7 +5,8 @@ import numpy as np
 import utils
 import time
 import CreateConnections as CC
-import NetworkSimModuleNoColumns as simulation
+import ArtefactCache
+import NetworkSimModule as simulation
 import NeuroTools.parameters as ntp
 import Prepare
 from ParallelObject import PObject
@@ -18,6 +19,7 @@ class SimulationManager(PObject):
         PObject.__init__(self, parameter_storage, comm)
         self.sim_cnt = 0
         self.cycle_cnt = 0
+        self.session = None # keeps pyNN and the network structures alive between runs
 
     def update_values(self, new_dict):
         self.ParameterStorage.update_values(new_dict)
@@ -75,9 +77,22 @@ class SimulationManager(PObject):
     def prepare_connections(self, input_fn=None):
 
         if self.params['connectivity'] == 'precomputed':
-            print "Proc %d computes initial weights ... " % self.pc_id
-            tuning_prop = np.loadtxt(self.params['tuning_prop_means_fn'])
-            CC.compute_weights_from_tuning_prop(tuning_prop, self.params, self.comm)
+            fns = [self.params['conn_list_ee_conv_constr_fn_base'] + 'pid%d.dat' % (self.pc_id)]
+            # the files hold the scaled weights and delays
+            cache_extra = {'pc_id' : self.pc_id, 'n_proc' : self.n_proc, 'scaling' : ArtefactCache.get_conn_scaling(self.params, 'ee')}
+            restored = False
+            if self.params['use_artefact_cache']:
+                cache = ArtefactCache.ArtefactCache(self.params)
+                restored = cache.restore_files(fns, 'conn', 'ee', extra=cache_extra)
+            # all processes need to take part in the computation (barriers)
+            if self.comm != None:
+                restored = (self.comm.allreduce(int(restored)) == self.n_proc)
+            if not restored:
+                print "Proc %d computes initial weights ... " % self.pc_id
+                tuning_prop = np.loadtxt(self.params['tuning_prop_means_fn'])
+                CC.compute_weights_convergence_constrained(tuning_prop, self.params, self.comm)
+                if self.params['use_artefact_cache']:
+                    cache.store_files(fns, 'conn', 'ee', extra=cache_extra)
 
         elif self.pc_id == 0 and self.params['connectivity'] == 'random':
             print "Proc %d shuffles pre-computed weights ... " % self.pc_id
@@ -90,20 +105,25 @@ class SimulationManager(PObject):
             self.comm.Barrier()
 
 
-    def run_sim(self, connect_exc_exc=True):
+    def run_sim(self, new_params={}, record_v=True):
+        """
+        All processes take part in the simulation, which runs in this interpreter.
+        Tuning properties, input and connections are reused from the previous run if the parameters they depend on did not change.
+        """
+        if self.session == None:
+            self.session = simulation.SimulationSession(self.ParameterStorage, self.comm)
 
+        if len(new_params) > 0: # applied here to print the cell numbers of this run
+            self.ParameterStorage.update_values(new_params)
+        params = self.ParameterStorage.params
         if (self.pc_id == 0):
-            print "Simulation run %d: %d cells (%d exc, %d inh)" % (self.sim_cnt+1, self.params['n_cells'], self.params['n_exc'], self.params['n_inh'])
-            simulation.run_sim(self.params, self.sim_cnt, self.params['connectivity'], connect_exc_exc)
-
-        else: 
-            print "Pc %d waiting for proc 0 to finish simulation" % self.pc_id
-            time.sleep(5)
-            sys.stdout.flush()
+            print "Simulation run %d: %d cells (%d exc, %d inh)" % (self.sim_cnt+1, params['n_cells'], params['n_exc'], params['n_inh'])
+        self.session.run(record_v=record_v)
+        self.params = self.ParameterStorage.params
 
         if self.comm != None: 
             print 'Pid %d at Barrier after run_sim' % self.pc_id
             sys.stdout.flush()
             self.comm.Barrier()
+        self.sim_cnt += 1
         self.cycle_cnt += 1
-
@@ -0,0 +1,213 @@
+"""
+Runs parameter sweeps: every point of a parameter grid gets its own folder
+(simulation_parameters.ParameterContainer) and the simulations are scheduled
+concurrently on a pool of slots (local cores or MPI slots).
+
+Usage:
+    import simulation_parameters
+    import SweepRunner
+    ps = simulation_parameters.parameter_storage()
+    SR = SweepRunner.SweepRunner(ps, n_slots=8, procs_per_run=2)
+    SR.add_parameter_grid({'w_tgt_in_per_cell_ee' : [.3, .35, .4], 'delay_scale' : [500., 250.]})
+    SR.run()
+"""
+import os
+import sys
+import time
+import itertools
+import subprocess
+import multiprocessing
+import simulation_parameters
+
+
+class SweepRunner(object):
+
+    def __init__(self, parameter_storage=None, script='NetworkSimModule.py', n_slots=None, procs_per_run=1, \
+            max_retries=1, mpirun='mpirun', poll_interval=1.):
+        """
+        parameter_storage : instance of simulation_parameters.parameter_storage, only required for add_parameter_grid
+        script : the simulation script, it is called with the parameter file of the run as only argument
+        n_slots : number of cores / MPI slots available to the sweep (default: number of local cores)
+        procs_per_run : number of MPI processes per run, if > 1 runs are started with mpirun -np procs_per_run
+        max_retries : how often a failed job is restarted
+        """
+        self.ParameterStorage = parameter_storage
+        self.script = script
+        if n_slots == None:
+            n_slots = multiprocessing.cpu_count()
+        self.n_slots = n_slots
+        self.procs_per_run = procs_per_run
+        assert (self.procs_per_run <= self.n_slots), 'procs_per_run (%d) exceeds the number of slots (%d)' % (self.procs_per_run, self.n_slots)
+        self.max_retries = max_retries
+        self.mpirun = mpirun
+        self.poll_interval = poll_interval
+        self.jobs = []
+        self.param_hashes = {} # hash of the parameters (without folder_name) : folder_name of the runs added
+
+
+    def get_grid(self, param_grid):
+        """
+        param_grid : dictionary {param_name : list of values}
+        Returns the list of all combinations as dictionaries {param_name : value}
+        """
+        param_names = sorted(param_grid.keys())
+        grid = []
+        for values in itertools.product(*[param_grid[name] for name in param_names]):
+            grid.append(dict(zip(param_names, values)))
+        return grid
+
+
+    def get_folder_name(self, point, prefix='Sweep_', connectivity_code=None):
+        if connectivity_code == None:
+            connectivity_code = self.ParameterStorage.params['connectivity_code']
+        folder_name = prefix + connectivity_code
+        for param_name in sorted(point.keys()):
+            value = point[param_name]
+            if isinstance(value, float):
+                folder_name += '_%s%.2e' % (param_name, value)
+            else:
+                folder_name += '_%s%s' % (param_name, str(value))
+        return folder_name + '/'
+
+
+    def add_parameter_grid(self, param_grid, prefix='Sweep_', fixed_params={}):
+        """
+        Creates the folder and writes the parameter file for every point in the grid
+        and adds a job running self.script with this parameter file.
+        A job counts as complete, if the merged spike files of the run exist.
+        fixed_params : parameters that are set for all runs of the grid
+        The parameters of the points are ParameterContainers sharing the defaults of self.ParameterStorage,
+        derived values (cell numbers, file names) are computed for every point, points with
+        identical parameters (same hash) are added only once.
+        """
+        base = simulation_parameters.ParameterContainer(fixed_params, defaults=self.ParameterStorage.params)
+        for point in self.get_grid(param_grid):
+            pc = base.copy(point)
+            pc.update_values({'folder_name' : self.get_folder_name(point, prefix, pc['connectivity_code'])})
+            param_hash = pc.get_hash([key for key in pc.input_keys() if key != 'folder_name'])
+            if self.param_hashes.has_key(param_hash):
+                print 'SweepRunner: %s has the same parameters as %s, skipped' % (pc['folder_name'], self.param_hashes[param_hash])
+                continue
+            self.param_hashes[param_hash] = pc['folder_name']
+            params = pc.load_params()
+            pc.create_folders()
+            pc.write_parameters_to_file()
+
+            cmd = 'python %s %s' % (self.script, params['params_fn_json'])
+            if params['spike_output_format'] == 'binary':
+                done_fns = [params['exc_spiketimes_fn_merged'] + '.bin', params['inh_spiketimes_fn_merged'] + '.bin']
+            else:
+                done_fns = [params['exc_spiketimes_fn_merged'] + '.ras', params['inh_spiketimes_fn_merged'] + '.ras']
+            log_fn = params['tmp_folder'] + 'sweep_run.log'
+            self.add_job(cmd, n_procs=self.procs_per_run, done_fns=done_fns, log_fn=log_fn)
+
+
+    def add_job(self, cmd, n_procs=1, done_fns=[], log_fn=None, depends_on=[]):
+        """
+        cmd : the (python) command to run, e.g. 'python NetworkSimModule.py Folder/Parameters/simulation_parameters.json'
+        n_procs : if > 1, the command is started with mpirun -np n_procs
+        done_fns : if all these files exist, the job is complete and will be skipped
+        log_fn : file to which stdout and stderr of the job are written
+        depends_on : list of job ids (as returned by add_job) that need to finish successfully before this job starts
+        Returns the job id
+        """
+        assert (n_procs <= self.n_slots), 'Job needs %d processes, but only %d slots are available: %s' % (n_procs, self.n_slots, cmd)
+        if n_procs > 1:
+            cmd = '%s -np %d %s' % (self.mpirun, n_procs, cmd)
+        job = {'cmd' : cmd, 'n_procs' : n_procs, 'done_fns' : done_fns, 'log_fn' : log_fn, \
+                'depends_on' : depends_on, 'n_tries' : 0, 'status' : 'pending'}
+        self.jobs.append(job)
+        return len(self.jobs) - 1
+
+
+    def is_complete(self, job):
+        if len(job['done_fns']) == 0:
+            return False
+        for fn in job['done_fns']:
+            if not os.path.exists(fn):
+                return False
+        return True
+
+
+    def start_job(self, job):
+        job['n_tries'] += 1
+        print 'Starting (try %d): %s' % (job['n_tries'], job['cmd'])
+        sys.stdout.flush()
+        if job['log_fn'] != None:
+            log_file = file(job['log_fn'], 'a')
+        else:
+            log_file = None
+        job['process'] = subprocess.Popen(job['cmd'], shell=True, stdout=log_file, stderr=subprocess.STDOUT)
+        job['log_file'] = log_file
+        job['status'] = 'running'
+
+
+    def finish_job(self, job, returncode):
+        if job['log_file'] != None:
+            job['log_file'].close()
+        del job['process'], job['log_file']
+        if returncode == 0:
+            job['status'] = 'done'
+            print 'Finished: %s' % job['cmd']
+        elif job['n_tries'] <= self.max_retries:
+            job['status'] = 'pending'
+            print 'Failed with return code %d, will retry: %s' % (returncode, job['cmd'])
+        else:
+            job['status'] = 'failed'
+            print 'Failed with return code %d after %d tries: %s' % (returncode, job['n_tries'], job['cmd'])
+        sys.stdout.flush()
+
+
+    def run(self):
+        """
+        Runs all jobs, at most n_slots processes at a time.
+        Returns the list of commands that failed.
+        """
+        t_start = time.time()
+        for job in self.jobs:
+            if self.is_complete(job):
+                print 'Skipping (complete): %s' % job['cmd']
+                job['status'] = 'done'
+
+        n_free_slots = self.n_slots
+        while True:
+            # check running jobs
+            for job in self.jobs:
+                if job['status'] == 'running':
+                    returncode = job['process'].poll()
+                    if returncode != None:
+                        n_free_slots += job['n_procs']
+                        self.finish_job(job, returncode)
+
+            # jobs whose dependencies failed can never run
+            for job in self.jobs:
+                if job['status'] == 'pending':
+                    for job_id in job['depends_on']:
+                        if self.jobs[job_id]['status'] in ['failed', 'skipped']:
+                            job['status'] = 'skipped'
+                            print 'Not running because a job it depends on failed: %s' % job['cmd']
+                            break
+
+            # start pending jobs
+            for job in self.jobs:
+                if job['status'] == 'pending' and job['n_procs'] <= n_free_slots:
+                    ready = True
+                    for job_id in job['depends_on']:
+                        if self.jobs[job_id]['status'] != 'done':
+                            ready = False
+                    if ready:
+                        self.start_job(job)
+                        n_free_slots -= job['n_procs']
+
+            n_running = len([job for job in self.jobs if job['status'] == 'running'])
+            n_pending = len([job for job in self.jobs if job['status'] == 'pending'])
+            if n_running == 0 and n_pending == 0:
+                break
+            time.sleep(self.poll_interval)
+
+        t_run = time.time() - t_start
+        failed = [job['cmd'] for job in self.jobs if job['status'] in ['failed', 'skipped']]
+        print 'Sweep with %d jobs finished in %d sec or %.1f min, %d failed' % (len(self.jobs), t_run, t_run / 60., len(failed))
+        for cmd in failed:
+            print '\tFailed:', cmd
+        return failed
@@ -54,8 +54,7 @@ class AbstractNetwork(object):
         self.output_activity = np.zeros((self.n_time_steps, n_cells))
 
         self.v_pred = np.zeros((self.n_time_steps, 3))
-        self.t_axis = np.arange(self.n_time_steps)
-        self.t_axis *= self.params['dt_rate']
+        self.t_axis = np.arange(self.n_time_steps) * self.params['dt_rate']
         self.v_pred[:, 0] = self.t_axis
 
         print 'Loading files %s' % fn_base, 
@@ -130,10 +129,11 @@ class AbstractNetwork(object):
 
 
         if output_fn_base == None:
-            output_fn_activity = params['activity_folder'] + 'output_activity_%d.dat' % (self.iteration)
+            output_fn_base = self.params['activity_folder']
+        output_fn_activity = output_fn_base + 'output_activity_%d.dat' % (self.iteration)
         print 'Saving ANN activity to:', output_fn_activity
         np.savetxt(output_fn_activity, self.output_activity)
-        output_fn_prediction = params['activity_folder'] + 'prediction_%d.dat' % (self.iteration)
+        output_fn_prediction = output_fn_base + 'prediction_%d.dat' % (self.iteration)
         print 'Saving ANN prediction to:', output_fn_prediction
         np.savetxt(output_fn_prediction, self.v_pred)
 
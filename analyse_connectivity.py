@@ -48,7 +48,7 @@ class ConnectivityAnalyser(object):
         print 'Loading:', fn
         if not os.path.exists(fn):
             print 'Merging connlists ...'
-            cmd = 'python merge_connlists.py %s' % self.params['params_fn']
+            cmd = 'python merge_connlists.py %s' % self.params['params_fn_json']
             os.system(cmd)
 
         self.conn_lists[conn_type] = np.loadtxt(fn)
@@ -67,28 +67,16 @@ class ConnectivityAnalyser(object):
 
     def plot_num_outgoing_connections(self, conn_type, fig_cnt=1):
 
-        fn = self.params['merged_conn_list_%s' % conn_type]
-        print 'Loading:', fn
-        if not os.path.exists(fn):
-            print 'Merging connlists ...'
-            cmd = 'python merge_connlists.py %s' % self.params['params_fn']
-            os.system(cmd)
-
         if not self.conn_lists.has_key(conn_type):
             self.load_connlist(conn_type)
         conn_list = self.conn_lists[conn_type]
 
         (n_src, n_tgt, syn_type) = utils.resolve_src_tgt(conn_type, self.params)
-        n_tgts = np.zeros(n_src)
-        w_out = np.zeros(n_src)
-        n_srcs = np.zeros(n_tgt)
-        w_in = np.zeros(n_tgt)
-        for i in xrange(conn_list[:, 0].size):
-            src, tgt, w, delay = conn_list[i, :4]
-            n_tgts[src] += 1 # count how often src connects to some other cell
-            n_srcs[tgt] += 1 # count how often tgt is the target cell
-            w_out[src] += w
-            w_in[tgt] += w
+        srcs, tgts = conn_list[:, 0].astype(int), conn_list[:, 1].astype(int)
+        n_tgts = np.bincount(srcs, minlength=n_src).astype(float) # count how often src connects to some other cell
+        n_srcs = np.bincount(tgts, minlength=n_tgt).astype(float) # count how often tgt is the target cell
+        w_out = np.bincount(srcs, weights=conn_list[:, 2], minlength=n_src)
+        w_in = np.bincount(tgts, weights=conn_list[:, 2], minlength=n_tgt)
 
         n_out_mean = n_tgts.mean()
         n_out_sem = n_tgts.std() / np.sqrt(n_src)
@@ -178,7 +166,7 @@ class ConnectivityAnalyser(object):
         print 'Loading:', fn
         if not os.path.exists(fn):
             print 'Merging connlists ...'
-            cmd = 'python merge_connlists.py %s' % self.params['params_fn']
+            cmd = 'python merge_connlists.py %s' % self.params['params_fn_json']
             os.system(cmd)
 
         if not self.conn_lists.has_key(conn_type):
@@ -244,14 +232,9 @@ class ConnectivityAnalyser(object):
         c_v_i = sum_j w_ij * (v_i - v_j) # v_ are preferred directions
         """
         (n_src, n_tgt, tp_src, tp_tgt) = utils.resolve_src_tgt_with_tp(conn_type, self.params)
-        fn = self.params['merged_conn_list_%s' % conn_type]
-        print 'Loading:', fn
-        if not os.path.exists(fn):
-            print 'Merging connlists ...'
-            cmd = 'python merge_connlists.py %s' % self.params['params_fn']
-            os.system(cmd)
-
-        conn_list = np.loadtxt(fn)
+        if not self.conn_lists.has_key(conn_type):
+            self.load_connlist(conn_type)
+        conn_list = self.conn_lists[conn_type]
 
 #        conn_mat_fn = self.params['conn_mat_fn_base'] + '%s.dat' % (conn_type)
 #        if os.path.exists(conn_mat_fn):
@@ -262,35 +245,15 @@ class ConnectivityAnalyser(object):
 #            print 'Saving:', conn_mat_fn
 #            np.savetxt(conn_mat_fn, w)
 
+        # centroids of all source cells at once, (0, 0) for cells without outgoing connections
+        c_x, c_v = self.get_cg_vecs(conn_list, tp_src, tp_tgt, n_src)
+
         # for all source cells store the length of the vector:
         # (connection centroid - preferred direction)
-        diff_conn_centroid_x_vsrc = np.zeros(n_src)
-        diff_conn_centroid_v_vsrc = np.zeros(n_src)
-        angles_x = np.zeros(n_src)
-        angles_v = np.zeros(n_src)
-        # deprecated
-#        cx_ = np.zeros(n_src) # stores the scalar products
-#        cv_ = np.zeros(n_src) # stores the scalar products
-        for i in xrange(n_src):
-            src_gid = i
-            targets = utils.get_targets(conn_list, src_gid)
-            weights = targets[:, 2]
-            targets = np.array(targets[:, 1], dtype=np.int)
-#            weights = w[src_gid, targets]
-            if weights.size > 0:
-                c_x, c_v = self.get_cg_vec(tp_src[src_gid, :], tp_tgt[targets, :], weights)
-            else:
-                c_x, c_v = [(0, 0), (0, 0)]
-
-            (x_src, y_src, vx_src, vy_src) = tp_src[src_gid, :]
-#            cx_[i] = np.abs(np.dot(c_x, (vx_src, vy_src)))
-#            cv_[i] = np.abs(np.dot(c_v, (vx_src, vy_src)))
-
-            vector_conn_centroid_x_minus_vsrc = (c_x[0] - vx_src, c_x[1] - vy_src)
-            vector_conn_centroid_v_minus_vsrc = (c_v[0] - vx_src, c_v[1] - vy_src)
-#            angles_x[i] = np.arc((c_x[
-            diff_conn_centroid_x_vsrc[i] = np.sqrt(np.dot(vector_conn_centroid_x_minus_vsrc, vector_conn_centroid_x_minus_vsrc))
-            diff_conn_centroid_v_vsrc[i] = np.sqrt(np.dot(vector_conn_centroid_v_minus_vsrc, vector_conn_centroid_v_minus_vsrc))
+        vector_conn_centroid_x_minus_vsrc = c_x - tp_src[:n_src, 2:4]
+        vector_conn_centroid_v_minus_vsrc = c_v - tp_src[:n_src, 2:4]
+        diff_conn_centroid_x_vsrc = np.sqrt((vector_conn_centroid_x_minus_vsrc**2).sum(axis=1))
+        diff_conn_centroid_v_vsrc = np.sqrt((vector_conn_centroid_v_minus_vsrc**2).sum(axis=1))
 
 
         print 'diff_conn_centroid_x_vsrc mean %.2e +- %.2e' % (diff_conn_centroid_x_vsrc.mean(), diff_conn_centroid_x_vsrc.std())
@@ -348,24 +311,47 @@ class ConnectivityAnalyser(object):
         tp_src = 4-tuple of the source's tuning properties
         tp_tgt = 4 x n_tgt array with all the target's tuning properties
         """
-
-        c_x = np.zeros(2)
-        c_v = np.zeros(2)
-        weights /= weights.max()
-        (x_src, y_src, vx_src, vy_src) = tp_src
-
+        weights = weights / weights.max()
         n_tgt = tp_tgt[:, 0].size
-        for tgt in xrange(n_tgt):
-            (x_tgt, y_tgt, vx_tgt, vy_tgt) = tp_tgt[tgt, :]
-            c_x += weights[tgt] * np.array( (x_tgt - x_src) % 1., (y_tgt - y_src) % 1.)
-            c_v += weights[tgt] * np.array(vx_tgt - vx_src, vy_tgt - vy_src)
-
-        c_x /= n_tgt
-        c_v /= n_tgt
+        c_x = (weights[:, np.newaxis] * ((tp_tgt[:, 0:2] - tp_src[0:2]) % 1.)).sum(axis=0) / n_tgt
+        c_v = (weights[:, np.newaxis] * (tp_tgt[:, 2:4] - tp_src[2:4])).sum(axis=0) / n_tgt
 #        c_x *= self.params['connectivity_radius']
 #        c_v *= self.params['connectivity_radius']
         return c_x, c_v
-#        n_tgt =
+
+
+    def get_cg_vecs(self, conn_list, tp_src, tp_tgt, n_src):
+        """
+        get_cg_vec for all source cells at once: the connection list is sorted by source and the sums are
+        segment reductions (np.maximum.reduceat for the weight normalization, np.bincount for the sums)
+        instead of one mask over the whole list per source.
+        Returns c_x, c_v with shape (n_src, 2), (0, 0) for sources without targets
+        """
+        c_x = np.zeros((n_src, 2))
+        c_v = np.zeros((n_src, 2))
+        if conn_list.size == 0:
+            return c_x, c_v
+        conn_list = conn_list.reshape((-1, conn_list.shape[-1]))
+        order = np.argsort(conn_list[:, 0], kind='mergesort')
+        srcs = conn_list[order, 0].astype(np.int)
+        tgts = conn_list[order, 1].astype(np.int)
+        weights = conn_list[order, 2]
+
+        n_tgts = np.bincount(srcs, minlength=n_src)
+        seg_start = np.concatenate(([0], np.cumsum(n_tgts)[:-1]))
+        has_tgts = n_tgts > 0
+        w_max = np.ones(n_src)
+        w_max[has_tgts] = np.maximum.reduceat(weights, seg_start[has_tgts])
+        weights = weights / w_max[srcs]
+
+        dx = (tp_tgt[tgts, 0:2] - tp_src[srcs, 0:2]) % 1.
+        dv = tp_tgt[tgts, 2:4] - tp_src[srcs, 2:4]
+        for i in xrange(2):
+            c_x[:, i] = np.bincount(srcs, weights=weights * dx[:, i], minlength=n_src)
+            c_v[:, i] = np.bincount(srcs, weights=weights * dv[:, i], minlength=n_src)
+        c_x[has_tgts] /= n_tgts[has_tgts, np.newaxis]
+        c_v[has_tgts] /= n_tgts[has_tgts, np.newaxis]
+        return c_x, c_v
 
 
     def create_connectivity(self, conn_type):
@@ -443,6 +429,30 @@ class ConnectivityAnalyser(object):
 
 
 
+def plot_connectivity_analysis(params, conn_type, tp_exc=None, tp_inh=None, conn_list=None, comm=None):
+    """
+    Plots the number of outgoing and incoming connections and the summed weights per cell
+    tp_exc, tp_inh, conn_list : tuning properties and the merged connection list if loaded before (see PlotDriver)
+    """
+    CA = ConnectivityAnalyser(params, comm)
+    if tp_exc is None or tp_inh is None:
+        CA.load_tuning_prop()
+    else:
+        CA.tp_exc, CA.tp_inh = tp_exc, tp_inh
+    if conn_list is not None:
+        CA.conn_lists[conn_type] = conn_list
+    CA.n_fig_x = 1
+    CA.n_fig_y = 3
+    CA.create_fig()
+#    CA.plot_tgt_connections(conn_type, fig_cnt=1)
+    CA.plot_num_outgoing_connections(conn_type, fig_cnt=2)
+    output_fn = params['figures_folder'] + 'connectivity_analysis_%s.png' % conn_type
+    print 'Saving to', output_fn
+    pylab.savefig(output_fn)
+    return output_fn
+
+
+
 if __name__ == '__main__':
 
 
@@ -491,22 +501,9 @@ if __name__ == '__main__':
     else:
         conn_types = [conn_type]
     print 'Processing conn_types', conn_types
-    CA = ConnectivityAnalyser(params, comm)
-
-
-    def plot_outgoing_connections(conn_type):
-        CA.load_tuning_prop()
-        CA.n_fig_x = 1
-        CA.n_fig_y = 3
-        CA.create_fig()
-#        CA.plot_tgt_connections(conn_type, fig_cnt=1)
-        CA.plot_num_outgoing_connections(conn_type, fig_cnt=2)
 
     for conn_type in conn_types:
-        plot_outgoing_connections(conn_type)
-        output_fn = params['figures_folder'] + 'connectivity_analysis_%s.png' % conn_type
-        print 'Saving to', output_fn
-        pylab.savefig(output_fn)
+        plot_connectivity_analysis(params, conn_type, comm=comm)
 
 #    pylab.show()
 
@@ -0,0 +1,313 @@
+"""
+Benchmarks the stages that do not need a simulator with synthetic data:
+    tuning_prop     utils.set_tuning_prop
+    input           utils.create_spike_trains_for_motion (get_input + Poisson spike trains)
+    connections     CC.get_p_conn_vec for the target cells
+    bcpnn           Bcpnn.get_spiking_weight_and_bias for random pre / post spike trains
+    abstract        AbstractNetwork.calculate_dynamics
+    prediction      PlotPrediction (loading and binning the spikes) + compute_v_estimates
+
+Every stage is run for all combinations of the given network sizes, the minimum time of the repetitions is
+reported together with the time per item (cells, connections, ...) and the scaling exponent time ~ n_items ** exponent,
+which is fitted only for stages whose number of items changes with the network size (not bcpnn, which processes
+--n_pairs connections, nor input / connections if --max_cells limits them).
+The results are stored in output_folder/benchmark_<git commit>_<date>.json so that runs of different commits can be compared.
+
+Usage:
+    python benchmark.py --N_RF 10 20 40 80 --N_V 4 --N_theta 4 --t_sim 1000
+    python benchmark.py --stages connections bcpnn --compare Benchmarks/benchmark_abc123_20130101_120000.json
+"""
+import os
+import sys
+import time
+import json
+import shutil
+import tempfile
+import argparse
+import itertools
+import subprocess
+import numpy as np
+import simulation_parameters
+import utils
+
+all_stages = ['tuning_prop', 'input', 'connections', 'bcpnn', 'abstract', 'prediction']
+
+
+def get_params(N_RF, N_V, N_theta, t_sim, folder_name):
+    """
+    Returns the parameter dictionary for the given network size (the derived cell numbers
+    are computed the same way as in simulation_parameters), all files (including the input) are written to folder_name
+    """
+    ps = simulation_parameters.parameter_storage()
+    new_params = {'N_RF' : N_RF, 'N_V' : N_V, 'N_theta' : N_theta, 't_sim' : t_sim, 'folder_name' : folder_name}
+    new_params['N_RF_X'] = np.int(np.sqrt(N_RF * np.sqrt(3)))
+    new_params['N_RF_Y'] = np.int(np.sqrt(N_RF))
+    new_params['n_exc'] = new_params['N_RF_X'] * new_params['N_RF_Y'] * N_V * N_theta
+    new_params['N_theta_inh'] = N_theta
+    new_params['N_RF_INH'] = int(round(ps.params['fraction_inh_cells'] * N_RF * float(N_V * N_theta) / (ps.params['N_V_INH'] * N_theta)))
+    new_params['N_RF_X_INH'] = np.int(np.sqrt(new_params['N_RF_INH'] * np.sqrt(3)))
+    new_params['N_RF_Y_INH'] = np.int(np.sqrt(new_params['N_RF_INH']))
+    new_params['n_inh'] = new_params['N_RF_X_INH'] * new_params['N_RF_Y_INH'] * N_theta * ps.params['N_V_INH']
+    new_params['n_cells'] = new_params['n_exc'] + new_params['n_inh']
+    # used by AbstractNetwork
+    new_params['abstract_input_fn_base'] = 'abstract_input_'
+    new_params['activity_folder'] = folder_name
+    new_params['weights_folder'] = folder_name
+    ps.update_values(new_params)
+    # the input folder is usually shared by all runs in the working directory, here it goes to folder_name as well
+    input_folder = ps.params['input_folder']
+    for key, value in ps.params.items():
+        if isinstance(value, str) and value.startswith(input_folder):
+            ps.params[key] = folder_name + value
+    ps.params['folder_names'] = [folder_name + f if f == input_folder else f for f in ps.params['folder_names']]
+    ps.params['artefact_cache_folder'] = folder_name + ps.params['artefact_cache_folder']
+    ps.create_folders()
+    return ps.params
+
+
+def get_poisson_spikes(n_cells, t_sim, rate, seed=0):
+    """
+    Returns d with d[:, 0] = spike times, d[:, 1] = gids (like the .ras files) sorted by time
+    """
+    rnd = np.random.RandomState(seed)
+    n_spikes = rnd.poisson(n_cells * rate * t_sim / 1000.)
+    d = np.zeros((n_spikes, 2))
+    d[:, 0] = np.sort(rnd.uniform(0, t_sim, n_spikes))
+    d[:, 1] = rnd.randint(0, n_cells, n_spikes)
+    return d
+
+
+# each stage returns the number of items (cells, connections ...) it processed
+def run_tuning_prop(params, options):
+    utils.set_tuning_prop(params, mode='hexgrid', cell_type='exc')
+    return params['n_exc']
+
+
+def get_n_cells(params, options):
+    """
+    Number of cells processed by input and connections: all cells unless --max_cells is given
+    """
+    if options.max_cells == None:
+        return params['n_exc']
+    return min(params['n_exc'], options.max_cells)
+
+
+def run_input(params, options):
+    tp = utils.set_tuning_prop(params, mode='hexgrid', cell_type='exc')
+    my_units = range(get_n_cells(params, options))
+    utils.create_spike_trains_for_motion(tp, params, contrast=.9, my_units=my_units)
+    return len(my_units)
+
+
+def run_connections(params, options):
+    import CreateConnections as CC
+    tp = utils.set_tuning_prop(params, mode='hexgrid', cell_type='exc')
+    n_tgt = get_n_cells(params, options)
+    for tgt in xrange(n_tgt):
+        p, latency = CC.get_p_conn_vec(tp, tp[tgt, :], params['w_sigma_x'], params['w_sigma_v'], params['connectivity_radius'])
+    return n_tgt
+
+
+def run_bcpnn(params, options):
+    import Bcpnn
+    d = get_poisson_spikes(2 * options.n_pairs, params['t_sim'], options.rate)
+    tau_dict = {'tau_zi' : 10, 'tau_zj' : 10, 'tau_ei' : 100, 'tau_ej' : 100, 'tau_eij' : 100, 'tau_pi' : 1000, 'tau_pj' : 1000, 'tau_pij' : 1000}
+    for pair in xrange(options.n_pairs):
+        pre_trace = utils.convert_spiketrain_to_trace(d[d[:, 1] == 2 * pair, 0], int(params['t_sim']) + 1)
+        post_trace = utils.convert_spiketrain_to_trace(d[d[:, 1] == 2 * pair + 1, 0], int(params['t_sim']) + 1)
+        Bcpnn.get_spiking_weight_and_bias(pre_trace, post_trace, tau_dict=tau_dict)
+    return options.n_pairs
+
+
+def run_abstract(params, options):
+    import abstract_network
+    rnd = np.random.RandomState(0)
+    np.savetxt(params['tuning_prop_means_fn'], utils.set_tuning_prop(params, mode='hexgrid', cell_type='exc'))
+    AN = abstract_network.AbstractNetwork(params)
+    if not os.path.exists(AN.training_input_folder):
+        os.mkdir(AN.training_input_folder)
+    for cell in xrange(params['n_exc']):
+        np.savetxt(AN.training_input_folder + params['abstract_input_fn_base'] + '%d.dat' % cell, rnd.rand(options.n_abstract_steps))
+    AN.wij = rnd.rand(params['n_exc'], params['n_exc'])
+    AN.bias = rnd.rand(params['n_exc'], 2)
+    AN.calculate_dynamics(output_fn_base=params['folder_name'])
+    return params['n_exc']
+
+
+def run_prediction(params, options):
+    import matplotlib
+    matplotlib.use('Agg')
+    import PlotPrediction
+    np.savetxt(params['tuning_prop_means_fn'], utils.set_tuning_prop(params, mode='hexgrid', cell_type='exc'))
+    spike_fn = params['exc_spiketimes_fn_merged'] + '.ras'
+    np.savetxt(spike_fn, get_poisson_spikes(params['n_exc'], params['t_sim'], options.rate))
+    plotter = PlotPrediction.PlotPrediction(params, data_fn=spike_fn)
+    plotter.compute_v_estimates()
+    return params['n_exc']
+
+
+def get_git_commit():
+    try:
+        p = subprocess.Popen(['git', 'rev-parse', '--short', 'HEAD'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, \
+                cwd=os.path.dirname(os.path.abspath(__file__)))
+        commit = p.communicate()[0].strip()
+        if p.returncode == 0 and commit != '':
+            return commit
+    except OSError:
+        pass
+    return 'unknown'
+
+
+def run_stage(stage, params, options):
+    """
+    Returns the minimum time of options.repeat runs and the number of items processed, None if the stage fails
+    """
+    stage_fct = globals()['run_%s' % stage]
+    times = []
+    for i in xrange(options.repeat):
+        t0 = time.time()
+        stdout = sys.stdout
+        if not options.verbose: # the stages print a lot
+            sys.stdout = open(os.devnull, 'w')
+        import_error = None
+        try:
+            n_items = stage_fct(params, options)
+        except ImportError, e:
+            import_error = e
+        finally:
+            if sys.stdout != stdout:
+                sys.stdout.close()
+            sys.stdout = stdout
+        if import_error != None:
+            print 'Skipping stage %s, import failed: %s' % (stage, import_error)
+            return None
+        times.append(time.time() - t0)
+    return min(times), n_items
+
+
+def get_scaling_exponents(results):
+    """
+    Fits time ~ n_items ** exponent for every stage and t_sim.
+    Stages whose number of items changes by less than a factor 2 over the network sizes get no exponent;
+    if several sizes gave the same number of items (e.g. limited by --max_cells) the fastest of them is used.
+    Returns the exponents and the list of stages without exponent
+    """
+    exponents = {}
+    fixed_size = []
+    for (stage, t_sim) in set([(r['stage'], r['t_sim']) for r in results]):
+        key = '%s_tsim%d' % (stage, t_sim)
+        rows = [r for r in results if r['stage'] == stage and r['t_sim'] == t_sim]
+        n = np.unique([r['n_items'] for r in rows])
+        t = np.array([min([r['time'] for r in rows if r['n_items'] == n_]) for n_ in n])
+        if n.max() >= 2 * n.min() and (t > 0).all():
+            exponents[key] = np.polyfit(np.log(n.astype(np.float64)), np.log(t), 1)[0]
+        else:
+            fixed_size.append(key)
+    return exponents, fixed_size
+
+
+def compare(results, old_fn, threshold=1.2):
+    """
+    Prints the ratio time_new / time_old for the configurations present in both runs
+    """
+    f = file(old_fn, 'r')
+    old = json.load(f)
+    f.close()
+    old_times = dict([((r['stage'], r['N_RF'], r['N_V'], r['N_theta'], r['t_sim']), r['time']) for r in old['results']])
+    print '\nComparison with %s (commit %s):' % (old_fn, old['commit'])
+    for r in results:
+        key = (r['stage'], r['N_RF'], r['N_V'], r['N_theta'], r['t_sim'])
+        if old_times.has_key(key) and old_times[key] > 0:
+            ratio = r['time'] / old_times[key]
+            flag = ''
+            if ratio > threshold:
+                flag = 'SLOWER'
+            elif ratio < 1. / threshold:
+                flag = 'faster'
+            print '%-12s n_exc=%6d t_sim=%6d: %8.3f s (before %8.3f s) ratio %.2f %s' % (r['stage'], r['n_exc'], r['t_sim'], r['time'], old_times[key], ratio, flag)
+
+
+def plot_scaling(results, output_fn):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import pylab
+    except ImportError:
+        print 'matplotlib not available, no scaling plot'
+        return
+    fig = pylab.figure()
+    ax = fig.add_subplot(111)
+    for (stage, t_sim) in sorted(set([(r['stage'], r['t_sim']) for r in results])):
+        rows = sorted([(r['n_items'], r['time']) for r in results if r['stage'] == stage and r['t_sim'] == t_sim])
+        ax.loglog([row[0] for row in rows], [row[1] for row in rows], 'o-', label='%s t_sim=%d' % (stage, t_sim))
+    ax.set_xlabel('Number of items (cells, connections, ...)')
+    ax.set_ylabel('Time [s]')
+    ax.legend(loc='upper left', fontsize=8)
+    print 'Saving scaling plot to:', output_fn
+    pylab.savefig(output_fn)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Benchmark of the stages that do not need a simulator')
+    parser.add_argument('--N_RF', type=int, nargs='+', default=[10, 20, 40])
+    parser.add_argument('--N_V', type=int, nargs='+', default=[4])
+    parser.add_argument('--N_theta', type=int, nargs='+', default=[4])
+    parser.add_argument('--t_sim', type=float, nargs='+', default=[1000.])
+    parser.add_argument('--stages', nargs='+', default=all_stages, choices=all_stages)
+    parser.add_argument('--repeat', type=int, default=3, help='the minimum time of the repetitions is reported')
+    parser.add_argument('--max_cells', type=int, default=None, help='maximum number of cells for input and connections (default: all)')
+    parser.add_argument('--n_pairs', type=int, default=10, help='number of connections for bcpnn')
+    parser.add_argument('--n_abstract_steps', type=int, default=5, help='number of time steps for abstract')
+    parser.add_argument('--rate', type=float, default=10., help='[Hz] rate of the synthetic spike trains')
+    parser.add_argument('--output_folder', default='Benchmarks/')
+    parser.add_argument('--compare', default=None, help='result file of a previous run')
+    parser.add_argument('--verbose', action='store_true')
+    options = parser.parse_args()
+
+    if not os.path.exists(options.output_folder):
+        os.makedirs(options.output_folder)
+    results = []
+    for (N_RF, N_V, N_theta, t_sim) in itertools.product(options.N_RF, options.N_V, options.N_theta, options.t_sim):
+        tmp_folder = tempfile.mkdtemp(prefix='benchmark_') + '/'
+        try:
+            stdout = sys.stdout
+            sys.stdout = open(os.devnull, 'w')
+            try:
+                params = get_params(N_RF, N_V, N_theta, t_sim, tmp_folder)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            for stage in options.stages:
+                result = run_stage(stage, params, options)
+                if result == None:
+                    continue
+                t, n_items = result
+                results.append({'stage' : stage, 'N_RF' : N_RF, 'N_V' : N_V, 'N_theta' : N_theta, 't_sim' : t_sim, \
+                        'n_exc' : params['n_exc'], 'n_items' : n_items, 'time' : t, 'time_per_item' : t / n_items})
+                print '%-12s N_RF=%4d N_V=%3d N_theta=%3d n_exc=%6d t_sim=%6d: %8.3f s (%d items, %.2e s per item)' % \
+                        (stage, N_RF, N_V, N_theta, params['n_exc'], t_sim, t, n_items, t / n_items)
+                sys.stdout.flush()
+        finally: # also if a stage fails
+            shutil.rmtree(tmp_folder)
+
+    exponents, fixed_size = get_scaling_exponents(results)
+    if len(exponents) > 0:
+        print '\nScaling exponents (time ~ n_items ** exponent):'
+        for key in sorted(exponents.keys()):
+            print '\t%-30s %.2f' % (key, exponents[key])
+    if len(fixed_size) > 0:
+        print 'No exponent (number of items nearly the same for all sizes, compare the time per item):', ', '.join(sorted(fixed_size))
+
+    commit = get_git_commit()
+    output_fn = options.output_folder + 'benchmark_%s_%s' % (commit, time.strftime('%Y%m%d_%H%M%S'))
+    output = {'commit' : commit, 'date' : time.strftime('%Y-%m-%d %H:%M:%S'), 'host' : os.uname()[1], \
+            'options' : vars(options), 'results' : results, 'scaling_exponents' : exponents, 'no_exponent' : fixed_size}
+    print 'Writing results to:', output_fn + '.json'
+    f = file(output_fn + '.json', 'w')
+    json.dump(output, f, indent=1)
+    f.close()
+    plot_scaling(results, output_fn + '.png')
+
+    if options.compare != None:
+        compare(results, options.compare)
@@ -12,7 +12,7 @@ print "Motion parameters", mp
 sigma_x, sigma_v = params['w_sigma_x'], params['w_sigma_v'] # small sigma values let p and w shrink
 
 print 'utils.sort_gids_by_distance_to_stimulus...'
-indices, distances = utils.sort_gids_by_distance_to_stimulus(tp , mp) # cells in indices should have the highest response to the stimulus
+indices, distances = utils.sort_gids_by_distance_to_stimulus(tp , mp, params) # cells in indices should have the highest response to the stimulus
 print 'utils.convert_connlist_to_matrix...'
 conn_mat, delays = utils.convert_connlist_to_matrix(params['conn_list_ee_fn_base'] + '0.dat', params['n_exc'], params['n_exc'])
 #n = 50
@@ -38,7 +38,7 @@ for i in xrange(n):
     w_out_good = conn_mat[gid, other_gids].sum()
     w_in_sum = conn_mat[:, gid].sum()
     w_out_sum = conn_mat[gid, :].sum()
-    distance_to_stim, spatial_dist = utils.get_min_distance_to_stim(mp, tp[gid, :])
+    distance_to_stim, spatial_dist = utils.get_min_distance_to_stim(mp, tp[gid, :], params)
     print '%d\t%d\t%.3e\t%.3e\t%.3e\t%.3e\t%.3e' % (gid, nspikes[gid], distance_to_stim, w_out_good, w_in_good, w_out_sum, w_in_sum), tp[gid, :]
 #    print '%d\t%d\t%.3e\t%.3e\t%.3e' % (gid, nspikes[gid], distance_to_stim, w_in_good, w_in_sum), tp[gid, :]
 
@@ -57,7 +57,7 @@ for i in xrange(n):
     w_out_good = conn_mat[gid, other_gids].sum()
     w_in_sum = conn_mat[:, gid].sum()
     w_out_sum = conn_mat[gid, :].sum()
-    distance_to_stim, spatial_dist = utils.get_min_distance_to_stim(mp, tp[gid, :])
+    distance_to_stim, spatial_dist = utils.get_min_distance_to_stim(mp, tp[gid, :], params)
     print '%d\t%d\t%.3e\t%.3e\t%.3e\t%.3e\t%.3e' % (gid, nspikes[gid], distance_to_stim, w_out_good, w_in_good, w_out_sum, w_in_sum), tp[gid, :]
 
 
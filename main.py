@@ -45,7 +45,7 @@ for sim_cnt in xrange(n_sim):
     #     S I M U L A T E     #
     # # # # # # # # # # # # # #
     print "Simulation run: %d / %d" % (sim_cnt+1, n_sim)
-    simStarter.run_sim(connect_exc_exc=False)
+    simStarter.run_sim({'connectivity_ee' : False}) # learning runs without recurrent E - E connections
     print "Simulation ended on proc %d / %d" % (pc_id, n_proc)
     if comm != None:
         comm.Barrier()
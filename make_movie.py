@@ -1,5 +1,6 @@
 import os
 import sys
+import numpy as np
 
 def avconv(input_fn, output_fn_movie, fps=0.5):
 #    command = "avconv -f image2 -r %f -i %s -b 72000 %s" % (fps, input_fn, output_fn_movie)
@@ -9,9 +10,23 @@ def avconv(input_fn, output_fn_movie, fps=0.5):
     os.system(command)
     print 'Output movie:', output_fn_movie
 
+
+def stream_frames(frames, output_fn_movie, fps=4., render_frame=None, n_procs=None):
+    """
+    Renders the frames (e.g. spatial readout arrays, shape (n_frames, n_x, n_y)) in worker processes and pipes
+    them to ffmpeg without writing image files, see MovieWriter.
+    render_frame : function(fig, frames, i), default: 2D activity map of frames[i] with the colour scale of all frames
+    """
+    import MovieWriter
+    if render_frame == None:
+        vmin, vmax = min(0., frames.min()), frames.max() # once, not for every frame
+        render_frame = lambda fig, frames, i: MovieWriter.render_pcolor(fig, frames, i, vmin=vmin, vmax=vmax)
+    return MovieWriter.write_movie(frames, render_frame, output_fn_movie, fps=fps, n_procs=n_procs)
+
+
 if __name__ == '__main__':
     if len(sys.argv) < 2:
-        input_fn = raw_input('Give input filename: e.g. folder/fig_%.png\n')
+        input_fn = raw_input('Give input filename: e.g. folder/fig_%.png or frames.npy\n')
     else:
         input_fn = sys.argv[1]
 
@@ -20,4 +35,7 @@ if __name__ == '__main__':
     else:
         output_fn_movie= sys.argv[2]
 
-    avconv(input_fn, output_fn_movie, fps=4.)
+    if input_fn.endswith('.npy'): # array of frames --> streamed to ffmpeg
+        stream_frames(np.load(input_fn), output_fn_movie, fps=4.)
+    else:
+        avconv(input_fn, output_fn_movie, fps=4.)
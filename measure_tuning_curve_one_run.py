@@ -22,6 +22,8 @@ params = ps.params
 x0, y0 = params['motion_params'][0:2]
 sim_cnt = int(sys.argv[1])
 mp = float(sys.argv[2]), float(sys.argv[3]), float(sys.argv[4]), float(sys.argv[5])
+if len(sys.argv) > 6: # input spike trains prepared for this stimulus, see measure_tuning_curves.py
+    params['input_st_fn_base'] = sys.argv[6]
 
 from pyNN.utility import Timer
 timer = Timer()
@@ -114,6 +116,6 @@ for k in times.keys():
     times['t_all'] += times[k]
 
 times = ntp.ParameterSet(times)
-times.save('times_dict.py')
+times.save(params['folder_name'] + 'times_dict_%d.py' % sim_cnt) # trials run concurrently in the same directory
 
 print 'Total time: %d sec' % (times['t_all'])
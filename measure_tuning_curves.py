@@ -7,6 +7,7 @@ import os
 import time
 import numpy as np
 import simulation_parameters
+import SweepRunner
 network_params = simulation_parameters.parameter_storage()  # network_params class containing the simulation parameters
 params = network_params.load_params()                       # params stores cell numbers, etc as a dictionary
 
@@ -15,8 +16,14 @@ params = network_params.load_params()                       # params stores cell
 n_theta = 36
 n_trials = 6 # per angle
 
-prepare_input = "mpirun -np 8 python prepare_spike_trains.py "
-measurement = "mpirun -np 8 python measure_tuning_curve_one_run.py "
+n_proc_per_run = 8
+prepare_input = "python prepare_spike_trains.py "
+measurement = "python measure_tuning_curve_one_run.py "
+# all trials for one stimulus direction run concurrently, the input for the next direction
+# is prepared only after these are finished (the input rate files are shared by all directions).
+# The input spike trains of each direction are written to their own files, so that a complete
+# preparation is skipped when the sweep is restarted.
+SR = SweepRunner.SweepRunner(n_slots=32, procs_per_run=n_proc_per_run)
 
 v_theta = np.linspace(-.5 * np.pi, .5 * np.pi, n_theta, endpoint=False)
 v0 = .3 # amplitude
@@ -25,25 +32,32 @@ f = file(params['input_params_fn'], 'w')
 input_params = ''
 x0, y0 = .6, .5 #params['motion_params'][0:2]
 sim_cnt = 0
-t_start = time.time()
+previous_trials = []
 for i_theta, theta in enumerate(v_theta):
     vx = v0 * np.cos(theta)
     vy = v0 * np.sin(theta)
     x_start = x0 - vx
     y_start = y0 - vy
     print 'Preparing spikes for ', sim_cnt
-    os.system(prepare_input + "%f %f %f %f %d" % (x_start, y_start, vx, vy, sim_cnt))
+    input_st_fn_base = params['input_st_fn_base'] + 'sim%d_' % sim_cnt
+    input_fns = [input_st_fn_base + '%d.npy' % gid for gid in xrange(params['n_exc'])]
+    prepare_job = SR.add_job(prepare_input + "%f %f %f %f %d %s" % (x_start, y_start, vx, vy, sim_cnt, input_st_fn_base), n_procs=n_proc_per_run, \
+            done_fns=input_fns, depends_on=previous_trials)
     input_params = '%f\t%f\t%f\t%f\n' % (x_start, y_start, vx, vy)
     f.write(input_params)
     f.flush()
+    previous_trials = []
     for trial in xrange(n_trials):
-        print measurement + "%d %f %f %f %f" % (sim_cnt, x_start, y_start, vx, vy)
-        os.system(measurement + "%d %f %f %f %f" % (sim_cnt, x_start, y_start, vx, vy))
+        print measurement + "%d %f %f %f %f %s" % (sim_cnt, x_start, y_start, vx, vy, input_st_fn_base)
+        done_fns = [params['exc_spiketimes_fn_merged'] + '%d.ras' % sim_cnt]
+        trial_job = SR.add_job(measurement + "%d %f %f %f %f %s" % (sim_cnt, x_start, y_start, vx, vy, input_st_fn_base), n_procs=n_proc_per_run, \
+                done_fns=done_fns, depends_on=[prepare_job])
+        previous_trials.append(trial_job)
         sim_cnt = i_theta * n_trials + trial + 1
 
 f.close()
+t_start = time.time()
+SR.run()
 t_stop = time.time()
 t_diff = t_stop - t_start
 print "Full time for %d runs: %d sec %.1f min" % (sim_cnt, t_diff, t_diff / 60.)
-
-
@@ -14,13 +14,20 @@ import json
 
 class ConnectionPlotter(object):
 
-    def __init__(self, params):
+    def __init__(self, params, tp_exc=None, tp_inh=None, conn_lists={}):
+        """
+        tp_exc, tp_inh, conn_lists : tuning properties and merged connection lists {conn_type : array}
+            if loaded before (see PlotDriver), otherwise they are loaded from file
+        """
         self.params = params
 
-        self.tp_exc = np.loadtxt(params['tuning_prop_means_fn'])
-        self.tp_inh = np.loadtxt(params['tuning_prop_inh_fn'])
+        if tp_exc is None:
+            tp_exc = np.loadtxt(params['tuning_prop_means_fn'])
+        if tp_inh is None:
+            tp_inh = np.loadtxt(params['tuning_prop_inh_fn'])
+        self.tp_exc, self.tp_inh = tp_exc, tp_inh
         self.connection_matrices = {}
-        self.connection_lists = {}
+        self.connection_lists = dict(conn_lists)
         self.delays = {}
 
 #        self.lw_max = 10 # maximum line width for connection strengths
@@ -102,7 +109,7 @@ class ConnectionPlotter(object):
             quiver_style = ':'
             direction_dict = self.directions['src']
 
-        for i_, tgt in enumerate(tgt_ids):
+        for i_, tgt in enumerate(np.array(tgt_ids, dtype=int)): # gids are stored as floats in the connection lists
             x_tgt = tgt_tp[tgt, 0] % self.params['torus_width']#% 1
             y_tgt = tgt_tp[tgt, 1] % self.params['torus_height']#% 1
             self.x_min = min(x_tgt, self.x_min)
@@ -331,7 +338,7 @@ class ConnectionPlotter(object):
         elif conn_type == 'ii':
             loaded = self.conn_list_loaded[3]
 
-        if loaded:
+        if loaded or self.connection_lists.has_key(conn_type):
             return
 
         conn_list_fn = self.params['merged_conn_list_%s' % conn_type]
@@ -450,13 +457,11 @@ class ConnectionPlotter(object):
     
 
 
-if __name__ == '__main__':
-
-
-#    print 'Running merge_connlists.py...'
-#    os.system('python merge_connlists.py')
-
-
+def plot_connectivity_profile(params, tp_exc=None, tp_inh=None, conn_lists={}):
+    """
+    Plots the outgoing and incoming ee connections of the cell closest to target_vector with the preferred direction
+    tp_exc, tp_inh, conn_lists : see ConnectionPlotter
+    """
     with_directions = True
     with_delays = True
     with_histogram = False
@@ -466,25 +471,7 @@ if __name__ == '__main__':
         n_plots_x, n_plots_y = 1, 1
 
     np.random.seed(0)
-    if len(sys.argv) > 1:
-        if sys.argv[1].isdigit():
-            gid = int(sys.argv[1])
-        else:
-            param_fn = sys.argv[1]
-            if os.path.isdir(param_fn):
-                param_fn += '/Parameters/simulation_parameters.json'
-            import json
-            f = file(param_fn, 'r')
-            print 'Loading parameters from', param_fn
-            params = json.load(f)
-            gid = np.loadtxt(params['gids_to_record_fn'])[0]
-    else:
-        import simulation_parameters
-        ps = simulation_parameters.parameter_storage()
-        params = ps.params
-        gid = np.loadtxt(params['gids_to_record_fn'])[0]
-
-    P = ConnectionPlotter(params)
+    P = ConnectionPlotter(params, tp_exc, tp_inh, conn_lists)
 
 
     # here you can choose where the cell to plot should be sitting and what the preferred direction should be 
@@ -545,6 +532,34 @@ if __name__ == '__main__':
     output_fig = params['figures_folder'] + 'connectivity_profile_%d_wsx%.2f_wsv%.2f.png' % (gid, params['w_sigma_x'], params['w_sigma_v'])
     print 'Saving figure to', output_fig
     pylab.savefig(output_fig)
+    return output_fig
 
-#    pylab.show()
 
+
+if __name__ == '__main__':
+
+
+#    print 'Running merge_connlists.py...'
+#    os.system('python merge_connlists.py')
+
+
+    if len(sys.argv) > 1:
+        if sys.argv[1].isdigit():
+            gid = int(sys.argv[1])
+        else:
+            param_fn = sys.argv[1]
+            if os.path.isdir(param_fn):
+                param_fn += '/Parameters/simulation_parameters.json'
+            import json
+            f = file(param_fn, 'r')
+            print 'Loading parameters from', param_fn
+            params = json.load(f)
+            gid = np.loadtxt(params['gids_to_record_fn'])[0]
+    else:
+        import simulation_parameters
+        ps = simulation_parameters.parameter_storage()
+        params = ps.params
+        gid = np.loadtxt(params['gids_to_record_fn'])[0]
+
+    plot_connectivity_profile(params)
+#    pylab.show()
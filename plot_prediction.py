@@ -7,14 +7,17 @@ import simulation_parameters
 import os
 import utils
 
-def plot_prediction(params=None, data_fn=None, inh_spikes = None):
+def plot_prediction(params=None, data_fn=None, inh_spikes = None, tuning_prop=None):
+    """
+    data_fn, inh_spikes, tuning_prop : file names or the arrays loaded before (see PlotDriver)
+    """
 
     if params== None:
         network_params = simulation_parameters.parameter_storage()  # network_params class containing the simulation parameters
 #        P = network_params.load_params()                       # params stores cell numbers, etc as a dictionary
         params = network_params.params
 
-    if data_fn == None:
+    if data_fn is None:
         data_fn = params['exc_spiketimes_fn_merged'] + '.ras'
 
 #    if inh_spikes == None:
@@ -22,7 +25,11 @@ def plot_prediction(params=None, data_fn=None, inh_spikes = None):
 
 #    params['t_sim'] = 1200
 
-    plotter = P.PlotPrediction(params, data_fn)
+    plotter = P.PlotPrediction(params, data_fn, tuning_prop)
+    if not isinstance(data_fn, basestring):
+        plotter.spike_data['exc'] = data_fn
+    if inh_spikes is not None:
+        plotter.spike_data['inh'] = inh_spikes
     pylab.rcParams['axes.labelsize'] = 14
     pylab.rcParams['axes.titlesize'] = 16
     if plotter.no_spikes:
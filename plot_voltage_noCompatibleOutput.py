@@ -6,23 +6,34 @@ import utils
 import os
 
 
-def plot_volt(fn, gid=None, n=1):
+def load_traces(fn):
+    """
+    fn : text file (.v) or binary voltage store (.vbin, see BinaryStore)
+    Returns {gid : (time_axis, volt)}
+    """
     print 'loading', fn
+    if fn.endswith('.vbin'):
+        return utils.load_volt_traces(fn[:-len('.vbin')])
     d = np.loadtxt(fn)
+    return dict([(gid, utils.extract_trace(d, gid)) for gid in np.unique(d[:, 0])])
+
+
+def plot_volt(fn, gid=None, n=1):
+    traces = load_traces(fn)
 
     if gid == None:
-        recorded_gids = np.unique(d[:, 0])
-        gids = random.sample(recorded_gids, n)
+        recorded_gids = sorted(traces.keys())
+        gids = random.sample(recorded_gids, min(n, len(recorded_gids)))
         print 'plotting random gids:', gids
     elif gid == 'all':
-        gids = np.unique(d[:, 0])
+        gids = sorted(traces.keys())
     elif type(gid) == type([]):
         gids = gid
     else:
         gids = [gid]
     
     for gid in gids:
-        time_axis, volt = utils.extract_trace(d, gid)
+        time_axis, volt = traces[gid]
         pylab.plot(time_axis, volt, label='%d' % gid, lw=2)
 
     parts = fn.rsplit('.')
@@ -37,24 +48,24 @@ def plot_volt(fn, gid=None, n=1):
 
 
 def plot_average_volt(fn, gid=None, n=1):
-    print 'Plotting average voltage; loading', fn
-    d = np.loadtxt(fn)
+    print 'Plotting average voltage'
+    traces = load_traces(fn)
     if gid == None:
-        gid_range = np.unique(d[:, 0])
+        gid_range = np.array(traces.keys())
         gids = np.random.randint(np.min(gid_range), np.max(gid_range) + 1, n)
         print 'plotting random gids:', gids
     elif gid == 'all':
-        gids = np.unique(d[:, 0])
+        gids = sorted(traces.keys())
     elif type(gid) == type([]):
         gids = gid
     else:
         gids = [gid]
     
-    time_axis, volt = utils.extract_trace(d, gids[0])
+    time_axis, volt = traces[gids[0]]
     all_volt = np.zeros((time_axis.size, len(gids)))
 
     for i_, gid in enumerate(gids):
-        time_axis, volt = utils.extract_trace(d, gid)
+        time_axis, volt = traces[gid]
         print 'gid %d v_mean, std = %.2f +- %.2f; min %.2f max %.2f, diff %.2f ' % (gid, volt.mean(), volt.std(), volt.min(), volt.max(), volt.max() - volt.min())
         all_volt[:, i_] = volt
 
@@ -75,6 +86,8 @@ if __name__ == '__main__':
         ps = simulation_parameters.parameter_storage()
         params = ps.params
         fn = params['exc_volt_fn_base'] + '.v'
+        if params['volt_output_format'] == 'binary':
+            fn = params['exc_volt_fn_base'] + '.vbin'
         gids = np.loadtxt(params['gids_to_record_fn'])
         gids = gids[:n_to_plot].tolist()
         pylab.figure()
@@ -91,6 +104,8 @@ if __name__ == '__main__':
             gids = np.loadtxt(params['gids_to_record_fn'])
             gids = gids[:n_to_plot].tolist()
             fn = params['exc_volt_fn_base'] + '.v'
+            if params.get('volt_output_format', 'text') == 'binary':
+                fn = params['exc_volt_fn_base'] + '.vbin'
             pylab.figure()
             plot_volt(fn, gid=gids)
         else: # voltage file
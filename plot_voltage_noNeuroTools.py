@@ -1,57 +1,53 @@
 import pylab
 import numpy as np
 import sys
+import utils
+
+
+def get_n_columns(fn):
+    f = open(fn, 'r')
+    n_columns = 0
+    for l in f:
+        if not l.startswith('#') and l.strip() != '':
+            n_columns = len(l.split())
+            break
+    f.close()
+    return n_columns
+
+
+def load_compatible_output(fn):
+    """
+    Reads a file written by print_v with compatible_output=True: rows (volt, index), dt is given in the header
+    Returns {index : (time_axis, volt)}
+    """
+    dt = None
+    f = open(fn, 'r')
+    for l in f:
+        if not l.startswith('#'):
+            break
+        if l.lstrip('# ').startswith('dt'):
+            dt = float(l.rsplit('=')[-1])
+    f.close()
+    d = np.loadtxt(fn)
+    traces = {}
+    for index in np.unique(d[:, 1]):
+        volt = d[d[:, 1] == index, 0]
+        traces[index] = (np.arange(volt.size) * dt, volt)
+    return traces
 
-import sys
-import numpy as np
 
 fn = sys.argv[1]
-
-f = open(fn, 'r')
-header = []
-l = f.readline()
-size = int(l.rsplit('=')[-1]) # the number of cells recorded in this file
-l = f.readline()
-first_index = int(l.rsplit('=')[-1])
-l = f.readline()
-first_id = int(l.rsplit('=')[-1])
-l = f.readline()
-n = int(l.rsplit('=')[-1])
-l = f.readline()
-variable = l.rsplit('=')[-1]
-l = f.readline()
-last_id = int(l.rsplit('=')[-1])
-l = f.readline()
-last_index = int(l.rsplit('=')[-1])
-l = f.readline()
-dt = float(l.rsplit('=')[-1])
-l = f.readline()
-label = l.rsplit('=')[-1]
-
-d = np.loadtxt(fn)
-vms = [[] for i in xrange(size)]
-
-#print d.shape
-if d.shape[-1] == 3: # nest output
-    # ids     time    volt
-    t_axis = d[::size, 1]
-    vm_index = 2
-
+if fn.endswith('.vbin') or get_n_columns(fn) == 3: # binary store or rows (ids, time, volt)
+    traces = utils.load_volt_traces(fn)
 else:   # compatible_output
-    # ids volt
-    t_stop = n / size
-    t_axis = numpy.arange(0, t_stop) * dt
-    vm_index = 1
-
-for i in xrange(size):
-    vms[i] = d[i::size, vm_index]
-
+    traces = load_compatible_output(fn)
 
 pylab.rcParams.update({'path.simplify' : False})
 pylab.figure()
 
-for i in xrange(size):
-    pylab.plot(t_axis, vms[i])
+for gid in sorted(traces.keys()):
+    t_axis, volt = traces[gid]
+    pylab.plot(t_axis, volt)
 
 #pylab.legend()
 pylab.show()
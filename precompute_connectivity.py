@@ -0,0 +1,99 @@
+"""
+Offline connectivity stage: computes the anisotropic connection lists of all four connection types
+before the simulation, so that the simulation only loads them (connectivity_xx = 'precomputed').
+
+The targets of every connection type are split into params['precomputed_conn_n_blocks'] blocks,
+each block is written to a binary file (conn_list_xx_precomputed_block%d.npy, rows sorted by target)
+and an index file (conn_list_xx_precomputed_index.npy) stores where the rows of every target are.
+NetworkModel.connect_precomputed reads only the rows of its local targets.
+
+Usage:
+    mpirun -np 8 python precompute_connectivity.py [Folder/Parameters/simulation_parameters.json]
+or with a local process pool instead of MPI:
+    python precompute_connectivity.py [Folder/Parameters/simulation_parameters.json] [n_processes]
+"""
+import os
+import sys
+import json
+import time
+import multiprocessing
+import numpy as np
+import utils
+import CreateConnections as CC
+import simulation_parameters
+
+t0 = time.time()
+try:
+    from mpi4py import MPI
+    USE_MPI = True
+    comm = MPI.COMM_WORLD
+    pc_id, n_proc = comm.rank, comm.size
+    print "USE_MPI:", USE_MPI, 'pc_id, n_proc:', pc_id, n_proc
+except:
+    USE_MPI = False
+    pc_id, n_proc, comm = 0, 1, None
+    print "MPI not used"
+
+PS = simulation_parameters.parameter_storage()
+if len(sys.argv) > 1:
+    param_fn = sys.argv[1]
+    if os.path.isdir(param_fn):
+        param_fn += '/Parameters/simulation_parameters.json'
+    print 'Loading parameters from', param_fn
+    f = file(param_fn, 'r')
+    PS.update_values(json.load(f))
+    f.close()
+params = PS.params
+if pc_id == 0:
+    PS.create_folders()
+    PS.write_parameters_to_file()
+if comm != None:
+    comm.Barrier()
+
+# tuning properties, the same as in NetworkModel.setup
+tp_exc = utils.set_tuning_prop(params, mode='hexgrid', cell_type='exc')
+tp_inh = utils.set_tuning_prop(params, mode='hexgrid', cell_type='inh')
+if pc_id == 0:
+    np.savetxt(params['tuning_prop_means_fn'], tp_exc)
+    np.savetxt(params['tuning_prop_inh_fn'], tp_inh)
+
+tuning_prop = {'e' : tp_exc, 'i' : tp_inh}
+n_blocks = params['precomputed_conn_n_blocks']
+tasks = []
+for conn_type in ['ee', 'ei', 'ie', 'ii']:
+    tp_src, tp_tgt = tuning_prop[conn_type[0]], tuning_prop[conn_type[1]]
+    n_tgt = tp_tgt[:, 0].size
+    for block_id in xrange(min(n_blocks, n_tgt)):
+        tasks.append((params, conn_type, tp_src, tp_tgt, block_id, utils.distribute_n(n_tgt, min(n_blocks, n_tgt), block_id)))
+
+if comm != None:
+    # a block costs n_src distance computations per target, i.e. the ee blocks are much more expensive than the ii blocks
+    if utils.get_load_balancing(params) == 'cost':
+        costs = [task[2][:, 0].size * (task[5][1] - task[5][0]) for task in tasks]
+        my_tasks = [tasks[i] for i in utils.distribute_by_cost(costs, n_proc, pc_id)]
+    else:
+        my_tasks = utils.distribute_list(tasks, n_proc, pc_id)
+    print 'Proc %d computes %d of %d blocks' % (pc_id, len(my_tasks), len(tasks))
+    my_results = [CC.compute_anisotropic_connlist_block(task) for task in my_tasks]
+    results = []
+    for results_ in comm.allgather(my_results):
+        results += results_
+else:
+    if len(sys.argv) > 2:
+        n_processes = int(sys.argv[2])
+    else:
+        n_processes = multiprocessing.cpu_count()
+    print 'Computing %d blocks with %d processes' % (len(tasks), n_processes)
+    pool = multiprocessing.Pool(n_processes)
+    results = pool.map(CC.compute_anisotropic_connlist_block, tasks)
+    pool.close()
+    pool.join()
+
+if pc_id == 0:
+    for conn_type in ['ee', 'ei', 'ie', 'ii']:
+        n_tgt = tuning_prop[conn_type[1]][:, 0].size
+        CC.write_precomputed_index(params, conn_type, n_tgt, [r for r in results if r[0] == conn_type])
+    t_diff = time.time() - t0
+    print 'Precomputed connectivity in %d sec or %.1f min' % (t_diff, t_diff / 60.)
+if comm != None:
+    comm.Barrier()
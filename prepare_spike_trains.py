@@ -19,6 +19,8 @@ except: # take the standard ones
 PS.set_filenames()
 PS.create_folders()
 PS.write_parameters_to_file()
+if len(sys.argv) > 6: # write the spike trains to separate files, e.g. one set per stimulus (see measure_tuning_curves.py)
+    params['input_st_fn_base'] = sys.argv[6]
 
 print 'n_cells=%d\tn_exc=%d\tn_inh=%d' % (params['n_cells'], params['n_exc'], params['n_inh'])
 print 'Blur', params['blur_X'], params['blur_V']
@@ -45,7 +47,7 @@ except:
     print 'File with tuning properties missing: %s\nPlease run: \nmpirun -np [N] python prepare_tuning_prop.py\nOR\npython prepare_tuning_prop.py' % params['tuning_prop_means_fn']
     exit(1)
 
-my_units = utils.distribute_n(params['n_exc'], n_proc, pc_id)
+my_units = utils.distribute_cells(params, params['n_exc'], n_proc, pc_id, tuning_prop=tuning_prop, c_cell=params['t_sim'] / params['dt_rate'])
 utils.create_spike_trains_for_motion(tuning_prop, params, contrast=.9, my_units=my_units, seed=seed) # write to paths defined in the params dictionary
 if comm != None:
     comm.barrier()
@@ -4,18 +4,14 @@ echo 'Starting at' `date`
 #mpirun -np 8 python prepare_connections.py
 mpirun -np 8 python NetworkSimModuleNoColumns.py
 #python NetworkSimModuleNoColumns.py
-python plot_prediction.py
 python merge_connlists.py
+# prediction, rasterplots, connectivity profile, weight and delay histograms, connectivity analysis in one interpreter
+python PlotDriver.py
 python analyse_simple.py
 python analyse_input.py
 #python plot_connlist_as_colormap.py
-python plot_weight_and_delay_histogram.py ee 
-python plot_weight_and_delay_histogram.py ei
-python plot_weight_and_delay_histogram.py ie
-python plot_weight_and_delay_histogram.py ii
 python get_conductance_matrix.py 0
 python plot_spike_histogram.py
-python plot_connectivity_profile.py
 #python CheckDelayScale.py
 #python plot_connlist_as_colormap.py 'ee'
 #python plot_connlist_as_colormap.py 'ei'
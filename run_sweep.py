@@ -1,27 +1,25 @@
-import os
-import numpy as np
-sn = "NetworkSimModuleNoColumns.py"
+import simulation_parameters
+import SweepRunner
 
 #for w_sigma_v in [.5, .75]:
 #    for w_sigma_x in [.5, .75]:
 #for delay_scale in [1., 2., 3., 5., 10.]:
 #    for connectivity_radius in [.1, .2, .3, .4]:
 #        for w_ee in [.2, .25]:
-#            os.system('mpirun -np 2 python  %s %f %f %f %f %f'  % (sn, w_sigma_x, w_sigma_v, w_ee, connectivity_radius, delay_scale))
 
-for w_ee in [.3, .35, .4]:
-    for delay_scale in [1000., 500., 250., 100., 50., 25., 10., 5., 2.]:
-        os.system('mpirun -np 2 python  %s %f %f'  % (sn, w_ee, delay_scale))
+# runs are scheduled concurrently: n_slots / procs_per_run simulations at a time
+# finished runs (spike files exist) are skipped, failed runs are restarted max_retries times
+ps = simulation_parameters.parameter_storage()
+SR = SweepRunner.SweepRunner(ps, script='NetworkSimModule.py', n_slots=8, procs_per_run=2, max_retries=1)
 
-#    for connectivity_radius in [.2, .3]:
-#        for w_ee in [.25, .3]:
-#            os.system('mpirun -np 2 python  %s %f %f %f %f %f'  % (sn, w_sigma_x, w_sigma_v, w_ee, connectivity_radius, delay_scale))
+SR.add_parameter_grid({'w_tgt_in_per_cell_ee' : [.3, .35, .4], \
+        'delay_scale' : [1000., 500., 250., 100., 50., 25., 10., 5., 2.]})
 
-for connectivity_radius in [1.]:#, .75, .5, .25]:
-    for delay_scale in [1000.]:#, 500., 250.]:#, 100., 50., 25., 10., 5., 2.]:
-        for w_ee in [.2, .25, .3, .35, .4]:
-            os.system('mpirun -np 2 python  %s %f %f %f'  % (sn, w_ee, connectivity_radius, delay_scale))
+SR.add_parameter_grid({'connectivity_radius' : [1.], \
+        'delay_scale' : [1000.], \
+        'w_tgt_in_per_cell_ee' : [.2, .25, .3, .35, .4]})
 
 #for a in np.arange(.5, 6., .5):
 #    for b in np.arange(.1, 1.1, .1):
-#        os.system('mpirun -np 2 python  %s %f %f'  % (sn, a, b))
+#        SR.add_parameter_grid({'a' : ..., 'b' : ...})
+SR.run()
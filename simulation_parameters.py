@@ -1,9 +1,135 @@
 import json
+import hashlib
 import numpy as np
 import numpy.random as rnd
 import os
 import utils
 
+connectivity_codes = {'anisotropic' : 'A', 'isotropic' : 'I', 'random' : 'R', 'precomputed' : 'P', False : '-'}
+
+def get_connectivity_code(params):
+    """
+    One letter per connection type ee, ei, ie, ii, e.g. 'AIII'
+    """
+    return ''.join([connectivity_codes.get(params['connectivity_%s' % conn_type], '') for conn_type in ['ee', 'ei', 'ie', 'ii']])
+
+
+def get_cell_params(params):
+    """
+    Cell parameters for params['neuron_model'] with the synaptic time constants tau_syn_exc and tau_syn_inh
+    (the same values are used for exc and inh cells)
+    """
+    cell_params = {'cm':1.0, 'tau_refrac':1.0, 'v_thresh':-50.0, 'tau_syn_E': params['tau_syn_exc'], 'tau_syn_I':params['tau_syn_inh'], 'tau_m' : 10., 'v_reset' : -70., 'v_rest':-70}
+    if params['neuron_model'] == 'EIF_cond_exp_isfa_ista':
+        cell_params.update({'v_rest' : -70., 'b' : 0.5, 'a' : 4.})
+    return cell_params
+
+
+def get_default_folder_name(params):
+    if params['neuron_model'] == 'EIF_cond_exp_isfa_ista':
+        folder_name = 'AdEx_a%.2e_b%.2e_' % (params['cell_params_exc']['a'], params['cell_params_exc']['b'])
+    else:
+        folder_name = 'Results_'
+    return folder_name + get_connectivity_code(params) + '/'
+
+
+def get_filenames(params):
+    """
+    Returns the dictionary of all folder and file names, they depend only on params['folder_name']
+    and (input_folder) on the stimulus parameters.
+    params : dictionary or ParameterContainer
+    """
+    fns = {'folder_name' : params['folder_name']}
+    # in order to NOT re-compute the input spike trains when the stimulus parameters have not changed, do NOT store them in a subfolder of fns['folder_name']
+    fns['input_folder'] = "InputSpikeTrains_bX%.2e_bV%.2e_fstim%.1e_tsim%d_tblank%d_tbeforeblank%d_%dnrns/" % \
+            (params['blur_X'], params['blur_V'], params['f_max_stim'], params['t_sim'], params['t_blank'], params['t_before_blank'], params['n_cells'])
+    # if you want to store the input files in a subfolder of fns['folder_name'], do this:
+#    fns['input_folder'] = "%sInputSpikeTrains/"   % fns['folder_name']# folder containing the input spike trains for the network generated from a certain stimulus
+    fns['spiketimes_folder'] = "%sSpikes/" % fns['folder_name']
+    fns['volt_folder'] = "%sVoltageTraces/" % fns['folder_name']
+    fns['parameters_folder'] = "%sParameters/" % fns['folder_name']
+    fns['connections_folder'] = "%sConnections/" % fns['folder_name']
+    fns['figures_folder'] = "%sFigures/" % fns['folder_name']
+    fns['movie_folder'] = "%sMovies/" % fns['folder_name']
+    fns['tmp_folder'] = "%stmp/" % fns['folder_name']
+    fns['data_folder'] = '%sData/' % (fns['folder_name']) # for storage of analysis results etc
+    # all folders to be created if not yet existing:
+    fns['folder_names'] = [fns['folder_name'], \
+                        fns['spiketimes_folder'], \
+                        fns['volt_folder'], \
+                        fns['parameters_folder'], \
+                        fns['connections_folder'], \
+                        fns['figures_folder'], \
+                        fns['movie_folder'], \
+                        fns['tmp_folder'], \
+                        fns['data_folder'], \
+                        fns['input_folder']] 
+
+    fns['params_fn_json'] = '%ssimulation_parameters.json' % (fns['parameters_folder'])
+
+    # input spiketrains
+    fns['merged_input_spiketrains_fn'] = "%sinput_spiketrain_merged.dat" % (fns['input_folder'])
+    fns['input_st_fn_base'] = "%sstim_spike_train_" % fns['input_folder']# input spike trains filename base
+    fns['input_rate_fn_base'] = "%srate_" % fns['input_folder']# input spike trains filename base
+
+    # output spiketrains
+    fns['exc_spiketimes_fn_base'] = '%sexc_spikes_' % fns['spiketimes_folder']
+    fns['exc_spiketimes_fn_merged'] = '%sexc_spikes_merged_' % fns['spiketimes_folder']
+    fns['exc_nspikes_fn_merged'] = '%sexc_nspikes' % fns['spiketimes_folder']
+    fns['exc_nspikes_nonzero_fn'] = '%sexc_nspikes_nonzero.dat' % fns['spiketimes_folder']
+    fns['inh_spiketimes_fn_base'] = '%sinh_spikes_' % fns['spiketimes_folder']
+    fns['inh_spiketimes_fn_merged'] = '%sinh_spikes_merged_' % fns['spiketimes_folder']
+    fns['inh_nspikes_fn_merged'] = '%sinh_nspikes' % fns['spiketimes_folder']
+    fns['inh_nspikes_nonzero_fn'] = '%sinh_nspikes_nonzero.dat' % fns['spiketimes_folder']
+    fns['exc_volt_fn_base'] = '%sexc_volt' % fns['volt_folder']
+    fns['inh_volt_fn_base'] = '%sinh_volt' % fns['volt_folder']
+    fns['rasterplot_exc_fig'] = '%srasterplot_exc.png' % (fns['figures_folder'])
+    fns['rasterplot_inh_fig'] = '%srasterplot_inh.png' % (fns['figures_folder'])
+
+    # tuning properties and other cell parameter files
+    fns['tuning_prop_means_fn'] = '%stuning_prop_means.prm' % (fns['parameters_folder']) # for excitatory cells
+    fns['tuning_prop_inh_fn'] = '%stuning_prop_inh.prm' % (fns['parameters_folder']) # for inhibitory cells
+    fns['tuning_prop_fig_exc_fn'] = '%stuning_properties_exc.png' % (fns['figures_folder'])
+    fns['tuning_prop_fig_inh_fn'] = '%stuning_properties_inh.png' % (fns['figures_folder'])
+    fns['gids_to_record_fn'] = '%sgids_to_record.dat' % (fns['parameters_folder'])
+    fns['instrumentation_fn_base'] = '%sinstrumentation_' % (fns['folder_name']) # + 'np%d.json' % n_proc, see Instrumentation.py
+
+    fns['prediction_fig_fn_base'] = '%sprediction_' % (fns['figures_folder'])
+    fns['spatial_readout_fn_base'] = '%sspatial_readout_' % (fns['figures_folder']) # + 'sim%d_frames.npy', see plot_spatial_readout.py
+    fns['spatial_readout_movie'] = '%sspatial_readout.mp4' % (fns['movie_folder'])
+    fns['spatial_readout_detailed_movie'] = '%sspatial_readout_detailed.mp4' % (fns['movie_folder'])
+
+    # CONNECTION FILES
+    fns['weight_and_delay_fig'] = '%sweights_and_delays.png' % (fns['figures_folder'])
+
+    # connection lists have the following format: src_gid  tgt_gid  weight  delay
+    # E - E
+    fns['conn_list_ee_fn_base'] = '%sconn_list_ee_' % (fns['connections_folder'])
+    fns['bias_values_fn_base'] = '%sbias_values_' % (fns['connections_folder'])
+    fns['conn_list_ee_conv_constr_fn_base'] = '%sconn_list_ee_conv_constr_' % (fns['connections_folder'])
+    fns['merged_conn_list_ee'] = '%smerged_conn_list_ee.dat' % (fns['connections_folder'])
+    # E - I
+    fns['conn_list_ei_fn_base'] = '%sconn_list_ei_' % (fns['connections_folder'])
+    fns['merged_conn_list_ei'] = '%smerged_conn_list_ei.dat' % (fns['connections_folder'])
+    # I - E
+    fns['conn_list_ie_fn_base'] = '%sconn_list_ie_' % (fns['connections_folder'])
+    fns['merged_conn_list_ie'] = '%smerged_conn_list_ie.dat' % (fns['connections_folder'])
+    # I - I
+    fns['conn_list_ii_fn_base'] = '%sconn_list_ii_' % (fns['connections_folder'])
+    fns['merged_conn_list_ii'] = '%smerged_conn_list_ii.dat' % (fns['connections_folder'])
+
+    # used for different projections ['ee', 'ei', 'ie', 'ii'] for plotting
+    fns['conn_mat_fn_base'] = '%sconn_mat_' % (fns['connections_folder'])
+    fns['delay_mat_fn_base'] = '%sdelay_mat_' % (fns['connections_folder'])
+
+    # ANALYSIS RESULTS
+    # these files receive the output folder when they are create / processed --> more suitable for parameter sweeps
+    fns['xdiff_vs_time_fn'] = 'xdiff_vs_time.dat'
+    fns['vdiff_vs_time_fn'] = 'vdiff_vs_time.dat'
+    del fns['folder_name']
+    return fns
+
+
 class parameter_storage(object):
     """
     This class contains the simulation parameters in a dictionary called params.
@@ -16,7 +142,7 @@ class parameter_storage(object):
         self.set_filenames()
 
     def set_default_params(self):
-        self.params['simulator'] = 'nest' # 'brian' #
+        self.params['simulator'] = 'nest' # 'brian' # 'numpy' (single process, see NumpySimulator.py)
 
         # ###################
         # HEXGRID PARAMETERS
@@ -76,17 +202,8 @@ class parameter_storage(object):
 #        self.params['neuron_model'] = 'EIF_cond_exp_isfa_ista'
         self.params['tau_syn_exc'] = 5.0 # 10.
         self.params['tau_syn_inh'] = 10.0 # 20.
-        if self.params['neuron_model'] == 'IF_cond_exp':
-            self.params['cell_params_exc'] = {'cm':1.0, 'tau_refrac':1.0, 'v_thresh':-50.0, 'tau_syn_E': self.params['tau_syn_exc'], 'tau_syn_I':self.params['tau_syn_inh'], 'tau_m' : 10., 'v_reset' : -70., 'v_rest':-70}
-            self.params['cell_params_inh'] = {'cm':1.0, 'tau_refrac':1.0, 'v_thresh':-50.0, 'tau_syn_E': self.params['tau_syn_exc'], 'tau_syn_I':self.params['tau_syn_inh'], 'tau_m' : 10., 'v_reset' : -70., 'v_rest':-70}
-        elif self.params['neuron_model'] == 'IF_cond_alpha':
-            self.params['cell_params_exc'] = {'cm':1.0, 'tau_refrac':1.0, 'v_thresh':-50.0, 'tau_syn_E': self.params['tau_syn_exc'], 'tau_syn_I':self.params['tau_syn_inh'], 'tau_m' : 10., 'v_reset' : -70., 'v_rest':-70}
-            self.params['cell_params_inh'] = {'cm':1.0, 'tau_refrac':1.0, 'v_thresh':-50.0, 'tau_syn_E': self.params['tau_syn_exc'], 'tau_syn_I':self.params['tau_syn_inh'], 'tau_m' : 10., 'v_reset' : -70., 'v_rest':-70}
-        elif self.params['neuron_model'] == 'EIF_cond_exp_isfa_ista':
-            self.params['cell_params_exc'] = {'cm':1.0, 'tau_refrac':1.0, 'v_thresh':-50.0, 'tau_syn_E':self.params['tau_syn_exc'], 'tau_syn_I':self.params['tau_syn_inh'], 'tau_m' : 10., 'v_reset' : -70., 'v_rest':-70., \
-                    'b' : 0.5, 'a':4.}
-            self.params['cell_params_inh'] = {'cm':1.0, 'tau_refrac':1.0, 'v_thresh':-50.0, 'tau_syn_E':self.params['tau_syn_exc'], 'tau_syn_I':self.params['tau_syn_inh'], 'tau_m' : 10., 'v_reset' : -70., 'v_rest':-70., \
-                    'b' : 0.5, 'a':4.}
+        self.params['cell_params_exc'] = get_cell_params(self.params)
+        self.params['cell_params_inh'] = get_cell_params(self.params)
         # default parameters: /usr/local/lib/python2.6/dist-packages/pyNN/standardmodels/cells.py
         self.params['v_init'] = -65.                 # [mV]
         self.params['v_init_sigma'] = 10.             # [mV]
@@ -103,6 +220,7 @@ class parameter_storage(object):
         self.params['connectivity_ee'] = 'anisotropic'
 #        self.params['connectivity_ee'] = 'isotropic'
 #        self.params['connectivity_ee'] = 'random'
+#        self.params['connectivity_ee'] = 'precomputed' # anisotropic, computed before by precompute_connectivity.py
 #        self.params['connectivity_ee'] = False
 #        self.params['connectivity_ei'] = 'anisotropic'
         self.params['connectivity_ei'] = 'isotropic'
@@ -116,6 +234,7 @@ class parameter_storage(object):
         self.params['connectivity_ii'] = 'isotropic'
 #        self.params['connectivity_ii'] = 'random'
 #        self.params['connectivity_ii'] = False
+        self.params['precomputed_conn_n_blocks'] = 64 # number of target blocks (= binary files per connection type) written by precompute_connectivity.py
 
         # when the initial connections are derived on the cell's tuning properties, these two values are used
         self.params['connectivity_radius'] = 0.5      # this determines how much the directional tuning of the src is considered when drawing connections, the connectivity_radius affects the choice w_sigma_x/v 
@@ -162,6 +281,16 @@ class parameter_storage(object):
         self.params['standard_delay'] = 3           # [ms]
         self.params['standard_delay_sigma'] = 1           # [ms]
 
+        # online learning: the simulation runs in segments of t_segment and after every segment
+        # the E - E weights are updated from the BCPNN traces (Bcpnn.OnlineBcpnn, NetworkModel.run_segmented)
+        self.params['online_bcpnn'] = False
+        self.params['t_segment'] = 100.         # [ms]
+        self.params['dw_scale'] = 1e-4          # [uS] weight change per unit of w_ij = log(p_ij / (p_i * p_j))
+        self.params['bcpnn_f_max'] = 1000.      # [Hz] post-synaptic spike height is 1000 / f_max
+        self.params['bcpnn_tau_dict'] = {'tau_zi' : 10.,    'tau_zj' : 10.,
+                                         'tau_ei' : 100.,   'tau_ej' : 100., 'tau_eij' : 100.,
+                                         'tau_pi' : 1000.,  'tau_pj' : 1000., 'tau_pij' : 1000.}
+
         # ######################
         # SIMULATION PARAMETERS
         # ######################
@@ -176,13 +305,22 @@ class parameter_storage(object):
         self.params['input_spikes_seed'] = 0
         self.params['dt_sim'] = self.params['delay_range'][0] * 1 # [ms] time step for simulation
         self.params['dt_rate'] = .1             # [ms] time step for the non-homogenous Poisson process
-        self.params['n_gids_to_record'] = 30
+        self.params['n_gids_to_record'] = 30 # membrane potentials of this many exc and inh cells are recorded (exc: from gids_to_record_fn if it exists)
+        self.params['spike_output_format'] = 'ras' # 'ras': merged text files, 'binary': one binary file per process merged into a .bin file, see BinaryStore.py
+        self.params['volt_output_format'] = 'text' # 'text': .v files (print_v), 'binary': one file with an index per gid (.vbin), see BinaryStore.py
+        self.params['volt_every_n_steps'] = 1   # write the membrane potential only every n-th time step
+        self.params['volt_t_window'] = None     # [ms] (t_start, t_stop): write only the membrane potential within this window, None: all
+        self.params['load_balancing'] = 'cost' # 'cost': distribute cells among processes by estimated costs (utils.distribute_cells), 'equal': equal-size blocks
+        self.params['use_artefact_cache'] = True # reuse tuning properties, input spike trains and connection lists of previous runs, see ArtefactCache.py
+        self.params['artefact_cache_folder'] = 'ArtefactCache/' # shared by all runs, like the input_folder
+        self.params['artefact_cache_max_size'] = 5e9 # [bytes] least recently used artefacts are removed above this size
 
         # ######
         # INPUT
         # ######
         self.params['f_max_stim'] = 5000.       # [Hz]
         self.params['w_input_exc'] = 5.0e-3     # [uS] mean value for input stimulus ---< exc_units (columns
+        self.params['input_connection_mode'] = 'population' # 'population': one SpikeSourceArray population and one OneToOne projection, 'per_cell': one source and connect call per cell
 
         # ###############
         # MOTION STIMULUS
@@ -209,6 +347,7 @@ class parameter_storage(object):
         self.params['f_exc_noise'] = 2000# [Hz] 
         self.params['w_inh_noise'] = 4e-3 * 10. / self.params['tau_syn_inh']         # [uS] mean value for noise ---< columns
         self.params['f_inh_noise'] = 2000# [Hz]
+        self.params['noise_connection_mode'] = 'population' # 'population': one noise source (nest) or one source population per rate, 'per_cell': two sources and connect calls per cell, 'streams': spike trains drawn per cell from RandomStreams (independent of the number of processes)
 
         # no noise:
 #        self.params['w_exc_noise'] = 1e-5          # [uS] mean value for noise ---< columns
@@ -218,156 +357,17 @@ class parameter_storage(object):
 
 
     def set_folder_name(self, folder_name=None):
-        # folder naming code:
-        #   PREFIX + XXXX + parameters
-        #  X = ['A', # for anisotropic connections
-        #       'I', # for isotropic connections
-        #       'R', # for random connections
-        #       '-', # for non-existant connections
-        # order of X: 'ee', 'ei', 'ie', 'ii'
-
-        connectivity_code = ''
-        if self.params['connectivity_ee'] == 'anisotropic':
-            connectivity_code += 'A'
-        elif self.params['connectivity_ee'] == 'isotropic':
-            connectivity_code += 'I'
-        elif self.params['connectivity_ee'] == 'random':
-            connectivity_code += 'R'
-        elif self.params['connectivity_ee'] == False:
-            connectivity_code += '-'
-
-        if self.params['connectivity_ei'] == 'anisotropic':
-            connectivity_code += 'A'
-        elif self.params['connectivity_ei'] == 'isotropic':
-            connectivity_code += 'I'
-        elif self.params['connectivity_ei'] == 'random':
-            connectivity_code += 'R'
-        elif self.params['connectivity_ei'] == False:
-            connectivity_code += '-'
-
-        if self.params['connectivity_ie'] == 'anisotropic':
-            connectivity_code += 'A'
-        elif self.params['connectivity_ie'] == 'isotropic':
-            connectivity_code += 'I'
-        elif self.params['connectivity_ie'] == 'random':
-            connectivity_code += 'R'
-        elif self.params['connectivity_ie'] == False:
-            connectivity_code += '-'
-
-        if self.params['connectivity_ii'] == 'anisotropic':
-            connectivity_code += 'A'
-        elif self.params['connectivity_ii'] == 'isotropic':
-            connectivity_code += 'I'
-        elif self.params['connectivity_ii'] == 'random':
-            connectivity_code += 'R'
-        elif self.params['connectivity_ii'] == False:
-            connectivity_code += '-'
-        self.params['connectivity_code'] = connectivity_code
-
+        self.params['connectivity_code'] = get_connectivity_code(self.params)
         if folder_name == None:
-            if self.params['neuron_model'] == 'EIF_cond_exp_isfa_ista':
-                folder_name = 'AdEx_a%.2e_b%.2e_' % (self.params['cell_params_exc']['a'], self.params['cell_params_exc']['b'])
-            else:
-               folder_name = 'Results_'
-
-            folder_name += connectivity_code
-            folder_name += '/'
-            # if parameters should be stored in the folder name:
-#            folder_name += "_pee%.1e_wen%.1e_tausynE%d_I%d_bx%.1e_bv%.1e_wsigmax%.2e_wsigmav%.2e_wee%.2e_wei%.2e_wie%.2e_wii%.2e_delay%d_connRadius%.2f/" % \
-#                        (self.params['p_ee'], self.params['w_exc_noise'], self.params['tau_syn_exc'], self.params['tau_syn_inh'], self.params['blur_X'], self.params['blur_V'], self.params['w_sigma_x'], self.params['w_sigma_v'], self.params['w_tgt_in_per_cell_ee'], \
-#                        self.params['w_tgt_in_per_cell_ei'], self.params['w_tgt_in_per_cell_ie'], self.params['w_tgt_in_per_cell_ii'], self.params['delay_scale'], self.params['connectivity_radius'])
-
-            self.params['folder_name'] = folder_name
-        else:
-            self.params['folder_name'] = folder_name
+            folder_name = get_default_folder_name(self.params)
+        self.params['folder_name'] = folder_name
         print 'Folder name:', self.params['folder_name']
 
 
     def set_filenames(self, folder_name=None):
 
         self.set_folder_name(folder_name)
-        print 'Folder name:', self.params['folder_name']
-
-        # in order to NOT re-compute the input spike trains when the stimulus parameters have not changed, do NOT store them in a subfolder of self.params['folder_name']
-        self.params['input_folder'] = "InputSpikeTrains_bX%.2e_bV%.2e_fstim%.1e_tsim%d_tblank%d_tbeforeblank%d_%dnrns/" % \
-                (self.params['blur_X'], self.params['blur_V'], self.params['f_max_stim'], self.params['t_sim'], self.params['t_blank'], self.params['t_before_blank'], self.params['n_cells'])
-        # if you want to store the input files in a subfolder of self.params['folder_name'], do this:
-#        self.params['input_folder'] = "%sInputSpikeTrains/"   % self.params['folder_name']# folder containing the input spike trains for the network generated from a certain stimulus
-        self.params['spiketimes_folder'] = "%sSpikes/" % self.params['folder_name']
-        self.params['volt_folder'] = "%sVoltageTraces/" % self.params['folder_name']
-        self.params['parameters_folder'] = "%sParameters/" % self.params['folder_name']
-        self.params['connections_folder'] = "%sConnections/" % self.params['folder_name']
-        self.params['figures_folder'] = "%sFigures/" % self.params['folder_name']
-        self.params['movie_folder'] = "%sMovies/" % self.params['folder_name']
-        self.params['tmp_folder'] = "%stmp/" % self.params['folder_name']
-        self.params['data_folder'] = '%sData/' % (self.params['folder_name']) # for storage of analysis results etc
-        # all folders to be created if not yet existing:
-        self.params['folder_names'] = [self.params['folder_name'], \
-                            self.params['spiketimes_folder'], \
-                            self.params['volt_folder'], \
-                            self.params['parameters_folder'], \
-                            self.params['connections_folder'], \
-                            self.params['figures_folder'], \
-                            self.params['movie_folder'], \
-                            self.params['tmp_folder'], \
-                            self.params['data_folder'], \
-                            self.params['input_folder']] 
-
-        self.params['params_fn_json'] = '%ssimulation_parameters.json' % (self.params['parameters_folder'])
-
-        # input spiketrains
-        self.params['merged_input_spiketrains_fn'] = "%sinput_spiketrain_merged.dat" % (self.params['input_folder'])
-        self.params['input_st_fn_base'] = "%sstim_spike_train_" % self.params['input_folder']# input spike trains filename base
-        self.params['input_rate_fn_base'] = "%srate_" % self.params['input_folder']# input spike trains filename base
-
-        # output spiketrains
-        self.params['exc_spiketimes_fn_base'] = '%sexc_spikes_' % self.params['spiketimes_folder']
-        self.params['exc_spiketimes_fn_merged'] = '%sexc_spikes_merged_' % self.params['spiketimes_folder']
-        self.params['exc_nspikes_fn_merged'] = '%sexc_nspikes' % self.params['spiketimes_folder']
-        self.params['exc_nspikes_nonzero_fn'] = '%sexc_nspikes_nonzero.dat' % self.params['spiketimes_folder']
-        self.params['inh_spiketimes_fn_base'] = '%sinh_spikes_' % self.params['spiketimes_folder']
-        self.params['inh_spiketimes_fn_merged'] = '%sinh_spikes_merged_' % self.params['spiketimes_folder']
-        self.params['inh_nspikes_fn_merged'] = '%sinh_nspikes' % self.params['spiketimes_folder']
-        self.params['inh_nspikes_nonzero_fn'] = '%sinh_nspikes_nonzero.dat' % self.params['spiketimes_folder']
-        self.params['exc_volt_fn_base'] = '%sexc_volt' % self.params['volt_folder']
-        self.params['inh_volt_fn_base'] = '%sinh_volt' % self.params['volt_folder']
-        self.params['rasterplot_exc_fig'] = '%srasterplot_exc.png' % (self.params['figures_folder'])
-        self.params['rasterplot_inh_fig'] = '%srasterplot_inh.png' % (self.params['figures_folder'])
-
-        # tuning properties and other cell parameter files
-        self.params['tuning_prop_means_fn'] = '%stuning_prop_means.prm' % (self.params['parameters_folder']) # for excitatory cells
-        self.params['tuning_prop_inh_fn'] = '%stuning_prop_inh.prm' % (self.params['parameters_folder']) # for inhibitory cells
-        self.params['tuning_prop_fig_exc_fn'] = '%stuning_properties_exc.png' % (self.params['figures_folder'])
-        self.params['tuning_prop_fig_inh_fn'] = '%stuning_properties_inh.png' % (self.params['figures_folder'])
-        self.params['gids_to_record_fn'] = '%sgids_to_record.dat' % (self.params['parameters_folder'])
-
-        self.params['prediction_fig_fn_base'] = '%sprediction_' % (self.params['figures_folder'])
-
-        # CONNECTION FILES
-        self.params['weight_and_delay_fig'] = '%sweights_and_delays.png' % (self.params['figures_folder'])
-
-        # connection lists have the following format: src_gid  tgt_gid  weight  delay
-        # E - E
-        self.params['conn_list_ee_fn_base'] = '%sconn_list_ee_' % (self.params['connections_folder'])
-        self.params['merged_conn_list_ee'] = '%smerged_conn_list_ee.dat' % (self.params['connections_folder'])
-        # E - I
-        self.params['conn_list_ei_fn_base'] = '%sconn_list_ei_' % (self.params['connections_folder'])
-        self.params['merged_conn_list_ei'] = '%smerged_conn_list_ei.dat' % (self.params['connections_folder'])
-        # I - E
-        self.params['conn_list_ie_fn_base'] = '%sconn_list_ie_' % (self.params['connections_folder'])
-        self.params['merged_conn_list_ie'] = '%smerged_conn_list_ie.dat' % (self.params['connections_folder'])
-        # I - I
-        self.params['conn_list_ii_fn_base'] = '%sconn_list_ii_' % (self.params['connections_folder'])
-        self.params['merged_conn_list_ii'] = '%smerged_conn_list_ii.dat' % (self.params['connections_folder'])
-
-        # used for different projections ['ee', 'ei', 'ie', 'ii'] for plotting
-        self.params['conn_mat_fn_base'] = '%sconn_mat_' % (self.params['connections_folder'])
-        self.params['delay_mat_fn_base'] = '%sdelay_mat_' % (self.params['connections_folder'])
-
-        # ANALYSIS RESULTS
-        # these files receive the output folder when they are create / processed --> more suitable for parameter sweeps
-        self.params['xdiff_vs_time_fn'] = 'xdiff_vs_time.dat'
-        self.params['vdiff_vs_time_fn'] = 'vdiff_vs_time.dat'
+        self.params.update(get_filenames(self.params))
 
     def check_folders(self):
         """
@@ -403,7 +403,8 @@ class parameter_storage(object):
         for key, value in kwargs.iteritems():
             self.params[key] = value
         # update the dependent parameters
-        self.set_filenames()
+        # if a folder_name is given, keep it, otherwise it is derived from the parameters
+        self.set_filenames(kwargs.get('folder_name', None))
 #        self.ParamSet = ntp.ParameterSet(self.params)
 
     def write_parameters_to_file(self, fn=None):
@@ -414,50 +415,241 @@ class parameter_storage(object):
         if fn == None:
             fn = self.params['params_fn_json']
         print 'Writing parameters to: %s' % (fn)
-        output_file = file(self.params['params_fn_json'], 'w')
+        output_file = file(fn, 'w')
         d = json.dump(self.params, output_file)
 
 
-class ParameterContainer(parameter_storage):
+# values derived from the user inputs, computed on first access by ParameterContainer (same formulas as in set_default_params)
+derived_params = {
+    'N_RF_X' : lambda p: int(np.sqrt(p['N_RF'] * np.sqrt(3))),
+    'N_RF_Y' : lambda p: int(np.sqrt(p['N_RF'])),
+    'n_exc' : lambda p: p['N_RF_X'] * p['N_RF_Y'] * p['N_V'] * p['N_theta'],
+    'N_theta_inh' : lambda p: p['N_theta'],
+    'N_RF_INH' : lambda p: int(round(p['fraction_inh_cells'] * p['N_RF'] * float(p['N_V'] * p['N_theta']) / (p['N_V_INH'] * p['N_theta_inh']))),
+    'N_RF_X_INH' : lambda p: int(np.sqrt(p['N_RF_INH'] * np.sqrt(3))),
+    'N_RF_Y_INH' : lambda p: int(np.sqrt(p['N_RF_INH'])),
+    'n_inh' : lambda p: p['N_RF_X_INH'] * p['N_RF_Y_INH'] * p['N_theta_inh'] * p['N_V_INH'],
+    'n_cells' : lambda p: p['n_exc'] + p['n_inh'],
+    'n_src_cells_per_neuron' : lambda p: round(p['p_ee'] * p['n_exc']),
+    'cell_params_exc' : get_cell_params,
+    'cell_params_inh' : get_cell_params,
+    'connectivity_code' : get_connectivity_code,
+    'folder_name' : get_default_folder_name,
+}
+# in the order they depend on each other (used when loading)
+derived_order = ['N_RF_X', 'N_RF_Y', 'n_exc', 'N_theta_inh', 'N_RF_INH', 'N_RF_X_INH', 'N_RF_Y_INH', 'n_inh', 'n_cells', 'n_src_cells_per_neuron', \
+        'cell_params_exc', 'cell_params_inh', 'connectivity_code', 'folder_name']
+# all keys written by get_filenames
+filename_keys = set(get_filenames(dict([(key, 0) for key in ['folder_name', 'blur_X', 'blur_V', 'f_max_stim', 't_sim', 't_blank', 't_before_blank', 'n_cells']])).keys())
+
+
+def to_json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+default_inputs = {} # the inputs of parameter_storage, computed once per process
+
+def get_default_inputs():
+    if len(default_inputs) == 0:
+        default_inputs.update(parameter_storage().params)
+    return default_inputs
+
+
+class ParameterContainer(object):
+    """
+    Parameters of one run, separated into user inputs and derived values.
+    The inputs are the defaults (by default those of parameter_storage, computed once per process)
+    overwritten by the values given to the constructor or update_values.
+    The derived values (cell numbers, connectivity code, folder_name if not given, and all file names)
+    are computed on first access and computed again after the inputs have changed,
+    e.g. setting folder_name moves all file names, setting N_RF changes n_exc.
+    A derived value that is given explicitly counts as input.
+
+    Identity: get_hash(keys) is the md5 of the given (or all) input values, it does not depend on
+    the order or on whether the values went through JSON (tuples vs lists, numpy vs python scalars).
+
+    Usage:
+        pc = ParameterContainer({'w_tgt_in_per_cell_ee' : .4, 'N_RF' : 100})
+        pc['n_exc'], pc['conn_list_ee_fn_base']
+        pc.get_hash(ArtefactCache.input_keys)
+        pc.write_parameters_to_file()           # compact JSON, readable as plain dictionary by all scripts
+        pc = simulation_parameters.load_container(pc['params_fn_json'])   # no set_default_params
+    """
+
+    def __init__(self, inputs={}, defaults=None):
+        """
+        inputs : dictionary with the values differing from the defaults
+        defaults : dictionary (e.g. parameter_storage.params), derived values in it are ignored, default: get_default_inputs()
+        """
+        if defaults == None:
+            defaults = get_default_inputs()
+        self.defaults = dict([(key, value) for (key, value) in defaults.iteritems() \
+                if not (derived_params.has_key(key) or key in filename_keys)])
+        self.inputs = dict(inputs)
+        self.derived = {}
+        self.hash = None
+
+
+    def __getitem__(self, key):
+        if self.inputs.has_key(key):
+            return self.inputs[key]
+        if self.derived.has_key(key):
+            return self.derived[key]
+        if derived_params.has_key(key):
+            self.derived[key] = derived_params[key](self)
+            return self.derived[key]
+        if key in filename_keys:
+            self.derived.update(get_filenames(self))
+            return self.derived[key]
+        return self.defaults[key]
+
+
+    def __setitem__(self, key, value):
+        self.update_values({key : value})
+
 
-    def __init__(self, fn):
-        super(ParameterContainer, self).__init__()
-        self.root_dir = os.path.dirname(fn)
-        # If the folder has been moved, all filenames need to be updated
-        self.update_values({self.params['folder_name'] : self.root_dir})
+    def __contains__(self, key):
+        return self.inputs.has_key(key) or self.defaults.has_key(key) or derived_params.has_key(key) or key in filename_keys
 
-    def load_params(self, fn):
+    has_key = __contains__
+
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+
+    def input_keys(self):
+        keys = set(self.defaults.keys())
+        keys.update(self.inputs.keys())
+        return sorted(keys)
+
+
+    def keys(self):
+        keys = set(self.input_keys())
+        keys.update(derived_params.keys())
+        keys.update(filename_keys)
+        return sorted(keys)
 
-        f = file(fn, 'r')
-        print 'Loading parameters from', fn
-        self.params = json.load(f)
 
     def update_values(self, kwargs):
-        for key, value in kwargs.iteritems():
-            self.params[key] = value
+        self.inputs.update(kwargs)
+        self.derived = {}
+        self.hash = None
 
-        # update the dependent parameters
-        # --> to be implemented by another function (e.g. set_filenames())
 
-    def create_folders(self):
+    def copy(self, new_values={}):
         """
-        Must be called from 'outside' this class before the simulation
+        Returns a new container with the same defaults and inputs updated by new_values
         """
-        for f in self.params['folder_names']:
+        inputs = dict(self.inputs)
+        inputs.update(new_values)
+        container = ParameterContainer(defaults={})
+        container.defaults = self.defaults # not modified by the container, can be shared
+        container.inputs = inputs
+        return container
+
+
+    def get_inputs(self):
+        inputs = dict(self.defaults)
+        inputs.update(self.inputs)
+        return inputs
+
+
+    def load_params(self):
+        """
+        Returns all parameters (inputs and derived values) as dictionary like parameter_storage.params
+        """
+        return dict([(key, self[key]) for key in self.keys()])
+
+    as_dict = load_params
+
+
+    def get_hash(self, keys=None):
+        """
+        Returns the md5 hash of the values of keys (inputs or derived), default: all inputs
+        """
+        if keys == None:
+            if self.hash == None:
+                inputs = self.get_inputs()
+                self.hash = get_hash(inputs, inputs.keys())
+            return self.hash
+        return get_hash(self, keys)
+
+
+    def __hash__(self):
+        return int(self.get_hash()[:15], 16)
+
+
+    def __eq__(self, other):
+        return isinstance(other, ParameterContainer) and self.get_hash() == other.get_hash()
+
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+    def create_folders(self):
+        for f in self['folder_names']:
             if not os.path.exists(f):
                 print 'Creating folder:\t%s' % f
                 os.system("mkdir %s" % (f))
 
-    def load_params(self):
+
+    def write_parameters_to_file(self, fn=None, with_derived=True):
         """
-        return the simulation parameters in a dictionary
+        Writes the parameters as compact JSON.
+        with_derived : if False only the inputs are written (less than half the size), scripts reading the file
+            as plain dictionary then need load_container(fn).load_params()
         """
-        return self.ParamSet
+        if fn == None:
+            fn = self['params_fn_json']
+        if with_derived:
+            output = self.load_params()
+        else:
+            output = self.get_inputs()
+        f = file(fn, 'w')
+        json.dump(output, f, default=to_json, separators=(',', ':'))
+        f.close()
 
 
-    def write_parameters_to_file(self, fn=None):
-        if fn == None:
-            fn = self.params['params_fn_json']
-        print 'Writing parameters to: %s' % (fn)
-        self.ParamSet.save(fn)
+def get_hash(params, keys):
+    """
+    md5 hash of the values of keys in params (dictionary or ParameterContainer), stable across JSON round trips
+    """
+    values = [[key, get_canonical(params.get(key, None))] for key in sorted(keys)]
+    return hashlib.md5(json.dumps(values, default=to_json, separators=(',', ':'))).hexdigest()
+
+
+def get_canonical(value):
+    """
+    Dictionaries (e.g. cell_params_exc) become sorted lists of items, sort_keys would make json use its slow python encoder
+    """
+    if isinstance(value, dict):
+        return [[key, get_canonical(value[key])] for key in sorted(value.keys())]
+    return value
+
 
+def load_container(fn):
+    """
+    Loads a parameter file written by parameter_storage or ParameterContainer without computing the defaults.
+    Values that can be derived are treated as derived if they agree with the derivation, otherwise as input.
+    """
+    f = file(fn, 'r')
+    params = json.load(f)
+    f.close()
+    inputs = dict([(key, value) for (key, value) in params.iteritems() if not (derived_params.has_key(key) or key in filename_keys)])
+    container = ParameterContainer(inputs, defaults={})
+    for key in derived_order + sorted(filename_keys):
+        try:
+            derived = container[key]
+        except KeyError: # an input of the derivation is missing (older file)
+            derived = None
+        if params.has_key(key) and derived != params[key]:
+            container.update_values({key : params[key]})
+    return container
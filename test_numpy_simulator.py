@@ -0,0 +1,44 @@
+"""
+Checks of the numpy simulator (NumpySimulator.py) against analytic values:
+    1) regular firing of a single cell driven by a constant current: ISI = tau_refrac + tau_m * ln((v_inf - v_reset) / (v_inf - v_thresh))
+    2) a spike arriving with delay d changes the membrane potential first in the time step starting at t_spike + d
+
+    python test_numpy_simulator.py
+"""
+import numpy as np
+import NumpySimulator as sim
+
+dt = 0.1
+
+# 1) regular firing
+cell_params = {'cm' : 1.0, 'tau_m' : 10.0, 'tau_refrac' : 1.0, 'v_rest' : -70.0, 'v_reset' : -70.0, 'v_thresh' : -55.0, 'i_offset' : 2.0}
+sim.setup(timestep=dt, min_delay=dt, max_delay=10.)
+pop = sim.Population(1, sim.IF_cond_exp, cell_params)
+pop.initialize('v', cell_params['v_reset'])
+pop.record()
+sim.run(500.)
+spikes = pop.getSpikes()[:, 1]
+isi = np.diff(spikes).mean()
+g_leak = cell_params['cm'] / cell_params['tau_m']
+v_inf = cell_params['v_rest'] + cell_params['i_offset'] / g_leak
+isi_analytic = cell_params['tau_refrac'] + cell_params['tau_m'] * np.log((v_inf - cell_params['v_reset']) / (v_inf - cell_params['v_thresh']))
+print 'Regular firing: %d spikes, ISI %.2f ms, analytic %.2f ms' % (spikes.size, isi, isi_analytic)
+assert spikes.size > 10
+assert abs(isi - isi_analytic) < 2 * dt, 'ISI %.3f differs from the analytic value %.3f' % (isi, isi_analytic)
+
+# 2) synaptic delay
+t_spike, delay = 10., 3.
+sim.setup(timestep=dt, min_delay=dt, max_delay=10.)
+source = sim.Population(1, sim.SpikeSourceArray, {'spike_times' : [t_spike]})
+pop = sim.Population(1, sim.IF_cond_exp, {'v_rest' : -70.0, 'v_reset' : -70.0})
+pop.initialize('v', -70.0)
+pop.record_v()
+sim.Projection(source, pop, sim.OneToOneConnector(weights=0.01, delays=delay), target='excitatory')
+sim.run(30.)
+d = pop.get_v(compatible_output=False) # rows (index, t, v), t is the end of the time step
+t, v = d[:, 1], d[:, 2]
+t_first_change = t[np.nonzero(np.abs(v - (-70.0)) > 1e-9)[0][0]] - dt # beginning of the first step in which v changes
+print 'Spike at %.1f ms with delay %.1f ms: v changes first in the step starting at %.1f ms' % (t_spike, delay, t_first_change)
+assert abs(t_first_change - (t_spike + delay)) < dt / 2., 'v changes at %.2f instead of %.2f' % (t_first_change, t_spike + delay)
+
+print 'NumpySimulator checks passed'
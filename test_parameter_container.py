@@ -0,0 +1,27 @@
+"""
+Checks of the derived values of simulation_parameters.ParameterContainer:
+overriding an input recomputes the values derived from it (as set_default_params would)
+
+    python test_parameter_container.py
+"""
+import simulation_parameters
+
+ps = simulation_parameters.parameter_storage()
+pc = simulation_parameters.ParameterContainer(defaults=ps.params)
+for key in ['N_theta_inh', 'n_exc', 'n_inh', 'cell_params_exc', 'cell_params_inh']:
+    assert pc[key] == ps.params[key], '%s: %s differs from set_default_params: %s' % (key, str(pc[key]), str(ps.params[key]))
+
+N_theta = ps.params['N_theta'] * 2
+pc_theta = pc.copy({'N_theta' : N_theta})
+print 'N_theta %d -> %d: n_exc %d -> %d, n_inh %d -> %d' % (ps.params['N_theta'], N_theta, pc['n_exc'], pc_theta['n_exc'], pc['n_inh'], pc_theta['n_inh'])
+assert pc_theta['N_theta_inh'] == N_theta
+assert pc_theta['n_inh'] != pc['n_inh']
+assert pc_theta['n_inh'] == pc_theta['N_RF_X_INH'] * pc_theta['N_RF_Y_INH'] * N_theta * pc_theta['N_V_INH']
+
+pc_tau = pc.copy({'tau_syn_exc' : 2., 'tau_syn_inh' : 4.})
+assert pc_tau['cell_params_exc']['tau_syn_E'] == 2. and pc_tau['cell_params_exc']['tau_syn_I'] == 4.
+assert pc_tau['cell_params_inh']['tau_syn_E'] == 2. and pc_tau['cell_params_inh']['tau_syn_I'] == 4.
+
+pc_explicit = pc.copy({'N_theta' : N_theta, 'N_theta_inh' : 1}) # a derived value that is given explicitly counts as input
+assert pc_explicit['N_theta_inh'] == 1
+print 'test_parameter_container: OK'
@@ -0,0 +1,42 @@
+"""
+Checks of the parameter space queries of the ResultsCollector: select() on a few fake simulation folders,
+and group_by() restricted to the simulations returned by select()
+
+    python test_results_collector.py
+"""
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+import ResultsCollector
+
+tmp_folder = tempfile.mkdtemp(prefix='test_results_collector_')
+try:
+    folders = []
+    for i_, (w_ee, code) in enumerate([(0.1, 'AIII'), (0.2, 'AIII'), (0.2, 'IIII'), (0.3, 'AIII'), (0.2, 'AIII')]):
+        folder = tmp_folder + '/sim_%d' % i_
+        os.makedirs(folder + '/Parameters')
+        f = file(folder + '/Parameters/simulation_parameters.json', 'w')
+        json.dump({'w_tgt_in_per_cell_ee' : w_ee, 'connectivity_code' : code}, f)
+        f.close()
+        folders.append(folder)
+
+    RC = ResultsCollector.ResultsCollector({}, index_fn=None, n_workers=1)
+    RC.set_dirs_to_process(folders)
+
+    idx = RC.select(connectivity_code='AIII')
+    print 'select:', idx
+    assert list(idx) == [0, 1, 3, 4]
+    assert list(RC.select(connectivity_code='AIII', w_tgt_in_per_cell_ee=lambda w: w > .15)) == [1, 3, 4]
+
+    groups = RC.group_by('w_tgt_in_per_cell_ee', idx=idx)
+    print 'group_by after select:', groups
+    assert sorted(groups.keys()) == [0.1, 0.2, 0.3]
+    assert list(groups[0.1]) == [0] and list(groups[0.2]) == [1, 4] and list(groups[0.3]) == [3]
+
+    groups = RC.group_by('connectivity_code')
+    assert list(groups['AIII']) == [0, 1, 3, 4] and list(groups['IIII']) == [2]
+finally:
+    shutil.rmtree(tmp_folder)
+print 'test_results_collector: OK'
@@ -7,6 +7,9 @@ import numpy.random as rnd
 import os
 from scipy.spatial import distance
 import copy
+import heapq
+import BinaryStore
+import RandomStreams
 
 
 def convert_connlist_to_matrix(fn, n_src, n_tgt):
@@ -66,6 +69,58 @@ def extract_trace(d, gid):
     time_axis, volt = d[indices, 1], d[indices, 2]
     return time_axis, volt
 
+
+def decimate_volt(d, every_n_steps=1, t_window=None):
+    """
+    d : voltages saved with compatible_output=False, columns (gid, t, v)
+    Keeps only every n-th time step and the time steps within t_window = (t_start, t_stop)
+    """
+    if d.size == 0:
+        return d
+    if t_window != None:
+        d = d[(d[:, 1] >= t_window[0]) & (d[:, 1] <= t_window[1]), :]
+    if every_n_steps > 1:
+        times = np.unique(d[:, 1])
+        d = d[np.in1d(d[:, 1], times[::every_n_steps]), :]
+    return d
+
+
+def load_volt_traces(volt_fn_base, gids=None):
+    """
+    Loads the membrane potentials written by NetworkModel.print_results,
+    either the binary store (volt_fn_base + '.vbin', see BinaryStore) or the text file volt_fn_base + '.v'.
+    volt_fn_base : may also be the file name itself (ending with .vbin or .v)
+    gids : the cells to load (default: all recorded cells)
+    Returns a dictionary {gid : (time_axis, volt)}
+    """
+    for ext in ['.vbin', '.v']:
+        if volt_fn_base.endswith(ext):
+            volt_fn_base = volt_fn_base[:-len(ext)]
+    traces = {}
+    if os.path.exists(volt_fn_base + '.vbin'):
+        index = np.load(volt_fn_base + '_index.npy').reshape((-1, 3))
+        if gids is None:
+            gids = index[:, 0]
+        for gid in gids:
+            traces[gid] = BinaryStore.load_volt_trace(volt_fn_base, gid, index)
+        return traces
+
+    d = np.loadtxt(volt_fn_base + '.v')
+    # group the rows by gid once instead of masking the whole array for every gid
+    order = np.lexsort((d[:, 1], d[:, 0]))
+    d = d[order, :]
+    recorded_gids, offsets = np.unique(d[:, 0], return_index=True)
+    offsets = np.concatenate((offsets, [d[:, 0].size]))
+    if gids is None:
+        gids = recorded_gids
+    for gid in gids:
+        i = np.searchsorted(recorded_gids, gid)
+        if i == recorded_gids.size or recorded_gids[i] != gid:
+            traces[gid] = (np.zeros(0), np.zeros(0))
+        else:
+            traces[gid] = (d[offsets[i]:offsets[i+1], 1], d[offsets[i]:offsets[i+1], 2])
+    return traces
+
 def convert_spiketrain_to_trace(st, n):
     """
     st: spike train in the format [time, id]
@@ -108,23 +163,26 @@ def create_spike_trains_for_motion(tuning_prop, params, contrast=.9, my_units=No
             tp[:, 3] : v-position (speed in y-direction)
 
         params:  dictionary storing all simulation parameters
-        my_units: tuple of integers (start, begin), in case of parallel execution each processor creates spike trains for its own units or columns
+        my_units: tuple of integers (start, begin) or list of gids (e.g. from distribute_by_cost),
+                  in case of parallel execution each processor creates spike trains for its own units or columns
 
     """
 
     if seed == None:
         seed = params['input_spikes_seed']
-    rnd.seed(seed)
     dt = params['dt_rate'] # [ms] time step for the non-homogenous Poisson process 
 
 #    time = np.arange(0, params['t_stimulus'], dt)
     time = np.arange(0, params['t_sim'], dt)
-    blank_idx = np.arange(1./dt * params['t_stimulus'], 1. / dt * (params['t_stimulus'] + params['t_blank']))
+    blank_idx = np.arange(1./dt * params['t_stimulus'], 1. / dt * (params['t_stimulus'] + params['t_blank'])).astype(int)
+    blank_idx = blank_idx[blank_idx < time.size]
 
     if (my_units == None):
-        my_units = xrange(tp.shape[0])
+        my_units = range(tuning_prop.shape[0])
+    elif type(my_units) == type(()):
+        my_units = range(my_units[0], my_units[1])
     else:
-        my_units = xrange(my_units[0], my_units[1])
+        my_units = list(my_units)
 
     n_cells = len(my_units)
     L_input = np.zeros((n_cells, time.shape[0]))
@@ -143,12 +201,8 @@ def create_spike_trains_for_motion(tuning_prop, params, contrast=.9, my_units=No
         output_fn = params['input_rate_fn_base'] + str(unit) + '.npy'
         np.save(output_fn, rate_of_t)
         # each cell will get its own spike train stored in the following file + cell gid
-        n_steps = rate_of_t.size
-        st = []
-        for i in xrange(n_steps):
-            r = rnd.rand()
-            if (r <= ((rate_of_t[i]/1000.) * dt)): # rate is given in Hz -> 1/1000.
-                st.append(i * dt) 
+        # drawn from its own random stream, i.e. independent of how the units are distributed among the processes
+        st = RandomStreams.poisson_spike_times(RandomStreams.get_rng(seed, unit, 'input'), rate_of_t, dt)
 #        output_fn = tgt_fn_base + str(column)
         output_fn = params['input_st_fn_base'] + str(unit) + '.npy'
         np.save(output_fn, np.array(st))
@@ -254,6 +308,76 @@ def distribute_n(n, n_proc, pid):
     return (n_min, n_max)
 
 
+def partition_by_cost(costs, n_proc):
+    """
+    costs: estimated cost (e.g. run time) of every element
+    Greedy longest-processing-time partitioning: the most expensive elements are assigned first,
+    each to the process with the currently smallest load.
+    The result is deterministic, so all processes can compute it independently.
+    Returns a list with the (sorted) indices of the elements for each process
+    """
+    costs = np.asarray(costs, dtype=np.float64)
+    order = np.argsort(-costs, kind='mergesort')
+    loads = [(0., pid) for pid in xrange(n_proc)]
+    parts = [[] for pid in xrange(n_proc)]
+    for i in order:
+        load, pid = heapq.heappop(loads)
+        parts[pid].append(i)
+        heapq.heappush(loads, (load + costs[i], pid))
+    return [np.array(sorted(part), dtype=np.int64) for part in parts]
+
+
+def distribute_by_cost(costs, n_proc, pid):
+    """
+    Like distribute_n, but balances the sum of the costs instead of the number of elements (see partition_by_cost).
+    Returns the indices of the elements to be assigned to the processor with id pid
+    """
+    return partition_by_cost(costs, n_proc)[pid]
+
+
+def get_load_balancing(params):
+    """
+    Returns params['load_balancing'], 'cost' for parameter files written before the parameter existed
+    """
+    return params.get('load_balancing', 'cost')
+
+
+def distribute_cells(params, n_cells, n_proc, pid, **cost_args):
+    """
+    Returns the list of gids processed by process pid:
+    get_load_balancing(params) == 'cost' : balanced by the costs from estimate_cell_costs(params, n_cells, **cost_args)
+    else : contiguous blocks of equal size (distribute_n)
+    """
+    if get_load_balancing(params) == 'cost' and n_proc > 1:
+        costs = estimate_cell_costs(params, n_cells, **cost_args)
+        return distribute_by_cost(costs, n_proc, pid).tolist()
+    (gid_min, gid_max) = distribute_n(n_cells, n_proc, pid)
+    return range(gid_min, gid_max)
+
+
+def estimate_cell_costs(params, n_cells, tuning_prop=None, conn_list=None, nspikes=None, c_cell=1., c_input=1., c_syn=1., c_spike=1., n_time_samples=50):
+    """
+    Estimates the work per cell:
+        c_cell + c_input * expected number of input spikes (from get_input, sampled at n_time_samples points in time)
+          + c_syn * number of incoming synapses (from conn_list with columns (src, tgt, ...))
+          + c_spike * number of spikes in a previous run (nspikes, e.g. from get_nspikes)
+    Only the given sources of information are used.
+    """
+    costs = c_cell * np.ones(n_cells)
+    if tuning_prop is not None:
+        dt = params['t_sim'] / float(n_time_samples)
+        rate = np.zeros(n_cells)
+        for t in np.arange(0, params['t_sim'], dt):
+            rate += get_input(tuning_prop[:n_cells, :], params, t / params['t_stimulus'])
+        # rate is normalized to f_max_stim
+        costs += c_input * rate * params['f_max_stim'] * dt / 1000.
+    if conn_list is not None and len(conn_list) > 0:
+        costs += c_syn * np.bincount(np.array(conn_list)[:, 1].astype(int), minlength=n_cells)[:n_cells]
+    if nspikes is not None:
+        costs += c_spike * np.array(nspikes[:n_cells])
+    return costs
+
+
 def euclidean(x, y):
     return distance.euclidean(x, y)
 
@@ -332,52 +456,27 @@ def set_limited_tuning_properties(params, y_range=(0, 1.), x_range=(0, 1.), u_ra
     v_theta = np.linspace(0, 2*np.pi, n_theta, endpoint=False)
     parity = np.arange(params['N_V']) % 2
 
-    RF = np.zeros((2, n_rf_x * n_rf_y))
-    X, Y = np.mgrid[0:1:1j*(n_rf_x+1), 0:1:1j*(n_rf_y+1)]
-
-    # It's a torus, so we remove the first row and column to avoid redundancy (would in principle not harm)
-    X, Y = X[1:, 1:], Y[1:, 1:]
-    # Add to every even Y a half RF width to generate hex grid
-    Y[::2, :] += (Y[0, 0] - Y[0, 1])/2 # 1./N_RF
-    RF[0, :] = X.ravel()
-    RF[1, :] = Y.ravel()
+    RF = get_hexgrid(n_rf_x, n_rf_y, (0, 1), (0, 1))
 
-    # wrapping up:
-    index = 0
+    # same random numbers in the same order as set_tuning_prop (see there), but one rotation per RF
     random_rotation = 2*np.pi*rnd.rand(n_rf_x * n_rf_y) * params['sigma_RF_direction']
-    neuron_in_range = np.zeros((n_cells, 1), dtype=bool)
-    for i_RF in xrange(n_rf_x * n_rf_y):
-        for i_v_rho, rho in enumerate(v_rho):
-            for i_theta, theta in enumerate(v_theta):
-                x_pos = (RF[0, i_RF] + params['sigma_RF_pos'] * rnd.randn()) % params['torus_width']
-                y_pos = (RF[1, i_RF] + params['sigma_RF_pos'] * rnd.randn()) % params['torus_height']
-                v_x = np.cos(theta + random_rotation[i_RF] + parity[i_v_rho] * np.pi / n_theta) \
-                        * rho * (1. + params['sigma_RF_speed'] * rnd.randn())
-                v_y = np.sin(theta + random_rotation[i_RF] + parity[i_v_rho] * np.pi / n_theta) \
-                        * rho * (1. + params['sigma_RF_speed'] * rnd.randn())
-
-                tuning_prop[index, 0] = x_pos 
-                tuning_prop[index, 1] = y_pos
-                tuning_prop[index, 2] = v_x
-                tuning_prop[index, 3] = v_y
-                if ((x_pos > x_range[0]) and (x_pos <= x_range[1]) \
-                        and (y_pos > y_range[0]) and (y_pos <= y_range[1]) \
-                        and (v_x > u_range[0]) and (v_x <= u_range[1]) \
-                        and (v_y > v_range[0]) and (v_y <= v_range[1])):
-                    neuron_in_range[index] = True
-                index += 1
-
-    n_cells_in_range = neuron_in_range.nonzero()[0].size
-    tp_good = np.zeros((n_cells_in_range, 4))
-    tp_good = tuning_prop[neuron_in_range.nonzero()[0], :]
-
-    idx_out_of_range = np.ones((n_cells, 1), dtype=int)
-    idx_out_of_range -= neuron_in_range
-    n_cells_out_of_range = idx_out_of_range.nonzero()[0].size
-    assert (n_cells_out_of_range + n_cells_in_range == n_cells), 'Number of cells in/out of range do not sum to one'
-    tp_out_of_range = np.zeros((n_cells_out_of_range, 4))
-    tp_out_of_range = tuning_prop[idx_out_of_range, :]
-    
+    n_grid = n_rf_x * n_rf_y * n_v * n_theta
+    noise = rnd.randn(n_grid, 4)
+    i_RF, i_v_rho, i_theta = get_tuning_grid_indices(n_rf_x * n_rf_y, n_v, n_theta)
+    angle = v_theta[i_theta] + random_rotation[i_RF] + parity[i_v_rho] * np.pi / n_theta
+    tuning_prop[:n_grid, 0] = (RF[0, i_RF] + params['sigma_RF_pos'] * noise[:, 0]) % params['torus_width']
+    tuning_prop[:n_grid, 1] = (RF[1, i_RF] + params['sigma_RF_pos'] * noise[:, 1]) % params['torus_height']
+    tuning_prop[:n_grid, 2] = np.cos(angle) * v_rho[i_v_rho] * (1. + params['sigma_RF_speed'] * noise[:, 2])
+    tuning_prop[:n_grid, 3] = np.sin(angle) * v_rho[i_v_rho] * (1. + params['sigma_RF_speed'] * noise[:, 3])
+
+    x_pos, y_pos, v_x, v_y = tuning_prop[:, 0], tuning_prop[:, 1], tuning_prop[:, 2], tuning_prop[:, 3]
+    neuron_in_range = (x_pos > x_range[0]) & (x_pos <= x_range[1]) \
+            & (y_pos > y_range[0]) & (y_pos <= y_range[1]) \
+            & (v_x > u_range[0]) & (v_x <= u_range[1]) \
+            & (v_y > v_range[0]) & (v_y <= v_range[1])
+    neuron_in_range[n_grid:] = False
+    tp_good = tuning_prop[neuron_in_range, :]
+    tp_out_of_range = tuning_prop[~neuron_in_range, :]
     return tp_good, tp_out_of_range
 
 
@@ -434,11 +533,10 @@ def set_tuning_prop(params, mode='hexgrid', cell_type='exc'):
         if (params['n_cells'] > x_max * y_max):
             x_max += 1
 
-        for i in xrange(params['n_cells']):
-            tuning_prop[i, 0] = (i % x_max) / float(x_max)   # spatial rf centers are on a grid
-            tuning_prop[i, 1] = (i / x_max) / float(y_max)
-            tuning_prop[i, 2] = v_max * rnd.randn() + v_min
-            tuning_prop[i, 3] = v_max * rnd.randn() + v_min
+        i = np.arange(n_cells)
+        tuning_prop[:, 0] = (i % x_max) / float(x_max)   # spatial rf centers are on a grid
+        tuning_prop[:, 1] = (i / x_max) / float(y_max)
+        tuning_prop[:, 2:] = v_max * rnd.randn(n_cells, 2) + v_min # per cell u, v
 
     elif mode=='hexgrid':
         if params['log_scale']==1:
@@ -453,52 +551,51 @@ def set_tuning_prop(params, mode='hexgrid', cell_type='exc'):
 
         xlim = (0, params['torus_width'])
         ylim = (0, np.sqrt(3) * params['torus_height'])
-
-        RF = np.zeros((2, n_rf_x * n_rf_y))
-        X, Y = np.mgrid[0:1:1j*(n_rf_x+1), 0:1:1j*(n_rf_y+1)]
-        X, Y = np.mgrid[xlim[0]:xlim[1]:1j*(n_rf_x+1), ylim[0]:ylim[1]:1j*(n_rf_y+1)]
-    
-        # It's a torus, so we remove the first row and column to avoid redundancy (would in principle not harm)
-        X, Y = X[1:, 1:], Y[1:, 1:]
-        # Add to every even Y a half RF width to generate hex grid
-        Y[::2, :] += (Y[0, 0] - Y[0, 1])/2 # 1./N_RF
-        RF[0, :] = X.ravel()
-        RF[1, :] = Y.ravel() 
+        RF = get_hexgrid(n_rf_x, n_rf_y, xlim, ylim)
         RF[1, :] /= np.sqrt(3) # scale to get a regular hexagonal grid
-    
-        # wrapping up:
-        index = 0
-        random_rotation = 2*np.pi*rnd.rand(n_rf_x * n_rf_y * n_v * n_theta) * params['sigma_RF_direction']
+
+        # Cells are ordered by RF, then speed, then direction: index = (i_RF * n_v + i_v_rho) * n_theta + i_theta
+        # The random numbers are drawn in a fixed order (the order of the former loop over the cells):
+        # first one rotation per cell, then per cell the noise for x, y, u, v (row i of the (n, 4) array)
+        n_grid = n_rf_x * n_rf_y * n_v * n_theta
+        random_rotation = 2*np.pi*rnd.rand(n_grid) * params['sigma_RF_direction']
             # todo do the same for v_rho?
-        for i_RF in xrange(n_rf_x * n_rf_y):
-            for i_v_rho, rho in enumerate(v_rho):
-                for i_theta, theta in enumerate(v_theta):
-                    # for plotting this looks nicer, and due to the torus property it doesn't make a difference
-                    tuning_prop[index, 0] = (RF[0, i_RF] + params['sigma_RF_pos'] * rnd.randn())# % params['torus_width']
-                    tuning_prop[index, 1] = (RF[1, i_RF] + params['sigma_RF_pos'] * rnd.randn())# % params['torus_height']
-                    tuning_prop[index, 2] = np.cos(theta + random_rotation[index] + parity[i_v_rho] * np.pi / n_theta) \
-                            * rho * (1. + params['sigma_RF_speed'] * rnd.randn())
-                    tuning_prop[index, 3] = np.sin(theta + random_rotation[index] + parity[i_v_rho] * np.pi / n_theta) \
-                            * rho * (1. + params['sigma_RF_speed'] * rnd.randn())
-                    index += 1
+        noise = rnd.randn(n_grid, 4)
+        i_RF, i_v_rho, i_theta = get_tuning_grid_indices(n_rf_x * n_rf_y, n_v, n_theta)
+        angle = v_theta[i_theta] + random_rotation + parity[i_v_rho] * np.pi / n_theta
+        # for plotting this looks nicer (no % torus_width), and due to the torus property it doesn't make a difference
+        tuning_prop[:n_grid, 0] = RF[0, i_RF] + params['sigma_RF_pos'] * noise[:, 0]
+        tuning_prop[:n_grid, 1] = RF[1, i_RF] + params['sigma_RF_pos'] * noise[:, 1]
+        tuning_prop[:n_grid, 2] = np.cos(angle) * v_rho[i_v_rho] * (1. + params['sigma_RF_speed'] * noise[:, 2])
+        tuning_prop[:n_grid, 3] = np.sin(angle) * v_rho[i_v_rho] * (1. + params['sigma_RF_speed'] * noise[:, 3])
 
     return tuning_prop
 
-def set_hexgrid_positions(params, NX, NY):
-
-    RF = np.zeros((2, NX*NY))
-    X, Y = np.mgrid[0:1:1j*(NX+1), 0:1:1j*(NY+1)]
 
+def get_hexgrid(n_x, n_y, xlim=(0, 1), ylim=(0, 1)):
+    """
+    Returns the receptive field centers RF (2, n_x * n_y) of a hexagonal grid:
+    every second row is shifted by half a grid spacing, the first row and column are removed because of the torus.
+    """
+    X, Y = np.mgrid[xlim[0]:xlim[1]:1j*(n_x+1), ylim[0]:ylim[1]:1j*(n_y+1)]
     # It's a torus, so we remove the first row and column to avoid redundancy (would in principle not harm)
     X, Y = X[1:, 1:], Y[1:, 1:]
     # Add to every even Y a half RF width to generate hex grid
     Y[::2, :] += (Y[0, 0] - Y[0, 1])/2 # 1./N_RF
-    RF[0, :] = X.ravel()
-    RF[1, :] = Y.ravel()
-    for i in xrange(RF[0, :].size):
-        RF[0, i] *= (1. + params['sigma_RF_pos'] * rnd.randn())
-        RF[1, i] *= (1. + params['sigma_RF_pos'] * rnd.randn())
+    return np.array((X.ravel(), Y.ravel()))
 
+
+def get_tuning_grid_indices(n_rf, n_v, n_theta):
+    """
+    Returns the indices (i_RF, i_v_rho, i_theta) of all cells, each of size n_rf * n_v * n_theta, in the order of the cells
+    """
+    i_RF, i_v_rho, i_theta = np.meshgrid(np.arange(n_rf), np.arange(n_v), np.arange(n_theta), indexing='ij')
+    return i_RF.ravel(), i_v_rho.ravel(), i_theta.ravel()
+
+def set_hexgrid_positions(params, NX, NY):
+
+    RF = get_hexgrid(NX, NY)
+    RF *= (1. + params['sigma_RF_pos'] * rnd.randn(NX * NY, 2)).transpose() # x, y per position
     return RF.transpose()
 
 
@@ -507,12 +604,9 @@ def get_predicted_stim_pos(tp):
     For each cell this function calculates the target position based on the tuning_prop of the cell:
     x_predicted = (x_0 + v_0) % 1
     """
-    n_pos = tp[:, 0].size
-    pos = np.zeros((n_pos, 2))
-    for i in xrange(n_pos):
-        x_predicted = (tp[i, 0] + tp[i, 2]) % 1
-        y_predicted = (tp[i, 1] + tp[i, 3]) % 1
-        pos[i, 0], pos[i, 1] = x_predicted, y_predicted
+    pos = np.zeros((tp[:, 0].size, 2))
+    pos[:, 0] = (tp[:, 0] + tp[:, 2]) % 1
+    pos[:, 1] = (tp[:, 1] + tp[:, 3]) % 1
     return pos
 
     
@@ -591,6 +685,41 @@ def spatial_readout(particles, N_X, N_Y, hue, hue_zoom, fig_width, width, ywidth
         return v_hist, x_edges, y_edges
 
 
+def get_spatial_readout_frames(spikes, tp, t_range, n_frames, n_bins_x=20, n_bins_y=20, predicted=False, cell_weights=None, \
+        x_edges=None, y_edges=None):
+    """
+    Bins all spikes at once into a movie tensor frames[frame, x_bin, y_bin]: every spike counts at the position of
+    the cell that fired it, in the time bin (frame) of the spike.
+    spikes : d[:, 0] = spike times, d[:, 1] = gids (as returned by load_spike_file)
+    tp : tuning properties of the cells
+    t_range : (t_start, t_stop) or t_stop, divided into n_frames time bins
+    predicted : position predicted by the tuning properties (x + v_x, y + v_y) % 1 instead of (x, y)
+    cell_weights : weight of the spikes of each cell (default 1 per spike)
+    x_edges, y_edges : default: n_bins equally wide bins covering the positions of all cells
+    Returns frames, time_edges, x_edges, y_edges
+    """
+    if np.isscalar(t_range):
+        t_range = (0., t_range)
+    if predicted:
+        pos = get_predicted_stim_pos(tp)
+    else:
+        pos = tp[:, :2]
+    if x_edges is None:
+        x_edges = np.linspace(pos[:, 0].min(), pos[:, 0].max(), n_bins_x + 1)
+    if y_edges is None:
+        y_edges = np.linspace(pos[:, 1].min(), pos[:, 1].max(), n_bins_y + 1)
+    time_edges = np.linspace(t_range[0], t_range[1], n_frames + 1)
+
+    spikes = np.asarray(spikes).reshape((-1, 2))
+    gids = spikes[:, 1].astype(int)
+    sample = np.column_stack((spikes[:, 0], pos[gids, 0], pos[gids, 1]))
+    weights = None
+    if cell_weights is not None:
+        weights = np.asarray(cell_weights)[gids]
+    frames, edges = np.histogramdd(sample, bins=(time_edges, x_edges, y_edges), weights=weights)
+    return frames, time_edges, x_edges, y_edges
+
+
 def threshold_weights(connection_matrix, w_thresh):
     """
     Elements in connection_matrix below w_thresh will be set to zero.
@@ -606,9 +735,13 @@ def get_nspikes(spiketimes_fn_merged, n_cells=0, get_spiketrains=False):
     """
     Returns an array with the number of spikes fired by each cell.
     nspikes[gid]
+    spiketimes_fn_merged : file name or the array loaded before (d[:, 0] = spike times, d[:, 1] = gids)
     if n_cells is not given, the length of the array will be the highest gid (not advised!)
     """
-    d = np.loadtxt(spiketimes_fn_merged)
+    if isinstance(spiketimes_fn_merged, basestring):
+        d = load_spike_file(spiketimes_fn_merged)
+    else:
+        d = spiketimes_fn_merged
     if (n_cells == 0):
         n_cells = 1 + int(np.max(d[:, 1]))# highest gid
     nspikes = np.zeros(n_cells)
@@ -657,13 +790,23 @@ def get_cond_in(nspikes, conn_list, target_gid):
     return cond_in
 
 
+def load_spike_file(fn):
+    """
+    Loads a .ras text file or a binary spike file (.bin, see BinaryStore)
+    Returns d with d[:, 0] = spike times, d[:, 1] = gids
+    """
+    if fn.endswith('.bin'):
+        return BinaryStore.to_ras(BinaryStore.load_spikes(fn))
+    return np.loadtxt(fn)
+
+
 def get_spiketrains(spiketimes_fn_or_array, n_cells=0):
     """
     Returns an list of spikes fired by each cell
     if n_cells is not given, the length of the array will be the highest gid (not recommended!)
     """
     if type(spiketimes_fn_or_array) == type(''):
-        d = np.loadtxt(spiketimes_fn_or_array)
+        d = load_spike_file(spiketimes_fn_or_array)
     elif type(spiketimes_fn_or_array) == type(np.array([])):
         d = spiketimes_fn_or_array
     if (n_cells == 0):
@@ -756,41 +899,54 @@ def sort_gids_by_distance_to_stimulus(tp, mp, params, local_gids=None):
         tp[:, 3] : y-velocity
 
         mp: motion_parameters (x0, y0, u0, v0)
+        local_gids: if given only these cells (rows of tp) are sorted
 
     """
-    if local_gids == None: 
-        n_cells = tp[:, 0].size
+    if local_gids is None: 
+        x_dist, spatial_dist = get_min_distances_to_stim(mp, tp, params)
     else:
-        n_cells = len(local_gids)
-    x_dist = np.zeros(n_cells) # stores minimal distance in space between stimulus and cells
-    for i in xrange(n_cells):
-        x_dist[i], spatial_dist = get_min_distance_to_stim(mp, tp[i, :], params)
+        local_gids = np.array(local_gids)
+        x_dist, spatial_dist = get_min_distances_to_stim(mp, tp[local_gids, :], params)
 
     cells_closest_to_stim_pos = x_dist.argsort()
-    if local_gids != None:
+    if local_gids is not None:
         gids_closest_to_stim = local_gids[cells_closest_to_stim_pos]
         return gids_closest_to_stim, x_dist[cells_closest_to_stim_pos]#, cells_closest_to_stim_velocity
     else:
         return cells_closest_to_stim_pos, x_dist[cells_closest_to_stim_pos]#, cells_closest_to_stim_velocity
 
 
+def get_min_distances_to_stim(mp, tp, params, chunk_size=1024):
+    """
+    mp : motion_parameters (x,y,u,v)
+    tp : tuning properties of the cells (n_cells, 4)
+    The spatial distances on the torus between all cells and the stimulus positions (every 50th time step of dt_rate)
+    are computed as one (cells x time) array, in chunks of chunk_size cells to bound the memory.
+    Returns for each cell the minimal spatial distance + velocity distance and the minimal spatial distance
+    """
+    time = np.arange(0, params['t_sim'], 50 * params['dt_rate'])
+    x_pos_stim = mp[0] + mp[2] * time / params['t_stimulus']
+    y_pos_stim = mp[1] + mp[3] * time / params['t_stimulus']
+    w, h = params['torus_width'], params['torus_height']
+    n_cells = tp.shape[0]
+    min_spatial_dist = np.zeros(n_cells)
+    for i in xrange(0, n_cells, chunk_size):
+        dx = np.abs(tp[i:i + chunk_size, 0][:, np.newaxis] - x_pos_stim[np.newaxis, :]) % w
+        dy = np.abs(tp[i:i + chunk_size, 1][:, np.newaxis] - y_pos_stim[np.newaxis, :]) % h
+        spatial_dist = np.minimum(dx, w - dx)**2 + np.minimum(dy, h - dy)**2
+        min_spatial_dist[i:i + chunk_size] = np.sqrt(spatial_dist.min(axis=1))
+    velocity_dist = np.sqrt((tp[:, 2] - mp[2])**2 + (tp[:, 3] - mp[3])**2)
+    return min_spatial_dist + velocity_dist, min_spatial_dist
+
+
 def get_min_distance_to_stim(mp, tp_cell, params):
     """
     mp : motion_parameters (x,y,u,v)
     tp_cell : same format as mp
-    n_steps: steps for calculating the motion path
+    Returns the minimal spatial distance + velocity distance and the minimal spatial distance for one cell
     """
-    time = np.arange(0, params['t_sim'], 50 * params['dt_rate'])
-    spatial_dist = np.zeros(time.shape[0])
-    for i_time, time_ in enumerate(time):
-        x_pos_stim = mp[0] + mp[2] * time_ / params['t_stimulus']
-        y_pos_stim = mp[1] + mp[3] * time_ / params['t_stimulus']
-#        spatial_dist[t] = torus_distance(tp_cell[0], x_pos_stim[t])**2 + torus_distance(tp_cell[1], y_pos_stim[t])**2
-        spatial_dist[i_time] = (tp_cell[0] - x_pos_stim)** 2 + (tp_cell[1] - y_pos_stim)**2
-    min_spatial_dist = np.sqrt(np.min(spatial_dist))
-    velocity_dist = np.sqrt((tp_cell[2] - mp[2])**2 + (tp_cell[3] - mp[3])**2)
-    dist =  min_spatial_dist + velocity_dist
-    return dist, min_spatial_dist
+    dist, min_spatial_dist = get_min_distances_to_stim(mp, np.array(tp_cell).reshape((1, 4)), params)
+    return dist[0], min_spatial_dist[0]
     
 
 #def torus_distance(x0, x1):